@@ -1,18 +1,35 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import os
 import json
 import time
-import torch
 from typing import Dict, List, Tuple, Any
 import logging
 import traceback
 import urllib.request
 import shutil
 import uuid
+import queue
+import threading
 from collections import defaultdict
 
+try:
+    from ultralytics import YOLO
+    import torch
+except ImportError:
+    # Exported model backends (see backends.py) can run without torch
+    YOLO = None
+    torch = None
+
+from .cpu_slots import current_slot, usage_mark
+from .model_registry import ModelRegistry
+from .backends import EXPORT_IMGSZ, INFERENCE_BACKEND, ExportedModel
+from .quantization import QUANTIZED_BACKEND, QuantizedModel
+from .result_store import FrameColumns, ResultWriter
+from .roi import RegionOfInterest
+from .sampling import AdaptiveSampler, FixedSampler
+from .tracker import VehicleTracker
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -32,18 +49,38 @@ MODEL_OPTIONS = {
     "x-large": "yolov8x.pt",
 }
 
+# INT8 CPU variants, quantized from the weights of their FP32 model size
+QUANTIZED_MODEL_OPTIONS = {
+    "nano-int8": "nano",
+    "small-int8": "small",
+    "medium-int8": "medium",
+    "large-int8": "large",
+    "x-large-int8": "x-large",
+}
+
 # Default model
 DEFAULT_MODEL = "yolov8n.pt"
 MODEL_PATH = os.path.join(MODELS_DIR, DEFAULT_MODEL)
 
-# Load YOLOv8 model (pre-trained on COCO dataset)
-model = None
+# Memory loaded models may take before the least recently used ones are unloaded
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "2048"))
+
+# Seconds after which a model no job has used is unloaded (0 keeps it loaded)
+MODEL_IDLE_TIMEOUT = int(os.getenv("MODEL_IDLE_TIMEOUT", "900"))
 
 # Tracker untuk kendaraan yang terdeteksi
-tracked_vehicles = {}
-next_track_id = 1
 track_lifespan = 20  # Jumlah frame untuk mempertahankan track yang tidak terlihat
 
+# Number of sampled frames sent to the model in a single inference call
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", "4"))
+
+# Run decode, inference, annotation and encoding as concurrent pipeline stages
+PIPELINE_ENABLED = os.getenv("PIPELINE_ENABLED", "false").lower() == "true"
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+
+# Choose the inference stride from scene activity instead of the video length
+ADAPTIVE_SAMPLING = os.getenv("ADAPTIVE_SAMPLING", "false").lower() == "true"
+
 
 def download_model(model_name, save_path):
     """Download YOLOv8 model from the official repository"""
@@ -69,24 +106,32 @@ def download_model(model_name, save_path):
         return False
 
 
-def get_model(model_size="nano"):
-    """Get or load YOLOv8 model with specified size"""
-    global model
+def _quantized_name(model_file):
+    return f"{os.path.splitext(model_file)[0]}-int8"
+
+
+class ModelLoadError(Exception):
+    """Raised when neither the requested model nor an allowed fallback loads"""
+
+
+class ProcessingAborted(Exception):
+    """Raised when a session is told to stop, e.g. its job was taken over"""
+
 
+def _load_model(model_size="nano"):
+    """Load the YOLOv8 model of a size; cached by `model_registry`"""
+    quantized = model_size in QUANTIZED_MODEL_OPTIONS
     try:
         # Check if CUDA is available
-        device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        device = "cuda:0" if torch is not None and torch.cuda.is_available() else "cpu"
         logger.info(f"Using device: {device}")
 
         # Determine which model file to use
-        model_file = MODEL_OPTIONS.get(model_size, DEFAULT_MODEL)
+        model_file = MODEL_OPTIONS.get(
+            QUANTIZED_MODEL_OPTIONS.get(model_size, model_size), DEFAULT_MODEL
+        )
         model_path = os.path.join(MODELS_DIR, model_file)
 
-        # If model is already loaded and it's the same size, return it
-        if model is not None and getattr(model, "model_file", None) == model_file:
-            logger.info(f"Using already loaded model: {model_file}")
-            return model
-
         # Check if model file exists, download if not
         if not os.path.exists(model_path):
             logger.info(f"Model file not found: {model_path}")
@@ -104,7 +149,40 @@ def get_model(model_size="nano"):
         logger.info(f"Loading YOLOv8 model from {model_path}")
         start_time = time.time()
 
+        # INT8 models only run on runtimes that execute quantized ONNX graphs
+        if quantized:
+            backend = QUANTIZED_BACKEND
+            quantized_model = QuantizedModel(model_path, backend)
+            # Quantize (first use only) and load now rather than on the first frame
+            quantized_model.runner(EXPORT_IMGSZ)
+            quantized_model.model_file = _quantized_name(model_file)
+            model = quantized_model
+            logger.info(
+                f"INT8 model loaded with {backend} in {time.time() - start_time:.2f} seconds"
+            )
+            return model
+
+        # Run an exported copy of the model on another runtime if configured
+        if INFERENCE_BACKEND != "torch":
+            try:
+                exported_model = ExportedModel(model_path, INFERENCE_BACKEND)
+                # Export and load now rather than on the first frame
+                exported_model.runner(EXPORT_IMGSZ)
+                exported_model.model_file = model_file
+                model = exported_model
+                logger.info(
+                    f"Model loaded with {INFERENCE_BACKEND} in {time.time() - start_time:.2f} seconds"
+                )
+                return model
+            except Exception as e:
+                logger.error(
+                    f"Error loading model with {INFERENCE_BACKEND}, using torch: {str(e)}"
+                )
+
         try:
+            if YOLO is None:
+                raise Exception("ultralytics is not installed")
+
             # Try using torch hub
             model = YOLO(model_path)
             model.model_file = model_file  # Store which model file was used
@@ -119,7 +197,7 @@ def get_model(model_size="nano"):
                     self.model_file = model_file
                     self.device = device
 
-                def __call__(self, frame, verbose=False):
+                def __call__(self, frame, verbose=False, **kwargs):
                     # Return a simple structure with empty detection
                     class SimpleDetection:
                         def __init__(self):
@@ -129,6 +207,9 @@ def get_model(model_size="nano"):
 
                             self.boxes = SimpleBoxes()
 
+                    # One empty detection per frame when called with a batch
+                    if isinstance(frame, list):
+                        return [SimpleDetection() for _ in frame]
                     return [SimpleDetection()]
 
                 def to(self, device):
@@ -142,9 +223,9 @@ def get_model(model_size="nano"):
     except Exception as e:
         logger.error(f"Error loading model: {str(e)}")
         logger.error(traceback.format_exc())
-        # Try loading default model as fallback
+        # Try loading default model as fallback; an INT8 job never silently runs FP32
         try:
-            if model_file != DEFAULT_MODEL:
+            if model_file != DEFAULT_MODEL and not quantized:
                 logger.info("Attempting to load default model as fallback")
                 model_path = os.path.join(MODELS_DIR, DEFAULT_MODEL)
                 if not os.path.exists(model_path):
@@ -154,7 +235,83 @@ def get_model(model_size="nano"):
                 return model
         except Exception as fallback_error:
             logger.error(f"Fallback also failed: {str(fallback_error)}")
-        raise
+        raise ModelLoadError(f"Failed to load model {model_size}: {str(e)}") from e
+
+
+def model_memory_bytes(loaded_model) -> int:
+    """Approximate memory taken by a loaded model"""
+    # Ultralytics models keep their torch module in `model`
+    network = getattr(loaded_model, "model", None)
+    if hasattr(network, "parameters"):
+        tensors = list(network.parameters()) + list(network.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+    # Exported models: the runtime holds roughly the weights in each loaded
+    # file, and a dynamic export serves every input size from one file
+    files = getattr(loaded_model, "files", {})
+    return sum(
+        os.path.getsize(path) for path in set(files.values()) if os.path.exists(path)
+    )
+
+
+def _release_device_memory():
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+# Models loaded by this process, shared by every processing session
+model_registry = ModelRegistry(
+    _load_model,
+    model_memory_bytes,
+    MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+    MODEL_IDLE_TIMEOUT,
+    on_unload=_release_device_memory,
+)
+
+
+def warm_up_models(model_sizes: List[str], inferences: int = 3) -> Dict[str, Dict]:
+    """
+    Load models and run a few inferences on dummy frames before any job
+
+    The first calls of a model are slow (lazy initialisation, kernel
+    selection), so they are spent here instead of on the first video. Warm
+    models stay held in `model_registry`, so they are never unloaded.
+    Returns the load and warm-up times per model size.
+    """
+    rng = np.random.default_rng(0)
+    # Same batch shape as the processing sessions use
+    frames = [
+        rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+        for _ in range(INFERENCE_BATCH_SIZE)
+    ]
+
+    status = {}
+    for model_size in model_sizes:
+        try:
+            start = time.perf_counter()
+            warm_model = model_registry.acquire(model_size)
+            load_seconds = time.perf_counter() - start
+
+            inference_ms = []
+            for _ in range(inferences):
+                start = time.perf_counter()
+                with model_registry.lock(model_size):
+                    warm_model(frames, verbose=False)
+                inference_ms.append((time.perf_counter() - start) * 1000)
+
+            status[model_size] = {
+                "ready": True,
+                "load_seconds": load_seconds,
+                "inference_ms": inference_ms,
+            }
+            logger.info(
+                f"Model {model_size} warm: loaded in {load_seconds:.2f} seconds, "
+                f"inference {' / '.join(f'{ms:.0f}' for ms in inference_ms)} ms"
+            )
+        except Exception as e:
+            logger.error(f"Error warming up model {model_size}: {str(e)}")
+            status[model_size] = {"ready": False, "error": str(e)}
+    return status
 
 
 # Vehicle class mapping from COCO dataset
@@ -166,30 +323,44 @@ VEHICLE_CLASSES = {
 }
 
 
-def process_frame(
-    frame: np.ndarray, results: Dict, model_size="nano", frame_number=0
-) -> Tuple[np.ndarray, Dict]:
-    """Process a single frame and detect vehicles with tracking"""
-    global tracked_vehicles, next_track_id
-
-    model = get_model(model_size)
+# Colors used to annotate each vehicle type
+VEHICLE_COLORS = {
+    "car": (0, 255, 0),  # Green
+    "motorcycle": (0, 255, 255),  # Yellow
+    "bus": (255, 0, 0),  # Blue
+    "truck": (255, 0, 255),  # Purple
+}
 
-    # Run YOLOv8 inference on the frame
-    detections = model(frame, verbose=False)  # Matikan output verbose
+# Color of the region of interest outline
+ROI_COLOR = (0, 165, 255)  # Orange
 
-    # Get the first detection result
-    detection = detections[0]
 
-    # Define counting line at the bottom part of the frame (80% of height)
+def annotate_frame(
+    frame: np.ndarray,
+    frame_record: Dict,
+    counted_indices: set = frozenset(),
+    region: RegionOfInterest = None,
+) -> np.ndarray:
+    """Draw the counting line, tracked vehicles and new counts onto a copy of the frame"""
     frame_height, frame_width = frame.shape[:2]
     counting_line_y = int(frame_height * 0.6)
 
+    annotated_frame = frame.copy()
+
+    # Outline the area the model looks at
+    if region is not None:
+        cv2.polylines(annotated_frame, [region.points], True, ROI_COLOR, 2)
+
     # Draw the counting line
     cv2.line(
-        frame, (0, counting_line_y), (frame_width, counting_line_y), (255, 0, 0), 2
+        annotated_frame,
+        (0, counting_line_y),
+        (frame_width, counting_line_y),
+        (255, 0, 0),
+        2,
     )
     cv2.putText(
-        frame,
+        annotated_frame,
         "Counting Line",
         (10, counting_line_y - 10),
         cv2.FONT_HERSHEY_SIMPLEX,
@@ -198,161 +369,46 @@ def process_frame(
         2,
     )
 
-    # Initialize counts for this frame
-    frame_counts = {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0}
-    detected_objects = []
-    current_tracked_ids = set()
-
-    # Dictionary untuk objek yang terdeteksi di frame ini
-    frame_detections = {}
-
-    # Parse results and draw bounding boxes
-    annotated_frame = frame.copy()
-
-    if detection.boxes is not None:
-        for box in detection.boxes:
-            # Get class and confidence
-            class_id = int(box.cls.item())
-            confidence = box.conf.item()
-
-            # Only process if it's a vehicle and confidence is high enough
-            if class_id in VEHICLE_CLASSES and confidence > 0.25:
-                vehicle_type = VEHICLE_CLASSES[class_id]
-
-                # Get coordinates
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-
-                # Hitung centroid (titik tengah) objek
-                center_x = (x1 + x2) // 2
-                center_y = (y1 + y2) // 2
-
-                # Coba cocokkan dengan objek tertrack yang sudah ada berdasarkan posisi
-                matched_id = None
-                min_distance = float("inf")
-
-                for track_id, vehicle_info in tracked_vehicles.items():
-                    if vehicle_info["type"] == vehicle_type and vehicle_info["active"]:
-                        # Hitung jarak Euclidean
-                        track_x, track_y = vehicle_info["centroid"]
-                        distance = (
-                            (center_x - track_x) ** 2 + (center_y - track_y) ** 2
-                        ) ** 0.5
-
-                        # Jika jaraknya cukup dekat, ini mungkin objek yang sama
-                        # Nilai threshold bisa disesuaikan tergantung pada ukuran frame dan kecepatan objek
-                        if (
-                            distance < min(frame.shape[0], frame.shape[1]) * 0.1
-                            and distance < min_distance
-                        ):
-                            min_distance = distance
-                            matched_id = track_id
-
-                # Jika cocok dengan objek yang ada, update informasinya
-                if matched_id is not None:
-                    track_id = matched_id
-                    previous_y = tracked_vehicles[track_id]["centroid"][1]
-
-                    # Check if vehicle crossed the counting line from top to bottom
-                    crossed_line = (
-                        previous_y < counting_line_y and center_y >= counting_line_y
-                    )
-
-                    # Update tracking info
-                    tracked_vehicles[track_id].update(
-                        {
-                            "centroid": (center_x, center_y),
-                            "last_seen": frame_number,
-                            "active": True,
-                            "bbox": (x1, y1, x2, y2),
-                            "confidence": confidence,
-                        }
-                    )
+    for index, obj in enumerate(frame_record["tracked_objects"]):
+        vehicle_type = obj["type"]
+        x1, y1, x2, y2 = obj["bbox"]
+        center_x, center_y = obj["centroid"]
 
-                    # Increment count only if vehicle crossed the line
-                    if crossed_line and not tracked_vehicles[track_id].get(
-                        "counted", False
-                    ):
-                        # Mark as counted to avoid counting the same vehicle multiple times
-                        tracked_vehicles[track_id]["counted"] = True
-                        frame_counts[vehicle_type] += 1
-
-                        # Add visual indicator for counting
-                        cv2.circle(
-                            annotated_frame, (center_x, center_y), 10, (0, 0, 255), -1
-                        )
-                        cv2.putText(
-                            annotated_frame,
-                            f"Counted {vehicle_type}",
-                            (center_x - 40, center_y - 15),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.5,
-                            (0, 0, 255),
-                            2,
-                        )
-                else:
-                    # Buat ID tracking baru
-                    track_id = next_track_id
-                    next_track_id += 1
-                    tracked_vehicles[track_id] = {
-                        "type": vehicle_type,
-                        "centroid": (center_x, center_y),
-                        "first_seen": frame_number,
-                        "last_seen": frame_number,
-                        "active": True,
-                        "bbox": (x1, y1, x2, y2),
-                        "confidence": confidence,
-                        "counted": False,  # Initialize as not counted
-                    }
-
-                    # Check if the vehicle starts below the counting line
-                    # If so, mark it as already counted to avoid false counts
-                    if center_y >= counting_line_y:
-                        tracked_vehicles[track_id]["counted"] = True
-
-                current_tracked_ids.add(track_id)
-
-                # Tambahkan ke daftar objek terdeteksi untuk frame ini
-                detected_objects.append(
-                    {
-                        "id": str(track_id),
-                        "type": vehicle_type,
-                        "bbox": [x1, y1, x2, y2],
-                        "confidence": float(confidence),
-                        "centroid": [center_x, center_y],
-                        "counted": tracked_vehicles[track_id].get("counted", False),
-                    }
-                )
+        if index in counted_indices:
+            # Add visual indicator for counting
+            cv2.circle(annotated_frame, (center_x, center_y), 10, (0, 0, 255), -1)
+            cv2.putText(
+                annotated_frame,
+                f"Counted {vehicle_type}",
+                (center_x - 40, center_y - 15),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                (0, 0, 255),
+                2,
+            )
 
-                # Calculate color based on vehicle type
-                color_map = {
-                    "car": (0, 255, 0),  # Green
-                    "motorcycle": (0, 255, 255),  # Yellow
-                    "bus": (255, 0, 0),  # Blue
-                    "truck": (255, 0, 255),  # Purple
-                }
-                color = color_map.get(vehicle_type, (255, 255, 255))
+        # Calculate color based on vehicle type
+        color = VEHICLE_COLORS.get(vehicle_type, (255, 255, 255))
 
-                # Draw bounding box
-                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+        # Draw bounding box
+        cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
 
-                # Add label with ID and confidence
-                label = f"{vehicle_type} #{track_id}" + (
-                    " (Counted)"
-                    if tracked_vehicles[track_id].get("counted", False)
-                    else ""
-                )
-                cv2.putText(
-                    annotated_frame,
-                    label,
-                    (x1, y1 - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    color,
-                    2,
-                )
+        # Add label with ID and confidence
+        label = f"{vehicle_type} #{obj['id']}" + (
+            " (Counted)" if obj.get("counted", False) else ""
+        )
+        cv2.putText(
+            annotated_frame,
+            label,
+            (x1, y1 - 10),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            color,
+            2,
+        )
 
-                # Draw centroid
-                cv2.circle(annotated_frame, (center_x, center_y), 3, color, -1)
+        # Draw centroid
+        cv2.circle(annotated_frame, (center_x, center_y), 3, color, -1)
 
     # Draw the counting line again on top of the annotations
     cv2.line(
@@ -373,7 +429,7 @@ def process_frame(
     )
 
     # Draw current counts for this frame
-    for i, (vehicle_type, count) in enumerate(frame_counts.items()):
+    for i, (vehicle_type, count) in enumerate(frame_record["counts"].items()):
         if count > 0:
             cv2.putText(
                 annotated_frame,
@@ -381,321 +437,862 @@ def process_frame(
                 (10, 30 + i * 30),
                 cv2.FONT_HERSHEY_SIMPLEX,
                 0.7,
-                color_map.get(vehicle_type, (255, 255, 255)),
+                VEHICLE_COLORS.get(vehicle_type, (255, 255, 255)),
                 2,
             )
 
-    # Update status objek yang tidak terlihat di frame ini
-    for track_id in list(tracked_vehicles.keys()):
-        if track_id not in current_tracked_ids:
-            # Jika objek sudah tidak terlihat terlalu lama, hapus dari tracking
-            if (
-                frame_number - tracked_vehicles[track_id]["last_seen"]
-            ) > track_lifespan:
-                tracked_vehicles[track_id]["active"] = False
-
-    # Update total counts secara kumulatif
-    if "total_counts" not in results:
-        results["total_counts"] = {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0}
-
-    # Ensure all vehicle types exist in the total_counts dictionary
-    for vehicle_type in ["car", "motorcycle", "bus", "truck"]:
-        if vehicle_type not in results["total_counts"]:
-            results["total_counts"][vehicle_type] = 0
-
-    # Update counts safely
-    for vehicle_type, count in frame_counts.items():
-        if vehicle_type in results["total_counts"]:
-            results["total_counts"][vehicle_type] += count
-
-    # Add frame data with tracking info
-    if "frames" not in results:
-        results["frames"] = []
-
-    # Ensure tracked_objects is included in the frame data
-    results["frames"].append(
-        {
-            "frame_number": len(results["frames"]),
-            "counts": frame_counts,
-            "tracked_objects": detected_objects,
-        }
-    )
+    return annotated_frame
 
-    return annotated_frame, results
 
+def _read_frames(
+    cap: cv2.VideoCapture,
+    total_frames: int,
+    thumbnail_path: str,
+    start_time: float,
+    state: Dict,
+):
+    """
+    Yield (frame_number, frame) for every frame decoded from the video
 
-def process_video(video_path: str, file_id: str, model_size="nano") -> Tuple[str, str]:
+    Captures the thumbnail on the way and keeps `state["frame_count"]` and
+    `state["thumbnail_captured"]` up to date for the caller.
     """
-    Process a video file with YOLOv8 for vehicle detection with tracking
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        frame_count = state["frame_count"]
+
+        # Capture thumbnail around 25% of the video
+        if not state["thumbnail_captured"] and frame_count >= total_frames * 0.25:
+            cv2.imwrite(thumbnail_path, frame)
+            state["thumbnail_captured"] = True
+
+        # Ensure frame is not None and has proper dimensions
+        if frame is None or frame.size == 0:
+            logger.warning(f"Empty frame detected at frame {frame_count}")
+            continue
+
+        yield frame_count, frame
+
+        frame_count += 1
+        state["frame_count"] = frame_count
+
+        # Add progress indicator to console
+        if frame_count % 30 == 0:
+            percent = (frame_count / total_frames) * 100
+            elapsed = time.time() - start_time
+            eta = (
+                (elapsed / frame_count) * (total_frames - frame_count)
+                if frame_count > 0
+                else 0
+            )
+            logger.info(f"Processing video: {percent:.1f}% complete, ETA: {eta:.1f}s")
 
-    Args:
-        video_path: Path to the input video file
-        file_id: Unique ID for the video
-        model_size: Size of the YOLOv8 model to use (nano, small, medium, large, x-large)
 
-    Returns:
-        Tuple containing:
-        - Path to the processed video file with bounding boxes
-        - Path to the JSON file with detection results
-    """
-    # Reset tracking variables
-    global tracked_vehicles, next_track_id
-    tracked_vehicles = {}
-    next_track_id = 1
+def _render_frame(
+    frame_number: int,
+    frame: np.ndarray,
+    tracked: Any,
+    region: RegionOfInterest = None,
+) -> np.ndarray:
+    """Annotate a tracked frame, falling back to the original frame on error"""
+    if tracked is None:
+        return frame
+
+    try:
+        return annotate_frame(frame, *tracked, region=region)
+    except Exception as e:
+        logger.error(f"Error annotating frame {frame_number}: {str(e)}")
+        logger.error(traceback.format_exc())
+        # Write the original frame if there's an error
+        return frame
 
-    # Create results directory if it doesn't exist
-    os.makedirs("results", exist_ok=True)
 
-    # Save thumbnail for preview
-    thumbnail_path = f"results/{file_id}_thumbnail.jpg"
+class _PipelineAborted(Exception):
+    """Raised inside a pipeline stage when another stage has failed"""
 
-    # Log processing start with model information
-    logger.info(f"Processing video {file_id} with model size: {model_size}")
-    start_time = time.time()
 
-    try:
-        # Initialize video capture
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise Exception(f"Failed to open video file: {video_path}")
-
-        # Get video properties
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-        logger.info(
-            f"Video details: {width}x{height}, {fps} fps, {total_frames} frames"
-        )
+class _StageQueue:
+    """Bounded queue between two pipeline stages that records depth and stall times"""
 
-        # Initialize video writer for output
-        result_path = f"results/{file_id}_processed.mp4"
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        out = cv2.VideoWriter(result_path, fourcc, fps, (width, height))
-
-        # Initialize results dictionary
-        results = {
-            "video_id": file_id,
-            "total_frames": total_frames,
-            "fps": fps,
-            "resolution": f"{width}x{height}",
-            "model_used": model_size,
-            "thumbnail_path": thumbnail_path,
-            "total_counts": {},
-            "frames": [],
-            "unique_vehicles": {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0},
-            "counted_vehicles": {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0},
-            "counting_line": {
-                "description": "Objects counted when they cross this line from top to bottom",
-                "y_position_percentage": 0.8,
-            },
+    def __init__(self, name: str, maxsize: int, abort: threading.Event):
+        self.name = name
+        self.maxsize = maxsize
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._abort = abort
+        self.put_wait = 0.0
+        self.get_wait = 0.0
+        self.max_depth = 0
+        self.depth_total = 0
+        self.items = 0
+
+    def put(self, item):
+        start = time.perf_counter()
+        while True:
+            try:
+                self._queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if self._abort.is_set():
+                    raise _PipelineAborted()
+        self.put_wait += time.perf_counter() - start
+
+        depth = self._queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self.depth_total += depth
+        self.items += 1
+
+    def get(self):
+        start = time.perf_counter()
+        while True:
+            try:
+                item = self._queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self._abort.is_set():
+                    raise _PipelineAborted()
+        self.get_wait += time.perf_counter() - start
+        return item
+
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.maxsize,
+            "max_depth": self.max_depth,
+            "mean_depth": self.depth_total / self.items if self.items else 0,
+            "producer_stall_seconds": self.put_wait,
+            "consumer_stall_seconds": self.get_wait,
         }
 
-        # Process each frame in the video
-        frame_count = 0
-        processed_count = 0
-        thumbnail_captured = False
-
-        # Determine frame sampling rate based on video length and model size
-        # Process fewer frames for larger models or longer videos to improve speed
-        sampling_rate = 1  # Default for nano model (Process every frame)
-
-        # Adjust sampling rate based on video length and model size
-        if total_frames > 500:
-            sampling_rate = 2
-        if total_frames > 1000:
-            sampling_rate = 3
-        if total_frames > 3000:
-            sampling_rate = 4
-
-        # Further increase sampling rate for larger models
-        if model_size in ["medium", "large", "x-large"]:
-            sampling_rate += 1
-
-        logger.info(
-            f"Using frame sampling rate: {sampling_rate} (processing every {sampling_rate}th frame)"
+
+class VideoProcessingSession:
+    """
+    Everything needed to process one video: settings, model handle and tracker
+
+    Each video gets its own session, so several videos can be processed
+    concurrently in one process without sharing tracker state.
+    """
+
+    def __init__(
+        self,
+        model_size="nano",
+        batch_size: int = None,
+        pipelined: bool = None,
+        pipeline_queue_size: int = None,
+        adaptive_sampling: bool = None,
+        roi: List[List[float]] = None,
+        inference_size: int = None,
+        abort: threading.Event = None,
+    ):
+        self.model_size = model_size
+        # Number of sampled frames per inference call, 1 disables batching
+        self.batch_size = max(
+            1, int(batch_size if batch_size is not None else INFERENCE_BATCH_SIZE)
+        )
+        self.pipelined = PIPELINE_ENABLED if pipelined is None else pipelined
+        self.pipeline_queue_size = pipeline_queue_size or PIPELINE_QUEUE_SIZE
+        self.adaptive_sampling = (
+            ADAPTIVE_SAMPLING if adaptive_sampling is None else adaptive_sampling
         )
+        # Road area polygon as fractions of the frame size, None for the full frame
+        self.roi = roi
+        self.region = None
+        # Longest side frames are downscaled to before inference, None for the model default
+        self.inference_size = inference_size
+        # (x, y) factors from the frames sent to the model back to source frames
+        self.inference_scale = None
+        # (height, width) of the frames sent to the model
+        self.inference_shape = None
+        self.tracker = VehicleTracker(track_lifespan)
+        # Frame records; streamed to disk by a ResultWriter while a video runs
+        self.frame_records = FrameColumns()
+        self.model = None
+        # Held around inference, the model is shared with other sessions
+        self.model_lock = None
+        # Set from another thread to stop processing at the next frame
+        self.abort = abort
+
+    def load_model(self):
+        """Resolve the model handle once and reuse it for every frame"""
+        if self.model is None:
+            self.model = model_registry.acquire(self.model_size)
+            self.model_lock = model_registry.lock(self.model_size)
+        return self.model
+
+    def release_model(self):
+        """Hand the model back to the registry so it can be unloaded when idle"""
+        if self.model is not None:
+            self.model = None
+            self.model_lock = None
+            model_registry.release(self.model_size)
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[Any]:
+        """Run YOLOv8 inference on several frames in a single model call"""
+        if self.region is not None:
+            frames = [self.region.crop(frame) for frame in frames]
+
+        options = {}
+        if self.inference_size:
+            # Downscale once here; the model then only pads to its stride
+            frames = [self.resize_for_inference(frame) for frame in frames]
+            options["imgsz"] = self.inference_size
+        self.inference_shape = frames[0].shape[:2] if frames else None
+
+        # Ultralytics returns one result per input frame, in input order
+        model = self.load_model()
+        with self.model_lock:
+            detections = model(frames, verbose=False, **options)
+        if len(detections) != len(frames):
+            raise Exception(
+                f"Model returned {len(detections)} results for {len(frames)} frames"
+            )
 
-        # Check if CUDA is available and log
-        device = "cuda:0" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Using device for inference: {device}")
+        return list(detections)
+
+    def resize_for_inference(self, frame: np.ndarray) -> np.ndarray:
+        """Shrink a frame so its longest side fits `inference_size`, keeping its aspect"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.inference_size / max(height, width))
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        self.inference_scale = (size[0] / width, size[1] / height)
+        if scale == 1.0:
+            return frame
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def track_frame(
+        self,
+        detection: Any,
+        frame_shape: Tuple[int, ...],
+        results: Dict,
+        frame_number=0,
+    ) -> Tuple[Dict, set]:
+        """
+        Match the detections of one frame against the tracked vehicles and update counts
+
+        Returns the frame record added to `self.frame_records` and the indices
+        (into its `tracked_objects`) of the vehicles that crossed the line in this frame.
+        """
+        # Define counting line at the bottom part of the frame (80% of height)
+        frame_height, frame_width = frame_shape[:2]
+        counting_line_y = int(frame_height * 0.6)
+
+        # Initialize counts for this frame
+        frame_counts = {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0}
+        detected_objects = []
+        counted_indices = set()
+
+        vehicles = []
+        if detection.boxes is not None:
+            for box in detection.boxes:
+                # Get class and confidence
+                class_id = int(box.cls.item())
+                confidence = box.conf.item()
+
+                # Only process if it's a vehicle and confidence is high enough
+                if class_id in VEHICLE_CLASSES and confidence > 0.25:
+                    # Get coordinates
+                    if self.inference_scale is None:
+                        x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    else:
+                        # Boxes of downscaled frames are scaled back to the source
+                        scale_x, scale_y = self.inference_scale
+                        x1, y1, x2, y2 = (
+                            int(float(value) / scale)
+                            for value, scale in zip(
+                                box.xyxy[0], (scale_x, scale_y, scale_x, scale_y)
+                            )
+                        )
 
-        # Load model ahead of time to avoid loading during frame processing
-        model = get_model(model_size)
-        logger.info(f"Pre-loaded model {model_size}")
+                    # Boxes from a region of interest crop are relative to the crop
+                    if self.region is not None:
+                        x1, y1, x2, y2 = self.region.to_frame((x1, y1, x2, y2))
+                        if not self.region.contains(((x1 + x2) // 2, (y1 + y2) // 2)):
+                            continue
 
-        # Process frames
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
+                    vehicles.append(
+                        (VEHICLE_CLASSES[class_id], (x1, y1, x2, y2), confidence)
+                    )
 
-            # Capture thumbnail around 25% of the video
-            if not thumbnail_captured and frame_count >= total_frames * 0.25:
-                cv2.imwrite(thumbnail_path, frame)
-                thumbnail_captured = True
+        # Match detections to tracked vehicles and detect line crossings
+        assignments = self.tracker.update(
+            vehicles, frame_shape, frame_number, counting_line_y
+        )
+
+        for (vehicle_type, bbox, confidence), (track, counted_now) in zip(
+            vehicles, assignments
+        ):
+            if counted_now:
+                frame_counts[vehicle_type] += 1
+                counted_indices.add(len(detected_objects))
+
+            # Tambahkan ke daftar objek terdeteksi untuk frame ini
+            detected_objects.append(
+                {
+                    "id": str(track.track_id),
+                    "type": vehicle_type,
+                    "bbox": list(bbox),
+                    "confidence": float(confidence),
+                    "centroid": list(track.centroid),
+                    "counted": track.counted,
+                }
+            )
+
+        # Update total counts secara kumulatif
+        if "total_counts" not in results:
+            results["total_counts"] = {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0}
+
+        # Ensure all vehicle types exist in the total_counts dictionary
+        for vehicle_type in ["car", "motorcycle", "bus", "truck"]:
+            if vehicle_type not in results["total_counts"]:
+                results["total_counts"][vehicle_type] = 0
+
+        # Update counts safely
+        for vehicle_type, count in frame_counts.items():
+            if vehicle_type in results["total_counts"]:
+                results["total_counts"][vehicle_type] += count
+
+        # Ensure tracked_objects is included in the frame data
+        frame_record = {
+            "frame_number": len(self.frame_records),
+            "counts": frame_counts,
+            "tracked_objects": detected_objects,
+        }
+        self.frame_records.append(frame_record, counted_indices, frame_number)
+
+        return frame_record, counted_indices
+
+    def process_frame(
+        self,
+        frame: np.ndarray,
+        results: Dict,
+        frame_number=0,
+        detection: Any = None,
+    ) -> Tuple[np.ndarray, Dict]:
+        """
+        Process a single frame and detect vehicles with tracking
+
+        If `detection` is given (e.g. from `detect_batch`), inference is skipped
+        and only tracking and annotation are performed.
+        """
+        if detection is None:
+            # Run YOLOv8 inference on the frame
+            detection = self.detect_batch([frame])[0]
+
+        frame_record, counted_indices = self.track_frame(
+            detection, frame.shape, results, frame_number
+        )
+        annotated_frame = annotate_frame(
+            frame, frame_record, counted_indices, region=self.region
+        )
 
-            # Only process every Nth frame to speed up processing
+        return annotated_frame, results
+
+    def select_batches(self, frames, sampler):
+        """
+        Decide which decoded frames go to the model and group them into batches
+
+        Yields lists of (frame_number, frame, sampled) holding `batch_size`
+        sampled frames, plus a last partial batch. The sampler sees the
+        tracker state left by the previous batch, so each batch must be
+        tracked before the next one is requested, and a batch is cut short
+        when the sampler needs the detections of its frames to go on.
+        """
+        pending = []
+        pending_sampled = 0
+        for frame_number, frame in frames:
+            if self.abort is not None and self.abort.is_set():
+                raise ProcessingAborted(f"Processing stopped at frame {frame_number}")
+            sampled = sampler.should_sample(frame_number, frame, self.tracker)
+            pending.append((frame_number, frame, sampled))
+            pending_sampled += sampled
+            if pending_sampled >= self.batch_size or (
+                sampled and sampler.needs_feedback
+            ):
+                yield pending
+                pending = []
+                pending_sampled = 0
+
+        if pending:
+            yield pending
+
+    def track_batch(
+        self, pending: List[Tuple[int, np.ndarray, bool]], results: Dict
+    ) -> List[Tuple[int, np.ndarray, Any]]:
+        """
+        Run batched inference and tracking for the buffered frames, in frame order
+
+        Returns (frame_number, frame, tracked) for every buffered frame, where
+        `tracked` is the (frame_record, counted_indices) pair of a sampled frame
+        or None for frames that were skipped or failed.
+        """
+        sampled_frames = [frame for _, frame, sampled in pending if sampled]
+        detections = []
+        if sampled_frames:
             try:
-                if frame_count % sampling_rate == 0:
-                    # Ensure frame is not None and has proper dimensions
-                    if frame is None or frame.size == 0:
-                        logger.warning(f"Empty frame detected at frame {frame_count}")
-                        continue
-
-                    # Process frame with model
-                    annotated_frame, results = process_frame(
-                        frame, results, model_size, frame_count
+                detections = self.detect_batch(sampled_frames)
+            except Exception as e:
+                # Fall back to per-frame inference so one bad batch doesn't fail the video
+                logger.error(
+                    f"Batched inference failed, processing frames one by one: {str(e)}"
+                )
+                detections = [None] * len(sampled_frames)
+
+        tracked_frames = []
+        detection_iter = iter(detections)
+        for frame_number, frame, sampled in pending:
+            tracked = None
+            if sampled:
+                detection = next(detection_iter)
+                try:
+                    if detection is None:
+                        detection = self.detect_batch([frame])[0]
+                    tracked = self.track_frame(
+                        detection, frame.shape, results, frame_number
                     )
-                    out.write(annotated_frame)
-                    processed_count += 1
-                else:
-                    # Just write the original frame
-                    out.write(frame)
+                except Exception as e:
+                    logger.error(f"Error processing frame {frame_number}: {str(e)}")
+                    logger.error(traceback.format_exc())
+            tracked_frames.append((frame_number, frame, tracked))
+
+        pending.clear()
+        return tracked_frames
+
+    def run_pipeline(
+        self, frames, sampler, results: Dict, out: cv2.VideoWriter
+    ) -> Tuple[int, Dict]:
+        """
+        Run decode, inference+tracking, annotation and encoding as separate threads
+
+        Each stage is a single thread joined to the next by a bounded queue, so
+        frames stay in source order and results are identical to the sequential
+        path. Returns the number of processed frames and per-stage statistics.
+        """
+        queue_size = self.pipeline_queue_size
+        abort = threading.Event()
+        decoded = _StageQueue("decoded", queue_size, abort)
+        tracked = _StageQueue("tracked", queue_size, abort)
+        annotated = _StageQueue("annotated", queue_size, abort)
+        busy = {"decode": 0.0, "inference": 0.0, "annotate": 0.0, "encode": 0.0}
+        errors = []
+        processed = [0]
+        done = object()
+
+        def decode_stage():
+            frames_iter = iter(frames)
+            while True:
+                start = time.perf_counter()
+                item = next(frames_iter, done)
+                busy["decode"] += time.perf_counter() - start
+                decoded.put(item)
+                if item is done:
+                    return
+
+        def decoded_frames():
+            while True:
+                item = decoded.get()
+                if item is done:
+                    return
+                yield item
+
+        def inference_stage():
+            for pending in self.select_batches(decoded_frames(), sampler):
+                start = time.perf_counter()
+                tracked_frames = self.track_batch(pending, results)
+                busy["inference"] += time.perf_counter() - start
+                for tracked_frame in tracked_frames:
+                    processed[0] += tracked_frame[2] is not None
+                    tracked.put(tracked_frame)
+            tracked.put(done)
+
+        def annotate_stage():
+            while True:
+                item = tracked.get()
+                if item is done:
+                    annotated.put(done)
+                    return
+                start = time.perf_counter()
+                image = _render_frame(*item, region=self.region)
+                busy["annotate"] += time.perf_counter() - start
+                annotated.put(image)
+
+        def run_stage(stage):
+            try:
+                stage()
+            except _PipelineAborted:
+                pass
             except Exception as e:
-                logger.error(f"Error processing frame {frame_count}: {str(e)}")
-                logger.error(traceback.format_exc())
-                # Write the original frame if there's an error
-                out.write(frame)
-
-            frame_count += 1
-
-            # Add progress indicator to console
-            if frame_count % 30 == 0:
-                percent = (frame_count / total_frames) * 100
-                elapsed = time.time() - start_time
-                eta = (
-                    (elapsed / frame_count) * (total_frames - frame_count)
-                    if frame_count > 0
-                    else 0
+                errors.append(e)
+                abort.set()
+
+        threads = [
+            threading.Thread(target=run_stage, args=(stage,), daemon=True)
+            for stage in (decode_stage, inference_stage, annotate_stage)
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Encoding runs on the calling thread
+        try:
+            while True:
+                image = annotated.get()
+                if image is done:
+                    break
+                start = time.perf_counter()
+                out.write(image)
+                busy["encode"] += time.perf_counter() - start
+        except _PipelineAborted:
+            pass
+        except Exception as e:
+            errors.append(e)
+        finally:
+            if errors:
+                abort.set()
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+        queues = [decoded, tracked, annotated]
+        stats = {
+            "queue_size": queue_size,
+            "stage_busy_seconds": busy,
+            "queues": {q.name: q.stats() for q in queues},
+            "bottleneck_stage": max(busy, key=busy.get),
+        }
+        return processed[0], stats
+
+    def run(self, video_path: str, file_id: str) -> Tuple[str, str]:
+        """
+        Process a video file with YOLOv8 for vehicle detection with tracking
+
+        Args:
+            video_path: Path to the input video file
+            file_id: Unique ID for the video
+
+        Returns:
+            Tuple containing:
+            - Path to the processed video file with bounding boxes
+            - Path to the JSON file with detection results
+        """
+        model_size = self.model_size
+
+        # Create results directory if it doesn't exist
+        os.makedirs("results", exist_ok=True)
+
+        # Save thumbnail for preview
+        thumbnail_path = f"results/{file_id}_thumbnail.jpg"
+
+        # Log processing start with model information
+        logger.info(f"Processing video {file_id} with model size: {model_size}")
+        start_time = time.time()
+        cpu_mark = usage_mark()
+
+        try:
+            # Initialize video capture
+            cap = cv2.VideoCapture(video_path)
+            if not cap.isOpened():
+                raise Exception(f"Failed to open video file: {video_path}")
+
+            # Get video properties
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+            logger.info(
+                f"Video details: {width}x{height}, {fps} fps, {total_frames} frames"
+            )
+
+            if self.roi:
+                self.region = RegionOfInterest(self.roi, (height, width))
+                logger.info(
+                    f"Running inference on region of interest {self.region.describe()['crop']} "
+                    f"({self.region.area_ratio:.0%} of the frame)"
                 )
+
+            # Initialize video writer for output
+            result_path = f"results/{file_id}_processed.mp4"
+            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+            out = cv2.VideoWriter(result_path, fourcc, fps, (width, height))
+
+            # Initialize results dictionary
+            results = {
+                "video_id": file_id,
+                "total_frames": total_frames,
+                "fps": fps,
+                "resolution": f"{width}x{height}",
+                "model_requested": model_size,
+                "model_used": None,
+                "thumbnail_path": thumbnail_path,
+                "roi": self.region.describe() if self.region is not None else None,
+                "inference_size": self.inference_size,
+                "total_counts": {},
+                "unique_vehicles": {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0},
+                "counted_vehicles": {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0},
+                "counting_line": {
+                    "description": "Objects counted when they cross this line from top to bottom",
+                    "y_position_percentage": 0.8,
+                },
+            }
+
+            # Frame records are written out as they are produced, readable while running
+            json_path = f"results/{file_id}_results.json"
+            self.frame_records = ResultWriter(json_path, results, fps)
+
+            # Process each frame in the video
+            processed_count = 0
+            pipeline_stats = None
+            read_state = {"frame_count": 0, "thumbnail_captured": False}
+
+            # Determine frame sampling rate based on video length and model size
+            # Process fewer frames for larger models or longer videos to improve speed
+            sampling_rate = 1  # Default for nano model (Process every frame)
+
+            # Adjust sampling rate based on video length and model size
+            if total_frames > 500:
+                sampling_rate = 2
+            if total_frames > 1000:
+                sampling_rate = 3
+            if total_frames > 3000:
+                sampling_rate = 4
+
+            # Further increase sampling rate for larger models
+            if model_size in ["medium", "large", "x-large"]:
+                sampling_rate += 1
+
+            if self.adaptive_sampling:
+                sampler = AdaptiveSampler()
                 logger.info(
-                    f"Processing video: {percent:.1f}% complete, ETA: {eta:.1f}s"
+                    f"Using adaptive frame sampling (stride {sampler.min_stride}-{sampler.max_stride})"
+                )
+            else:
+                sampler = FixedSampler(sampling_rate)
+                logger.info(
+                    f"Using frame sampling rate: {sampling_rate} (processing every {sampling_rate}th frame)"
                 )
 
-        # Make sure we have a thumbnail even if we didn't get to 25%
-        if not thumbnail_captured and frame_count > 0:
-            # Reset to first frame to get a thumbnail
-            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, frame = cap.read()
-            if ret:
-                cv2.imwrite(thumbnail_path, frame)
-
-        # Log information about processed frames
-        logger.info(
-            f"Processed {processed_count} frames out of {frame_count} total frames"
-        )
+            logger.info(f"Using inference batch size: {self.batch_size}")
 
-        # If we didn't process any frames successfully, raise an error
-        if processed_count == 0:
-            raise Exception("Failed to process any frames in the video")
-
-        # Count unique vehicles tracked and those that were counted (crossed the line)
-        for track_id, vehicle_info in tracked_vehicles.items():
-            vehicle_type = vehicle_info["type"]
-            results["unique_vehicles"][vehicle_type] += 1
-            if vehicle_info.get("counted", False):
-                results["counted_vehicles"][vehicle_type] += 1
-
-        # Calculate overall statistics
-        processing_time = time.time() - start_time
-        total_counted = sum(results["counted_vehicles"].values())
-
-        results["processing_stats"] = {
-            "processed_frames": processed_count,
-            "total_frames": frame_count,
-            "processing_time_seconds": processing_time,
-            "frames_per_second": (
-                processed_count / processing_time if processing_time > 0 else 0
-            ),
-            "vehicle_density": (
-                sum(results["unique_vehicles"].values()) / processed_count
-                if processed_count > 0
-                else 0
-            ),
-            "total_vehicles_counted": total_counted,
-            "counting_method": "Line crossing (bottom 80% of frame)",
-        }
+            # Check if CUDA is available and log
+            device = (
+                "cuda:0" if torch is not None and torch.cuda.is_available() else "cpu"
+            )
+            logger.info(f"Using device for inference: {device}")
 
-        # Update total_counts to reflect only the counted vehicles (line crossings)
-        results["total_counts"] = results["counted_vehicles"]
+            # Load model ahead of time to avoid loading during frame processing
+            model = self.load_model()
+            # The model that actually runs, e.g. the default one after a fallback
+            results["model_used"] = getattr(model, "model_file", model_size)
+            logger.info(f"Pre-loaded model {model_size} ({results['model_used']})")
 
-        logger.info(f"Video processing completed in {processing_time:.2f} seconds")
-        logger.info(
-            f"Detected {sum(results.get('unique_vehicles', {}).values())} unique vehicles in total"
-        )
-        logger.info(f"Counted {total_counted} vehicles crossing the counting line")
-
-        # Save JSON results
-        json_path = f"results/{file_id}_results.json"
-        with open(json_path, "w") as f:
-            json.dump(results, f, indent=4)
-
-        # Release resources
-        cap.release()
-        out.release()
-
-        # Verify the results are valid and have tracked objects
-        with open(json_path, "r") as f:
-            saved_results = json.load(f)
-
-        # Log information about saved results
-        frames_count = len(saved_results.get("frames", []))
-        tracked_objects_count = 0
-        counted_objects = 0
-
-        for frame in saved_results.get("frames", []):
-            if "tracked_objects" in frame:
-                tracked_objects_count += len(frame.get("tracked_objects", []))
-                for obj in frame.get("tracked_objects", []):
-                    if obj.get("counted", False):
-                        counted_objects += 1
-
-        logger.info(
-            f"Saved results have {frames_count} frames with {tracked_objects_count} total tracked objects and {counted_objects} counted objects"
-        )
+            if self.inference_size:
+                logger.info(
+                    f"Downscaling frames to {self.inference_size}px (longest side) for inference"
+                )
 
-        return result_path, json_path
+            frames = _read_frames(
+                cap, total_frames, thumbnail_path, start_time, read_state
+            )
 
-    except Exception as e:
-        # Clean up resources on error
-        logger.error(f"Error during video processing: {str(e)}")
-        logger.error(traceback.format_exc())
+            if self.pipelined:
+                logger.info(
+                    f"Using pipelined processing, queue size {self.pipeline_queue_size}"
+                )
+                processed_count, pipeline_stats = self.run_pipeline(
+                    frames, sampler, results, out
+                )
+            else:
+                # Frames are written out in order once their batch has been tracked
+                for pending in self.select_batches(frames, sampler):
+                    for tracked_frame in self.track_batch(pending, results):
+                        processed_count += tracked_frame[2] is not None
+                        out.write(_render_frame(*tracked_frame, region=self.region))
+
+            frame_count = read_state["frame_count"]
+            thumbnail_captured = read_state["thumbnail_captured"]
+
+            # Make sure we have a thumbnail even if we didn't get to 25%
+            if not thumbnail_captured and frame_count > 0:
+                # Reset to first frame to get a thumbnail
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = cap.read()
+                if ret:
+                    cv2.imwrite(thumbnail_path, frame)
+
+            # Log information about processed frames
+            logger.info(
+                f"Processed {processed_count} frames out of {frame_count} total frames"
+            )
 
-        try:
-            if "cap" in locals() and cap.isOpened():
-                cap.release()
-            if "out" in locals() and out.isOpened():
-                out.release()
-        except Exception as cleanup_error:
-            logger.error(f"Error during cleanup: {str(cleanup_error)}")
-
-        # Create minimal JSON result in case of error
-        error_json_path = f"results/{file_id}_results.json"
-        error_result = {
-            "video_id": file_id,
-            "total_frames": 0,
-            "fps": 0,
-            "resolution": "0x0",
-            "model_used": model_size,
-            "thumbnail_path": thumbnail_path,
-            "error": str(e),
-            "frames": [],
-            "unique_vehicles": {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0},
-            "processing_stats": {
-                "processed_frames": 0,
+            # If we didn't process any frames successfully, raise an error
+            if processed_count == 0:
+                raise Exception("Failed to process any frames in the video")
+
+            # Count unique vehicles tracked and those that were counted (crossed the line)
+            for summary in self.tracker.finalize():
+                results["unique_vehicles"][summary.vehicle_type] += 1
+                if summary.counted:
+                    results["counted_vehicles"][summary.vehicle_type] += 1
+
+            # Calculate overall statistics
+            processing_time = time.time() - start_time
+            total_counted = sum(results["counted_vehicles"].values())
+
+            results["processing_stats"] = {
+                "processed_frames": processed_count,
+                "total_frames": frame_count,
+                "processing_time_seconds": processing_time,
+                "frames_per_second": (
+                    processed_count / processing_time if processing_time > 0 else 0
+                ),
+                "vehicle_density": (
+                    sum(results["unique_vehicles"].values()) / processed_count
+                    if processed_count > 0
+                    else 0
+                ),
+                "total_vehicles_counted": total_counted,
+                "counting_method": "Line crossing (bottom 80% of frame)",
+                "inference_batch_size": self.batch_size,
+                "inference_size": self.inference_size,
+                "inference_resolution": (
+                    f"{self.inference_shape[1]}x{self.inference_shape[0]}"
+                    if self.inference_shape
+                    else None
+                ),
+                "sampling": sampler.stats(),
+                "model_cache": model_registry.stats(),
+            }
+            slot = current_slot()
+            if slot is not None:
+                results["processing_stats"]["cpu_slot"] = {
+                    **slot.describe(),
+                    "utilization": slot.utilization(cpu_mark),
+                }
+            if pipeline_stats is not None:
+                results["processing_stats"]["pipeline"] = pipeline_stats
+
+            # Update total_counts to reflect only the counted vehicles (line crossings)
+            results["total_counts"] = results["counted_vehicles"]
+
+            logger.info(f"Video processing completed in {processing_time:.2f} seconds")
+            logger.info(
+                f"Detected {sum(results.get('unique_vehicles', {}).values())} unique vehicles in total"
+            )
+            logger.info(f"Counted {total_counted} vehicles crossing the counting line")
+
+            # Save the last frame records and the results manifest (JSON)
+            self.frame_records.close()
+
+            # Release resources
+            cap.release()
+            out.release()
+
+            logger.info(
+                f"Saved results have {len(self.frame_records)} frames with {self.frame_records.object_count} total tracked objects "
+                f"and {self.frame_records.counted_count} counted objects"
+            )
+
+            return result_path, json_path
+
+        except Exception as e:
+            # Clean up resources on error
+            logger.error(f"Error during video processing: {str(e)}")
+            logger.error(traceback.format_exc())
+            # When aborted, the result files belong to whoever took the video over
+            aborted = isinstance(e, ProcessingAborted)
+
+            try:
+                if "cap" in locals() and cap.isOpened():
+                    cap.release()
+                if "out" in locals() and out.isOpened():
+                    out.release()
+                if isinstance(self.frame_records, ResultWriter) and not aborted:
+                    self.frame_records.discard()
+            except Exception as cleanup_error:
+                logger.error(f"Error during cleanup: {str(cleanup_error)}")
+
+            if aborted:
+                raise
+
+            # Create minimal JSON result in case of error
+            error_json_path = f"results/{file_id}_results.json"
+            error_result = {
+                "video_id": file_id,
                 "total_frames": 0,
-                "processing_time_seconds": time.time() - start_time,
-                "frames_per_second": 0,
-                "vehicle_density": 0,
-            },
-        }
+                "fps": 0,
+                "resolution": "0x0",
+                "model_requested": model_size,
+                "model_used": getattr(self.model, "model_file", None),
+                "thumbnail_path": thumbnail_path,
+                "error": str(e),
+                "frames": [],
+                "unique_vehicles": {"car": 0, "motorcycle": 0, "bus": 0, "truck": 0},
+                "processing_stats": {
+                    "processed_frames": 0,
+                    "total_frames": 0,
+                    "processing_time_seconds": time.time() - start_time,
+                    "frames_per_second": 0,
+                    "vehicle_density": 0,
+                },
+            }
 
-        try:
-            with open(error_json_path, "w") as f:
-                json.dump(error_result, f, indent=4)
-        except Exception as json_error:
-            logger.error(f"Error saving error JSON: {str(json_error)}")
+            try:
+                with open(error_json_path, "w") as f:
+                    json.dump(error_result, f, indent=4)
+            except Exception as json_error:
+                logger.error(f"Error saving error JSON: {str(json_error)}")
+
+            raise
+
+
+def process_video(
+    video_path: str,
+    file_id: str,
+    model_size="nano",
+    batch_size: int = None,
+    pipelined: bool = None,
+    adaptive_sampling: bool = None,
+    roi: List[List[float]] = None,
+    inference_size: int = None,
+    abort: threading.Event = None,
+) -> Tuple[str, str]:
+    """
+    Process a video file with YOLOv8 for vehicle detection with tracking
 
-        raise
+    Args:
+        video_path: Path to the input video file
+        file_id: Unique ID for the video
+        model_size: Size of the YOLOv8 model to use (nano, small, medium, large, x-large,
+            or a -int8 variant of one)
+        batch_size: Number of sampled frames per inference call
+            (defaults to INFERENCE_BATCH_SIZE, 1 disables batching)
+        pipelined: Run decoding, inference, annotation and encoding as
+            concurrent stages (defaults to PIPELINE_ENABLED)
+        adaptive_sampling: Choose the inference stride from motion and tracked
+            vehicles instead of the video length (defaults to ADAPTIVE_SAMPLING)
+        roi: Road area polygon as [x, y] fractions of the frame size; only
+            this area is sent to the model (defaults to the full frame)
+        inference_size: Longest side in pixels frames are downscaled to before
+            inference (defaults to the model's own input size)
+        abort: Event that stops processing with ProcessingAborted once set
+
+    Returns:
+        Tuple containing:
+        - Path to the processed video file with bounding boxes
+        - Path to the JSON file with detection results
+    """
+    session = VideoProcessingSession(
+        model_size,
+        batch_size,
+        pipelined,
+        adaptive_sampling=adaptive_sampling,
+        roi=roi,
+        inference_size=inference_size,
+        abort=abort,
+    )
+    try:
+        return session.run(video_path, file_id)
+    finally:
+        session.release_model()
@@ -0,0 +1,88 @@
+from typing import Dict, List
+
+from .result_store import VEHICLE_TYPES
+
+WEEKDAYS = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+
+
+def _empty_counts() -> Dict:
+    return {"videos": 0, **dict.fromkeys(VEHICLE_TYPES, 0), "total": 0}
+
+
+def _add_counts(target: Dict, group):
+    target["videos"] += group.videos
+    for vehicle_type in VEHICLE_TYPES:
+        count = getattr(group, vehicle_type) or 0
+        target[vehicle_type] += count
+        target["total"] += count
+
+
+def summarize_groups(groups: List) -> Dict:
+    """
+    Totals and distributions from the groups of `crud.get_video_count_groups`
+
+    Counts come from the summary columns of the video rows, so only videos
+    that completed contribute vehicles; every matching video is counted in
+    `videos` and `by_status`.
+    """
+    totals = _empty_counts()
+    totals.update(processed_frames=0, duration_seconds=0.0, processing_time=0.0)
+    by_status = {}
+    by_day = {}
+    by_weekday = [{"day": day, **_empty_counts()} for day in WEEKDAYS]
+    by_hour = [{"hour": hour, **_empty_counts()} for hour in range(24)]
+
+    for group in groups:
+        _add_counts(totals, group)
+        totals["processed_frames"] += group.processed_frames or 0
+        totals["duration_seconds"] += group.duration_seconds or 0
+        totals["processing_time"] += group.processing_time or 0
+        by_status[group.status] = by_status.get(group.status, 0) + group.videos
+        _add_counts(by_day.setdefault(str(group.day), _empty_counts()), group)
+        _add_counts(by_weekday[int(group.weekday)], group)
+        _add_counts(by_hour[int(group.hour)], group)
+
+    return {
+        "totals": totals,
+        "by_type": {
+            vehicle_type: totals[vehicle_type] for vehicle_type in VEHICLE_TYPES
+        },
+        "by_status": by_status,
+        "by_day": [{"date": day, **counts} for day, counts in sorted(by_day.items())],
+        "by_weekday": by_weekday,
+        "by_hour": by_hour,
+    }
+
+
+# Groupings of the count buckets the traffic endpoint accepts
+TRAFFIC_INTERVALS = ["hour", "day", "week", "hour_of_day", "weekday"]
+
+
+def summarize_traffic(rows: List, interval: str) -> List[Dict]:
+    """
+    Per-type counts from the rows of `crud.get_traffic_counts`, one entry per key
+
+    Profiles (hour_of_day, weekday) list every hour or day, with zeros where
+    nothing was counted; time series list only the periods with vehicles.
+    """
+    if interval == "hour_of_day":
+        entries = {hour: {"hour": hour} for hour in range(24)}
+    elif interval == "weekday":
+        entries = {index: {"day": day} for index, day in enumerate(WEEKDAYS)}
+    else:
+        entries = {}
+    for entry in entries.values():
+        entry.update(dict.fromkeys(VEHICLE_TYPES, 0), total=0)
+
+    for row in rows:
+        if interval in ("hour_of_day", "weekday"):
+            key = int(row.key)
+        else:
+            key = row.key.isoformat()
+        entry = entries.setdefault(
+            key, {"start": key, **dict.fromkeys(VEHICLE_TYPES, 0), "total": 0}
+        )
+        entry[row.vehicle_type] += row.count
+        entry["total"] += row.count
+
+    return [entries[key] for key in sorted(entries)]
@@ -0,0 +1,396 @@
+import os
+import shutil
+import tempfile
+import threading
+import logging
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple
+
+from .cpu_slots import inference_threads
+
+logger = logging.getLogger(__name__)
+
+# Runtime used for inference: torch (ultralytics), onnxruntime, openvino, opencv or torchscript
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+
+# Input size exported models are built for when a job does not set one
+EXPORT_IMGSZ = int(os.getenv("EXPORT_IMGSZ", "640"))
+
+# Pre- and post-processing settings, matching the ultralytics predict defaults
+CONFIDENCE_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+LETTERBOX_FILL = 114
+MODEL_STRIDE = 32
+# Boxes kept before NMS, and the per-class box offset that keeps classes apart
+MAX_NMS_BOXES = 30000
+MAX_BOX_SIZE = 7680
+
+
+class OnnxRuntimeRunner:
+    """Run an ONNX export with onnxruntime"""
+
+    supports_batch = True
+
+    def __init__(self, path: str):
+        import onnxruntime
+
+        available = onnxruntime.get_available_providers()
+        providers = [
+            provider
+            for provider in ("CUDAExecutionProvider", "CPUExecutionProvider")
+            if provider in available
+        ]
+        options = onnxruntime.SessionOptions()
+        # Stay within the worker's CPU slot instead of using every core
+        if inference_threads():
+            options.intra_op_num_threads = inference_threads()
+        self.session = onnxruntime.InferenceSession(
+            path, sess_options=options, providers=providers
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoRunner:
+    """Run an ONNX export with OpenVINO on the CPU"""
+
+    supports_batch = True
+
+    def __init__(self, path: str):
+        import openvino
+
+        core = openvino.Core()
+        if inference_threads():
+            core.set_property("CPU", {"INFERENCE_NUM_THREADS": inference_threads()})
+        self.model = core.compile_model(core.read_model(path), "CPU")
+        self.output = self.model.output(0)
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        return self.model(batch)[self.output]
+
+
+class OpenCVRunner:
+    """Run an ONNX export with the OpenCV DNN module, one frame at a time"""
+
+    supports_batch = False
+
+    def __init__(self, path: str):
+        self.net = cv2.dnn.readNetFromONNX(path)
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        self.net.setInput(batch)
+        return self.net.forward()
+
+
+class TorchScriptRunner:
+    """Run a TorchScript export without the ultralytics runtime, one frame at a time"""
+
+    supports_batch = False
+
+    def __init__(self, path: str):
+        import torch
+
+        self.torch = torch
+        self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        self.module = torch.jit.load(path, map_location=self.device).eval()
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        with self.torch.no_grad():
+            output = self.module(self.torch.from_numpy(batch).to(self.device))
+        if isinstance(output, (list, tuple)):
+            output = output[0]
+        return output.cpu().numpy()
+
+
+# Backend name: (export format, dynamic input shape, runner)
+BACKENDS = {
+    "onnxruntime": ("onnx", True, OnnxRuntimeRunner),
+    "openvino": ("onnx", True, OpenVinoRunner),
+    "opencv": ("onnx", False, OpenCVRunner),
+    "torchscript": ("torchscript", False, TorchScriptRunner),
+}
+
+_export_lock = threading.Lock()
+
+
+def export_path(weights_path: str, export_format: str, imgsz: int, dynamic: bool):
+    """
+    Location of the cached export of a .pt model next to its weights
+
+    Dynamic-shape exports take any input size, so there is one per model;
+    fixed-shape exports are made per input size.
+    """
+    stem = os.path.splitext(weights_path)[0]
+    if dynamic:
+        return f"{stem}_dynamic.{export_format}"
+    return f"{stem}_{imgsz}.{export_format}"
+
+
+def export_model(weights_path: str, export_format: str, imgsz: int, dynamic: bool):
+    """Export a .pt model to ONNX or TorchScript once and return the cached file"""
+    path = export_path(weights_path, export_format, imgsz, dynamic)
+    with _export_lock:
+        if os.path.exists(path):
+            return path
+
+        try:
+            from ultralytics import YOLO
+        except ImportError:
+            raise Exception(
+                f"Model export {path} not found and ultralytics is not installed to create it"
+            )
+
+        logger.info(f"Exporting {weights_path} to {export_format} ({imgsz}px)")
+        # Export from a private copy so concurrent workers never share a half-written file
+        work_dir = tempfile.mkdtemp(dir=os.path.dirname(weights_path) or ".")
+        try:
+            work_weights = os.path.join(work_dir, os.path.basename(weights_path))
+            shutil.copy(weights_path, work_weights)
+            exported = YOLO(work_weights).export(
+                format=export_format, imgsz=imgsz, dynamic=dynamic
+            )
+            os.replace(exported, path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return path
+
+
+def letterbox(frame: np.ndarray, imgsz: int, auto: bool = False) -> np.ndarray:
+    """
+    Resize a BGR frame to fit an imgsz x imgsz network input, padding the borders
+
+    With `auto`, pads only up to the next multiple of the model stride
+    instead of to a square, like ultralytics does for .pt models; only
+    dynamic-shape exports accept such inputs. Returns the NCHW float blob.
+    """
+    height, width = frame.shape[:2]
+    gain = min(imgsz / height, imgsz / width)
+    new_width, new_height = round(width * gain), round(height * gain)
+
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(
+            frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR
+        )
+
+    pad_x, pad_y = imgsz - new_width, imgsz - new_height
+    if auto:
+        pad_x, pad_y = pad_x % MODEL_STRIDE, pad_y % MODEL_STRIDE
+    pad_x, pad_y = pad_x / 2, pad_y / 2
+    left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+    top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+    frame = cv2.copyMakeBorder(
+        frame,
+        top,
+        bottom,
+        left,
+        right,
+        cv2.BORDER_CONSTANT,
+        value=(LETTERBOX_FILL,) * 3,
+    )
+
+    blob = frame[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+    return np.ascontiguousarray(blob[None])
+
+
+class Boxes:
+    """Detections of one frame, shaped like ultralytics `Results.boxes`"""
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Boxes(self.xyxy[index : index + 1], self.conf[index], self.cls[index])
+
+
+class Detection:
+    """Result of one frame, exposing `boxes` like ultralytics `Results`"""
+
+    def __init__(self, boxes: Boxes):
+        self.boxes = boxes
+
+
+def non_max_suppression(prediction: np.ndarray) -> np.ndarray:
+    """
+    Per-class NMS of raw YOLOv8 output (4 + classes, anchors)
+
+    A NumPy port of ultralytics `non_max_suppression` with torchvision's
+    `nms`, in float32: same thresholds, class offsets, score order (stable,
+    descending) and suppression test (IoU > threshold). Returns rows of
+    (x1, y1, x2, y2, confidence, class) in the network input's coordinates.
+    """
+    prediction = prediction.T.astype(np.float32, copy=False)
+    scores = prediction[:, 4:]
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+
+    keep = confidences > CONFIDENCE_THRESHOLD
+    xywh, confidences = prediction[keep, :4], confidences[keep]
+    class_ids = class_ids[keep].astype(np.float32)
+    boxes = np.empty_like(xywh)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+
+    order = np.argsort(-confidences, kind="stable")
+    if len(order) > MAX_NMS_BOXES:
+        boxes, confidences, class_ids = (
+            boxes[order[:MAX_NMS_BOXES]],
+            confidences[order[:MAX_NMS_BOXES]],
+            class_ids[order[:MAX_NMS_BOXES]],
+        )
+        order = np.argsort(-confidences, kind="stable")
+
+    # Offset each class so boxes of different classes never overlap
+    shifted = boxes + (class_ids * np.float32(MAX_BOX_SIZE))[:, None]
+    x1, y1, x2, y2 = shifted.T
+    areas = (x2 - x1) * (y2 - y1)
+
+    suppressed = np.zeros(len(order), dtype=bool)
+    selected = []
+    for position, index in enumerate(order):
+        if suppressed[position]:
+            continue
+        selected.append(index)
+        if len(selected) == MAX_DETECTIONS:
+            break
+        rest = order[position + 1 :]
+        width = np.maximum(
+            np.float32(0),
+            np.minimum(x2[index], x2[rest]) - np.maximum(x1[index], x1[rest]),
+        )
+        height = np.maximum(
+            np.float32(0),
+            np.minimum(y2[index], y2[rest]) - np.maximum(y1[index], y1[rest]),
+        )
+        intersection = width * height
+        overlap = intersection / (areas[index] + areas[rest] - intersection)
+        suppressed[position + 1 :] |= overlap > IOU_THRESHOLD
+
+    selected = np.array(selected, dtype=int)
+    return np.concatenate(
+        [boxes[selected], confidences[selected, None], class_ids[selected, None]],
+        axis=1,
+    )
+
+
+def postprocess(
+    prediction: np.ndarray,
+    input_shape: Tuple[int, ...],
+    frame_shape: Tuple[int, ...],
+) -> Detection:
+    """
+    Turn raw YOLOv8 output (4 + classes, anchors) into source-frame detections
+
+    Applies NMS, then maps boxes from the `input_shape` (height, width)
+    network input back to the frame like ultralytics `scale_boxes`.
+    """
+    detections = non_max_suppression(prediction)
+    xyxy = detections[:, :4]
+
+    height, width = frame_shape[:2]
+    gain = min(input_shape[0] / height, input_shape[1] / width)
+    pad_x = round((input_shape[1] - width * gain) / 2 - 0.1)
+    pad_y = round((input_shape[0] - height * gain) / 2 - 0.1)
+    xyxy[:, [0, 2]] -= pad_x
+    xyxy[:, [1, 3]] -= pad_y
+    xyxy /= gain
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+
+    return Detection(
+        Boxes(
+            xyxy.astype(np.float32),
+            detections[:, 4].astype(np.float32),
+            detections[:, 5].astype(np.float32),
+        )
+    )
+
+
+class ExportedModel:
+    """
+    YOLOv8 model exported from its .pt weights and run on another runtime
+
+    Called like an ultralytics model and returning objects with the same
+    `boxes` interface. Pre- and post-processing follow the ultralytics
+    predictor, so every runtime, torch included, produces the same
+    detections for the same network output. Dynamic-shape exports get the
+    same stride-padded input as torch; fixed-shape ones a square input.
+    """
+
+    def __init__(self, weights_path: str, backend: str):
+        if backend not in BACKENDS:
+            raise Exception(f"Unknown inference backend: {backend}")
+        self.weights_path = weights_path
+        self.backend = backend
+        self.export_format, self.dynamic, self.runner_class = BACKENDS[backend]
+        self._runners: Dict[int, object] = {}
+        # Model file loaded for each input size
+        self.files: Dict[int, str] = {}
+
+    def model_path(self, imgsz: int) -> str:
+        return export_model(self.weights_path, self.export_format, imgsz, self.dynamic)
+
+    def runner(self, imgsz: int):
+        """
+        Runtime session for an input size, exporting the model if needed
+
+        A dynamic-shape model is loaded once and shared by every input size.
+        """
+        key = None if self.dynamic else imgsz
+        if key not in self._runners:
+            path = self.model_path(imgsz)
+            logger.info(f"Loading {path} with {self.backend}")
+            self._runners[key] = self.runner_class(path)
+            self._runners[key].path = path
+        self.files[imgsz] = self._runners[key].path
+        return self._runners[key]
+
+    def __call__(self, source, verbose=False, imgsz: int = None, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        imgsz = imgsz or EXPORT_IMGSZ
+        runner = self.runner(imgsz)
+
+        # Like ultralytics, pad to the stride only when the batch shares one shape
+        auto = self.dynamic and len({frame.shape for frame in frames}) == 1
+        blobs = [letterbox(frame, imgsz, auto) for frame in frames]
+        if runner.supports_batch:
+            outputs = runner.run(np.concatenate(blobs))
+        else:
+            outputs = np.concatenate([runner.run(blob) for blob in blobs])
+
+        return [
+            postprocess(output, blob.shape[2:], frame.shape)
+            for output, frame, blob in zip(outputs, frames, blobs)
+        ]
+
+    def to(self, device):
+        return self
+
+
+def available_backends() -> List[str]:
+    """Backends whose runtime can be imported in this environment"""
+    modules = {
+        "torch": "ultralytics",
+        "onnxruntime": "onnxruntime",
+        "openvino": "openvino",
+        "opencv": "cv2",
+        "torchscript": "torch",
+    }
+    available = []
+    for backend, module in modules.items():
+        try:
+            __import__(module)
+            available.append(backend)
+        except ImportError:
+            pass
+    return available
@@ -0,0 +1,132 @@
+import os
+import time
+import logging
+import cv2
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Give every worker process its own share of the CPU cores
+CPU_PARTITIONING = os.getenv("CPU_PARTITIONING", "true").lower() == "true"
+
+# Also pin each worker to its cores with sched_setaffinity (Linux only)
+CPU_PINNING = os.getenv("CPU_PINNING", "false").lower() == "true"
+
+# Torch inter-op threads per worker; intra-op threads use every core of the slot
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "1"))
+
+# Environment read by the OpenMP/BLAS runtimes when they start
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# Slot of this process, set by configure_slot
+_slot = None
+
+
+def available_cores() -> List[int]:
+    """CPU cores this process may run on (respects container CPU sets)"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def partition_cores(cores: List[int], slots: int) -> List[List[int]]:
+    """Split cores into `slots` contiguous sets whose sizes differ by at most one"""
+    slots = max(1, min(slots, len(cores)))
+    size, extra = divmod(len(cores), slots)
+    sets = []
+    start = 0
+    for index in range(slots):
+        end = start + size + (1 if index < extra else 0)
+        sets.append(cores[start:end])
+        start = end
+    return sets
+
+
+def usage_mark() -> Tuple[float, float]:
+    """Wall clock and CPU time of this process, to measure utilization from"""
+    return time.monotonic(), time.process_time()
+
+
+class CpuSlot:
+    """Set of cores one worker process runs its inference threads on"""
+
+    def __init__(self, index: int, cores: List[int], pinned: bool):
+        self.index = index
+        self.cores = cores
+        self.threads = len(cores)
+        self.pinned = pinned
+
+    def utilization(self, mark: Tuple[float, float]) -> float:
+        """Share of the slot's cores this process kept busy since `mark`"""
+        wall, cpu = usage_mark()
+        elapsed = wall - mark[0]
+        if elapsed <= 0:
+            return 0.0
+        return (cpu - mark[1]) / (elapsed * len(self.cores))
+
+    def describe(self) -> Dict:
+        return {
+            "index": self.index,
+            "cores": self.cores,
+            "threads": self.threads,
+            "interop_threads": TORCH_INTEROP_THREADS,
+            "pinned": self.pinned,
+        }
+
+
+def configure_slot(index: int, slots: int) -> Optional[CpuSlot]:
+    """
+    Limit this process to slot `index` of `slots`
+
+    Must run before torch or another inference runtime starts its thread
+    pools. Returns None if CPU_PARTITIONING is disabled.
+    """
+    global _slot
+
+    if not CPU_PARTITIONING:
+        return None
+
+    core_sets = partition_cores(available_cores(), slots)
+    # More workers than cores: workers share sets round-robin
+    cores = core_sets[index % len(core_sets)]
+    threads = len(cores)
+
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    cv2.setNumThreads(threads)
+
+    pinned = False
+    if CPU_PINNING:
+        try:
+            os.sched_setaffinity(0, cores)
+            pinned = True
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Could not pin slot {index} to cores {cores}: {str(e)}")
+
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(TORCH_INTEROP_THREADS)
+    except ImportError:
+        pass
+    except RuntimeError as e:
+        # Inter-op threads can only be set before torch runs parallel work
+        logger.warning(f"Could not set torch inter-op threads: {str(e)}")
+
+    _slot = CpuSlot(index, cores, pinned)
+    logger.info(
+        f"CPU slot {index}/{slots}: {threads} threads on cores {cores}"
+        + (" (pinned)" if pinned else "")
+    )
+    return _slot
+
+
+def current_slot() -> Optional[CpuSlot]:
+    return _slot
+
+
+def inference_threads() -> Optional[int]:
+    """Intra-op threads for inference runtimes, None to use their default"""
+    return _slot.threads if _slot is not None else None
@@ -1,7 +1,8 @@
+from sqlalchemy import DateTime, extract, func, type_coerce
 from sqlalchemy.orm import Session
 from . import models, schemas
 from .auth import get_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 # User CRUD operations
@@ -66,6 +67,7 @@ def update_video_status(
     result_path: str = None,
     json_result_path: str = None,
     error_message: str = None,
+    summary: dict = None,
 ):
     db_video = db.query(models.Video).filter(models.Video.id == video_id).first()
     db_video.status = status
@@ -75,14 +77,323 @@ def update_video_status(
         db_video.json_result_path = json_result_path
     if error_message:
         db_video.error_message = error_message
+    # Summary columns of the results, see result_store.video_summary
+    for key, value in (summary or {}).items():
+        setattr(db_video, key, value)
     db_video.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_video)
     return db_video
 
 
+def replace_count_buckets(db: Session, video_id: int, buckets: list):
+    """Store the per-minute counts of a video, dropping those of earlier runs"""
+    db.query(models.CountBucket).filter(models.CountBucket.video_id == video_id).delete(
+        synchronize_session=False
+    )
+    db.bulk_insert_mappings(
+        models.CountBucket, [{"video_id": video_id, **bucket} for bucket in buckets]
+    )
+    db.commit()
+
+
 def delete_video(db: Session, video_id: int):
     db_video = db.query(models.Video).filter(models.Video.id == video_id).first()
     db.delete(db_video)
     db.commit()
     return db_video
+
+
+# Camera CRUD operations
+def get_camera(db: Session, camera_id: int):
+    return db.query(models.Camera).filter(models.Camera.id == camera_id).first()
+
+
+def get_user_cameras(db: Session, user_id: int):
+    return db.query(models.Camera).filter(models.Camera.user_id == user_id).all()
+
+
+def create_camera(db: Session, camera: schemas.CameraCreate, user_id: int):
+    db_camera = models.Camera(**camera.model_dump(), user_id=user_id)
+    db.add(db_camera)
+    db.commit()
+    db.refresh(db_camera)
+    return db_camera
+
+
+def update_camera(db: Session, camera_id: int, camera_update: schemas.CameraUpdate):
+    db_camera = get_camera(db, camera_id)
+
+    # Update only provided fields
+    update_data = camera_update.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(db_camera, key, value)
+
+    db_camera.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(db_camera)
+    return db_camera
+
+
+# Job CRUD operations
+def create_job(db: Session, video_id: int, model_size: str = "nano", max_attempts=3):
+    db_job = models.Job(
+        video_id=video_id,
+        status="queued",
+        model_size=model_size,
+        max_attempts=max_attempts,
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def get_job(db: Session, job_id: int):
+    return db.query(models.Job).filter(models.Job.id == job_id).first()
+
+
+def claim_next_job(db: Session, worker_id: str):
+    """Atomically claim the oldest queued job for a worker, or return None"""
+    while True:
+        candidate = (
+            db.query(models.Job.id)
+            .filter(models.Job.status == "queued")
+            .order_by(models.Job.id)
+            .first()
+        )
+        if candidate is None:
+            return None
+
+        # Only one worker can win the status transition for a given job
+        now = datetime.utcnow()
+        claimed = (
+            db.query(models.Job)
+            .filter(models.Job.id == candidate.id, models.Job.status == "queued")
+            .update(
+                {
+                    models.Job.status: "running",
+                    models.Job.worker_id: worker_id,
+                    models.Job.claimed_at: now,
+                    models.Job.heartbeat_at: now,
+                    models.Job.attempts: models.Job.attempts + 1,
+                    models.Job.updated_at: now,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed:
+            return get_job(db, candidate.id)
+
+
+def heartbeat_job(db: Session, job_id: int, worker_id: str):
+    """Refresh the heartbeat of a running job; returns False if the claim was lost"""
+    updated = (
+        db.query(models.Job)
+        .filter(
+            models.Job.id == job_id,
+            models.Job.worker_id == worker_id,
+            models.Job.status == "running",
+        )
+        .update({models.Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return bool(updated)
+
+
+def finish_job(db: Session, job_id: int, status: str, error_message: str = None):
+    db_job = get_job(db, job_id)
+    db_job.status = status
+    if error_message:
+        db_job.error_message = error_message
+    db_job.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def requeue_stale_jobs(db: Session, stale_after_seconds: int):
+    """
+    Re-queue running jobs whose worker stopped sending heartbeats
+
+    Jobs that already used all their attempts are marked failed together
+    with their video. Returns the list of affected jobs.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_seconds)
+    stale_jobs = (
+        db.query(models.Job)
+        .filter(models.Job.status == "running", models.Job.heartbeat_at < cutoff)
+        .all()
+    )
+
+    for db_job in stale_jobs:
+        if db_job.attempts >= db_job.max_attempts:
+            db_job.status = "failed"
+            db_job.error_message = "Worker stopped responding"
+            db_job.video.status = "failed"
+            db_job.video.error_message = "Worker stopped responding"
+        else:
+            db_job.status = "queued"
+            db_job.video.status = "pending"
+        db_job.worker_id = None
+        db_job.updated_at = datetime.utcnow()
+
+    db.commit()
+    return stale_jobs
+
+
+def register_worker(db: Session, worker_id: str, cpu_slot: dict = None):
+    """Record a starting worker, not ready until its models are warm"""
+    now = datetime.utcnow()
+    db_worker = db.query(models.Worker).filter(models.Worker.id == worker_id).first()
+    if db_worker is None:
+        db_worker = models.Worker(id=worker_id)
+        db.add(db_worker)
+    db_worker.ready = False
+    db_worker.models = {}
+    db_worker.cpu_slot = cpu_slot
+    db_worker.started_at = now
+    db_worker.heartbeat_at = now
+    db.commit()
+    db.refresh(db_worker)
+    return db_worker
+
+
+def set_worker_models(db: Session, worker_id: str, model_status: dict, ready: bool):
+    db.query(models.Worker).filter(models.Worker.id == worker_id).update(
+        {
+            models.Worker.models: model_status,
+            models.Worker.ready: ready,
+            models.Worker.heartbeat_at: datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def heartbeat_worker(db: Session, worker_id: str, cpu_slot: dict = None):
+    values = {models.Worker.heartbeat_at: datetime.utcnow()}
+    if cpu_slot is not None:
+        values[models.Worker.cpu_slot] = cpu_slot
+    db.query(models.Worker).filter(models.Worker.id == worker_id).update(
+        values, synchronize_session=False
+    )
+    db.commit()
+
+
+def get_live_workers(db: Session, stale_after_seconds: int):
+    """Workers that sent a heartbeat within the last `stale_after_seconds`"""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_seconds)
+    return (
+        db.query(models.Worker)
+        .filter(models.Worker.heartbeat_at >= cutoff)
+        .order_by(models.Worker.id)
+        .all()
+    )
+
+
+# Analytics
+def get_video_count_groups(
+    db: Session,
+    user_id: int,
+    start: datetime = None,
+    end: datetime = None,
+    model_size: str = None,
+    status: str = None,
+):
+    """
+    Summary columns of a user's videos summed per creation date, hour and status
+
+    One grouped query over the video rows; callers roll the groups up into
+    totals and distributions.
+    """
+    day = func.date(models.Video.created_at)
+    hour = extract("hour", models.Video.created_at)
+    weekday = extract("dow", models.Video.created_at)  # 0 is Sunday
+    query = db.query(
+        day.label("day"),
+        hour.label("hour"),
+        weekday.label("weekday"),
+        models.Video.status.label("status"),
+        func.count(models.Video.id).label("videos"),
+        func.sum(models.Video.car_count).label("car"),
+        func.sum(models.Video.motorcycle_count).label("motorcycle"),
+        func.sum(models.Video.bus_count).label("bus"),
+        func.sum(models.Video.truck_count).label("truck"),
+        func.sum(models.Video.processed_frames).label("processed_frames"),
+        func.sum(models.Video.duration_seconds).label("duration_seconds"),
+        func.sum(models.Video.processing_time).label("processing_time"),
+    ).filter(models.Video.user_id == user_id)
+
+    if start is not None:
+        query = query.filter(models.Video.created_at >= start)
+    if end is not None:
+        query = query.filter(models.Video.created_at < end)
+    if model_size:
+        query = query.filter(models.Video.model_size == model_size)
+    if status:
+        query = query.filter(models.Video.status == status)
+
+    return query.group_by(day, hour, weekday, models.Video.status).all()
+
+
+def _bucket_key(db: Session, interval: str):
+    """
+    Expression grouping count buckets by `interval`
+
+    Hours, days and weeks are keyed by the datetime they start at on every
+    database; SQLite gives the start as text, read back as a datetime.
+    """
+    column = models.CountBucket.bucket_start
+    if interval == "hour_of_day":
+        return extract("hour", column)
+    if interval == "weekday":
+        return extract("dow", column)  # 0 is Sunday
+    if db.bind.dialect.name == "sqlite":
+        if interval == "hour":
+            start = func.strftime("%Y-%m-%d %H:00:00", column)
+        elif interval == "day":
+            start = func.strftime("%Y-%m-%d 00:00:00", column)
+        else:
+            # Monday of the week
+            start = func.strftime("%Y-%m-%d 00:00:00", column, "-6 days", "weekday 1")
+        return type_coerce(start, DateTime)
+    return func.date_trunc(interval, column)
+
+
+def get_traffic_counts(
+    db: Session,
+    user_id: int,
+    interval: str,
+    start: datetime = None,
+    end: datetime = None,
+    camera_id: int = None,
+    model_size: str = None,
+):
+    """
+    Vehicles counted per type in a user's count buckets, summed per `interval`
+
+    `interval` is hour, day or week for a time series, or hour_of_day or
+    weekday for a profile. `start` and `end` bound the bucket times.
+    """
+    key = _bucket_key(db, interval)
+    query = (
+        db.query(
+            key.label("key"),
+            models.CountBucket.vehicle_type,
+            func.sum(models.CountBucket.count).label("count"),
+        )
+        .join(models.Video, models.Video.id == models.CountBucket.video_id)
+        .filter(models.Video.user_id == user_id)
+    )
+    if start is not None:
+        query = query.filter(models.CountBucket.bucket_start >= start)
+    if end is not None:
+        query = query.filter(models.CountBucket.bucket_start < end)
+    if camera_id is not None:
+        query = query.filter(models.Video.camera_id == camera_id)
+    if model_size:
+        query = query.filter(models.Video.model_size == model_size)
+
+    return query.group_by(key, models.CountBucket.vehicle_type).order_by(key).all()
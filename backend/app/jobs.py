@@ -0,0 +1,342 @@
+import os
+import json
+import socket
+import threading
+import time
+import logging
+import traceback
+
+from . import crud
+from .cpu_slots import configure_slot, current_slot, usage_mark
+from .database import SessionLocal
+from .result_artifacts import build_artifacts
+from .result_store import minute_buckets, video_summary
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of worker processes started by worker.py
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "2"))
+
+# Seconds between heartbeats of a running job
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+
+# A running job without a heartbeat for this long is considered crashed
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "60"))
+
+# Seconds an idle worker waits before polling the queue again
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+
+# How many times a job is attempted before it is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Model sizes every worker loads and warms up before claiming jobs
+WARMUP_MODEL_SIZES = [
+    size.strip()
+    for size in os.getenv("WARMUP_MODEL_SIZES", "nano").split(",")
+    if size.strip()
+]
+
+# Dummy inferences run on each warm-up model
+WARMUP_INFERENCES = int(os.getenv("WARMUP_INFERENCES", "3"))
+
+
+def enqueue_video(db, video_id: int, model_size: str = "nano"):
+    """Queue a video for processing by the worker pool"""
+    return crud.create_job(
+        db, video_id=video_id, model_size=model_size, max_attempts=JOB_MAX_ATTEMPTS
+    )
+
+
+def _complete_video(db, video_id: int, result_path: str, json_path: str):
+    """Mark a video completed with its results summary and per-minute counts"""
+    try:
+        with open(json_path, "r") as f:
+            manifest = json.load(f)
+        summary = video_summary(manifest)
+    except Exception as e:
+        logger.error(f"Error reading results summary from {json_path}: {str(e)}")
+        manifest, summary = None, None
+
+    # Compressed responses for the results endpoint; rebuilt on request if missing
+    try:
+        build_artifacts(json_path)
+    except Exception as e:
+        logger.error(f"Error building result artifacts of video {video_id}: {str(e)}")
+
+    video = crud.update_video_status(
+        db=db,
+        video_id=video_id,
+        status="completed",
+        result_path=result_path,
+        json_result_path=json_path,
+        summary=summary,
+    )
+
+    if manifest is not None:
+        # Minutes of the recording, or of the upload if its start is unknown
+        start_time = video.recorded_at or video.created_at
+        try:
+            crud.replace_count_buckets(
+                db, video_id, minute_buckets(manifest, start_time)
+            )
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error storing count buckets of video {video_id}: {str(e)}")
+
+
+def process_video_task(
+    video_id: int,
+    video_path: str,
+    file_id: str,
+    model_size: str = "nano",
+    roi=None,
+    inference_size: int = None,
+    abort: threading.Event = None,
+):
+    """
+    Process a video and store the outcome on its database row
+
+    `roi` restricts inference to a polygon given as [x, y] frame fractions,
+    `inference_size` is the longest side frames are downscaled to. Setting
+    `abort` stops processing and leaves the video row untouched.
+
+    Returns True if the video was processed, False if it was marked failed
+    or aborted.
+    """
+    logger.info(
+        f"Starting processing for video {video_id} with model size {model_size}"
+    )
+    # Imported here so only worker processes load the AI stack
+    from .ai import ProcessingAborted, process_video
+
+    db_session = SessionLocal()
+    try:
+        # Update video status to processing
+        crud.update_video_status(db=db_session, video_id=video_id, status="processing")
+
+        # Create required directories if they don't exist
+        os.makedirs("models", exist_ok=True)
+        os.makedirs("results", exist_ok=True)
+
+        # Process the video with specified model size
+        try:
+            result_path, json_path = process_video(
+                video_path,
+                file_id,
+                model_size,
+                roi=roi,
+                inference_size=inference_size,
+                abort=abort,
+            )
+            if abort is not None and abort.is_set():
+                raise ProcessingAborted("Processing stopped after the last frame")
+
+            # Update video with results
+            _complete_video(db_session, video_id, result_path, json_path)
+            logger.info(f"Video {video_id} processed successfully")
+            return True
+        except ProcessingAborted as e:
+            # Another worker took the job over, the video is left to it
+            logger.warning(f"Stopped processing video {video_id}: {str(e)}")
+            return False
+        except Exception as e:
+            # A ModelLoadError included: `_load_model` already falls back to
+            # the default model where that is allowed, and an INT8 job must fail
+            # rather than be rerun on another model
+            logger.error(f"Error during video processing: {str(e)}")
+            logger.error(traceback.format_exc())
+            if abort is not None and abort.is_set():
+                # The job was taken over meanwhile, the failure is not ours to record
+                return False
+
+            # Update video status to failed
+            crud.update_video_status(
+                db=db_session,
+                video_id=video_id,
+                status="failed",
+                error_message=str(e)[:200],
+            )  # Store truncated error message
+            return False
+
+    except Exception as e:
+        logger.error(f"Error processing video {video_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        try:
+            crud.update_video_status(
+                db=db_session,
+                video_id=video_id,
+                status="failed",
+                error_message=str(e)[:200],
+            )
+        except Exception as db_error:
+            logger.error(f"Error updating video status: {str(db_error)}")
+        return False
+    finally:
+        db_session.close()
+
+
+def _heartbeat(
+    job_id: int, worker_id: str, stop: threading.Event, lost: threading.Event
+):
+    """Keep the claim on a job alive until `stop` is set; set `lost` if it is lost"""
+    while not stop.wait(JOB_HEARTBEAT_SECONDS):
+        db = SessionLocal()
+        try:
+            if not crud.heartbeat_job(db, job_id, worker_id):
+                logger.warning(f"Worker {worker_id} lost its claim on job {job_id}")
+                lost.set()
+                return
+        except Exception as e:
+            logger.error(f"Error sending heartbeat for job {job_id}: {str(e)}")
+        finally:
+            db.close()
+
+
+def run_job(job_id: int, worker_id: str):
+    """Process a claimed job while sending heartbeats, then record its outcome"""
+    db = SessionLocal()
+    try:
+        job = crud.get_job(db, job_id)
+        video = job.video
+        file_id = os.path.splitext(os.path.basename(video.file_path))[0]
+        video_id, video_path, model_size = video.id, video.file_path, job.model_size
+        # A region of interest on the video overrides the one of its camera
+        roi = video.roi or (video.camera.roi if video.camera else None)
+        inference_size = video.inference_size
+    finally:
+        db.close()
+
+    stop = threading.Event()
+    lost = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job_id, worker_id, stop, lost), daemon=True
+    )
+    heartbeat.start()
+    try:
+        succeeded = process_video_task(
+            video_id,
+            video_path,
+            file_id,
+            model_size,
+            roi=roi,
+            inference_size=inference_size,
+            abort=lost,
+        )
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if lost.is_set():
+        # The worker that took the job over records its outcome
+        logger.warning(f"Job {job_id} was taken over, not finishing it")
+        return
+
+    db = SessionLocal()
+    try:
+        job = crud.get_job(db, job_id)
+        if job.worker_id != worker_id or job.status != "running":
+            # The job was re-queued while we were working on it, leave it alone
+            logger.warning(f"Job {job_id} is no longer owned by worker {worker_id}")
+            return
+        crud.finish_job(
+            db,
+            job_id,
+            status="completed" if succeeded else "failed",
+            error_message=None if succeeded else job.video.error_message,
+        )
+    finally:
+        db.close()
+
+
+def _worker_heartbeat(worker_id: str):
+    """Keep the worker listed as live, with the utilization of its CPU slot"""
+    slot = current_slot()
+    mark = usage_mark()
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        cpu_slot = None
+        if slot is not None:
+            cpu_slot = {**slot.describe(), "utilization": slot.utilization(mark)}
+            mark = usage_mark()
+
+        db = SessionLocal()
+        try:
+            crud.heartbeat_worker(db, worker_id, cpu_slot)
+        except Exception as e:
+            logger.error(f"Error sending heartbeat for worker {worker_id}: {str(e)}")
+        finally:
+            db.close()
+
+
+def warm_up_worker(worker_id: str):
+    """Load and warm up WARMUP_MODEL_SIZES, then report the worker as ready"""
+    from .ai import warm_up_models
+
+    db = SessionLocal()
+    try:
+        slot = current_slot()
+        crud.register_worker(db, worker_id, slot.describe() if slot else None)
+    finally:
+        db.close()
+    threading.Thread(target=_worker_heartbeat, args=(worker_id,), daemon=True).start()
+
+    model_status = warm_up_models(WARMUP_MODEL_SIZES, WARMUP_INFERENCES)
+    ready = all(status["ready"] for status in model_status.values())
+
+    db = SessionLocal()
+    try:
+        crud.set_worker_models(db, worker_id, model_status, ready)
+    finally:
+        db.close()
+    logger.info(f"Worker {worker_id} warm-up done, ready: {ready}")
+
+
+def worker_loop(worker_index: int):
+    """Claim and run jobs forever; entry point of each worker process"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{worker_index}"
+    logger.info(f"Worker {worker_id} started")
+
+    # Before the AI stack loads, so its thread pools are sized for the slot
+    configure_slot(worker_index, WORKER_PROCESSES)
+
+    # Pay for model loading before the first job rather than inside it
+    try:
+        warm_up_worker(worker_id)
+    except Exception as e:
+        logger.error(f"Worker {worker_id} warm-up failed: {str(e)}")
+
+    while True:
+        db = SessionLocal()
+        try:
+            job = crud.claim_next_job(db, worker_id)
+            job_id = job.id if job else None
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed to claim a job: {str(e)}")
+            job_id = None
+        finally:
+            db.close()
+
+        if job_id is None:
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+
+        logger.info(f"Worker {worker_id} claimed job {job_id}")
+        try:
+            run_job(job_id, worker_id)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed to run job {job_id}: {str(e)}")
+            logger.error(traceback.format_exc())
+
+
+def requeue_stale_jobs():
+    """Put jobs of crashed workers back on the queue"""
+    db = SessionLocal()
+    try:
+        for job in crud.requeue_stale_jobs(db, JOB_STALE_SECONDS):
+            logger.warning(
+                f"Job {job.id} for video {job.video_id} had no heartbeat, now {job.status}"
+            )
+    finally:
+        db.close()
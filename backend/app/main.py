@@ -6,39 +6,71 @@ from fastapi import (
     File,
     UploadFile,
     Form,
-    BackgroundTasks,
     Request,
 )
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    ORJSONResponse,
+    Response,
+    StreamingResponse,
+)
 from typing import List, Optional
 import shutil
+import itertools
 import os
 import uuid
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta, timezone
 from sqlalchemy.orm import Session
-import traceback
 from starlette.responses import FileResponse
 from starlette.staticfiles import StaticFiles as StarletteStaticFiles
 import mimetypes
 
-from . import models, schemas, crud, auth
-from .database import engine, get_db
-from .ai import process_video
+from . import models, schemas, crud, auth, jobs
+from .analytics import TRAFFIC_INTERVALS, summarize_groups, summarize_traffic
+from .database import engine, get_db, add_missing_columns
+from .result_store import (
+    FRAME_FIELDS,
+    is_columnar,
+    iter_results_json,
+    load_results,
+    partial_path,
+    read_frames,
+    store_dir,
+    time_series,
+)
+from .result_artifacts import (
+    choose_encoding,
+    etag_matches,
+    get_artifacts,
+    remove_artifacts,
+)
+from .quantization import quantized_runtime_available
+from .roi import parse_roi
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 models.Base.metadata.create_all(bind=engine)
+add_missing_columns(models.Base.metadata)
 
 # Define file size limit (200MB)
 MAX_FILE_SIZE = 200 * 1024 * 1024  # 200MB in bytes
 
-app = FastAPI(title="Traffic Vision AI API")
+# Allowed inference resolutions (longest side in pixels)
+MIN_INFERENCE_SIZE = 128
+MAX_INFERENCE_SIZE = 1920
+
+# FP32 model sizes; each also has an INT8 variant ("nano-int8", ...)
+MODEL_SIZES = ["nano", "small", "medium", "large", "x-large"]
+
+# Responses are encoded with orjson rather than the standard library encoder
+app = FastAPI(title="Traffic Vision AI API", default_response_class=ORJSONResponse)
 
 # Configure CORS for frontend - allow all origins in development
 app.add_middleware(
@@ -164,90 +196,6 @@ app.mount("/uploads", CORSStaticFiles(directory="uploads", html=False), name="up
 app.mount("/results", CORSStaticFiles(directory="results", html=False), name="results")
 
 
-# Background task for video processing
-def process_video_task(
-    video_id: int,
-    video_path: str,
-    file_id: str,
-    model_size: str = "nano",
-    db: Session = Depends(get_db),
-):
-    logger.info(
-        f"Starting background processing for video {video_id} with model size {model_size}"
-    )
-    try:
-        # Update video status to processing
-        db_session = next(get_db())
-        crud.update_video_status(db=db_session, video_id=video_id, status="processing")
-
-        # Create required directories if they don't exist
-        os.makedirs("models", exist_ok=True)
-        os.makedirs("results", exist_ok=True)
-
-        # Process the video with specified model size
-        try:
-            result_path, json_path = process_video(video_path, file_id, model_size)
-
-            # Update video with results
-            crud.update_video_status(
-                db=db_session,
-                video_id=video_id,
-                status="completed",
-                result_path=result_path,
-                json_result_path=json_path,
-            )
-            logger.info(f"Video {video_id} processed successfully")
-        except Exception as e:
-            # If error is related to model loading, retry with default model
-            logger.error(f"Error during video processing: {str(e)}")
-            logger.error(traceback.format_exc())
-
-            if "model" in str(e).lower():
-                logger.info("Attempting to process with default model")
-                try:
-                    result_path, json_path = process_video(video_path, file_id, "nano")
-
-                    # Update video with results
-                    crud.update_video_status(
-                        db=db_session,
-                        video_id=video_id,
-                        status="completed",
-                        result_path=result_path,
-                        json_result_path=json_path,
-                    )
-                    logger.info(
-                        f"Video {video_id} processed successfully with fallback model"
-                    )
-                    return
-                except Exception as fallback_error:
-                    logger.error(
-                        f"Fallback processing also failed: {str(fallback_error)}"
-                    )
-
-            # Update video status to failed if all attempts failed
-            db_session = next(get_db())
-            crud.update_video_status(
-                db=db_session,
-                video_id=video_id,
-                status="failed",
-                error_message=str(e)[:200],
-            )  # Store truncated error message
-
-    except Exception as e:
-        logger.error(f"Error processing video {video_id}: {str(e)}")
-        logger.error(traceback.format_exc())
-        try:
-            db_session = next(get_db())
-            crud.update_video_status(
-                db=db_session,
-                video_id=video_id,
-                status="failed",
-                error_message=str(e)[:200],
-            )
-        except Exception as db_error:
-            logger.error(f"Error updating video status: {str(db_error)}")
-
-
 # Authentication endpoints
 @app.post("/api/register", response_model=schemas.User)
 def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
@@ -273,14 +221,39 @@ def login_for_access_token(form_data: schemas.TokenData, db: Session = Depends(g
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC, like datetime.utcnow()"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _model_sizes() -> List[str]:
+    """Model sizes uploads may ask for; INT8 sizes only with a runtime to run them"""
+    sizes = list(MODEL_SIZES)
+    if quantized_runtime_available():
+        sizes += [f"{size}-int8" for size in MODEL_SIZES]
+    return sizes
+
+
+@app.get("/api/models")
+def get_model_sizes(
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+):
+    return {"model_sizes": _model_sizes()}
+
+
 # Video processing endpoints
 @app.post("/api/videos/upload")
 async def upload_video(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     name: str = Form(...),
     description: Optional[str] = Form(None),
     model_size: str = Form("nano"),
+    inference_size: Optional[int] = Form(None),
+    roi: Optional[str] = Form(None),
+    camera_id: Optional[int] = Form(None),
+    recorded_at: Optional[datetime] = Form(None),
     current_user: schemas.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db),
 ):
@@ -314,11 +287,40 @@ async def upload_video(
         )
 
     # Validate model size
-    valid_sizes = ["nano", "small", "medium", "large", "x-large"]
+    valid_sizes = _model_sizes()
+    if model_size.endswith("-int8") and model_size not in valid_sizes:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "message": "INT8 models need onnxruntime or OpenVINO, which this server does not have"
+            },
+        )
     if model_size not in valid_sizes:
         model_size = "nano"  # Default to nano if invalid
         logger.warning(f"Invalid model size specified, using default: {model_size}")
 
+    # Validate inference resolution, YOLO needs a multiple of its 32 pixel stride
+    if inference_size is not None:
+        if not MIN_INFERENCE_SIZE <= inference_size <= MAX_INFERENCE_SIZE:
+            return JSONResponse(
+                status_code=400,
+                content={
+                    "message": f"Inference size must be between {MIN_INFERENCE_SIZE} and {MAX_INFERENCE_SIZE} pixels"
+                },
+            )
+        inference_size = -(-inference_size // 32) * 32
+
+    # Validate region of interest (JSON list of [x, y] frame fractions)
+    try:
+        roi = parse_roi(roi)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+
+    if camera_id is not None:
+        camera = crud.get_camera(db, camera_id=camera_id)
+        if camera is None or camera.user_id != current_user.id:
+            return JSONResponse(status_code=400, content={"message": "Unknown camera"})
+
     # Generate unique filename
     file_id = str(uuid.uuid4())
     file_extension = os.path.splitext(file.filename)[1]
@@ -338,14 +340,16 @@ async def upload_video(
             file_path=video_path,
             status="pending",
             model_size=model_size,
+            inference_size=inference_size,
+            roi=roi,
+            camera_id=camera_id,
+            recorded_at=_naive_utc(recorded_at),
         ),
         user_id=current_user.id,
     )
 
-    # Start video processing in background
-    background_tasks.add_task(
-        process_video_task, video.id, video_path, file_id, model_size, db
-    )
+    # Queue video for processing by the worker pool (see worker.py)
+    jobs.enqueue_video(db, video_id=video.id, model_size=model_size)
 
     return {
         "id": video.id,
@@ -392,8 +396,12 @@ def delete_video(
         os.remove(video.file_path)
     if video.result_path and os.path.exists(video.result_path):
         os.remove(video.result_path)
-    if video.json_result_path and os.path.exists(video.json_result_path):
-        os.remove(video.json_result_path)
+    if video.json_result_path:
+        remove_artifacts(video.json_result_path)
+        if os.path.isdir(store_dir(video.json_result_path)):
+            shutil.rmtree(store_dir(video.json_result_path))
+        if os.path.exists(video.json_result_path):
+            os.remove(video.json_result_path)
 
     # Delete from database
     crud.delete_video(db, video_id=video_id)
@@ -488,23 +496,196 @@ async def download_processed_video(
         )
 
 
+def _results_response(json_path: str, frames: bool):
+    """
+    Results file as a response, without re-encoding stored JSON
+
+    Legacy results files are sent as they are; columnar stores are streamed
+    chunk by chunk. Without frames the small manifest is encoded with orjson.
+    """
+    if not frames:
+        return ORJSONResponse(load_results(json_path, include_frames=False))
+    if is_columnar(json_path):
+        # Opened up front so a missing file is a FileNotFoundError here
+        body = iter_results_json(json_path)
+        return StreamingResponse(
+            itertools.chain([next(body)], body), media_type="application/json"
+        )
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(json_path)
+    return FileResponse(json_path, media_type="application/json")
+
+
+def _completed_results_response(request: Request, json_path: str, frames: bool):
+    """
+    Results of a completed video from its precompressed artifacts
+
+    Results no longer change once a video is completed, so each response
+    carries a strong ETag and a matching If-None-Match gets 304 Not Modified.
+    The body is the gzip or brotli artifact the client accepts, or the
+    uncompressed results if it accepts neither.
+    """
+    try:
+        artifacts = get_artifacts(json_path)
+    except Exception as e:
+        logger.error(f"Error building result artifacts for {json_path}: {str(e)}")
+        return _results_response(json_path, frames)
+
+    representations = artifacts["variants"]["full" if frames else "summary"]
+    encoding = choose_encoding(
+        request.headers.get("accept-encoding", ""),
+        [name for name in ("br", "gzip") if name in representations],
+    )
+    representation = representations[encoding or "identity"]
+    headers = {
+        "ETag": representation["etag"],
+        "Vary": "Accept-Encoding",
+        # Browsers may keep the results but revalidate them on every use
+        "Cache-Control": "private, no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, representation["etag"]):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is None:
+        response = _results_response(json_path, frames)
+        response.headers.update(headers)
+        return response
+    headers["Content-Encoding"] = encoding
+    return FileResponse(
+        representation["path"], media_type="application/json", headers=headers
+    )
+
+
 @app.get("/api/videos/{video_id}/results")
 def get_video_results(
     video_id: int,
+    request: Request,
+    frames: bool = True,
     current_user: schemas.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db),
 ):
     video = crud.get_video(db, video_id=video_id)
     if video is None or video.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Video not found")
+
+    if video.status == "processing":
+        # Frames written so far by the worker, marked "partial": true
+        file_id = os.path.splitext(os.path.basename(video.file_path))[0]
+        progress_path = partial_path(f"results/{file_id}_results.json")
+        try:
+            return _results_response(progress_path, frames)
+        except FileNotFoundError:
+            pass  # No chunk written yet, or processing just finished
+
+    if video.status != "completed" or not video.json_result_path:
+        raise HTTPException(status_code=400, detail="Video processing not completed")
+
+    # Results in the legacy JSON shape; frames=false skips the per-frame records
+    return _completed_results_response(request, video.json_result_path, frames)
+
+
+def _results_manifest(video: models.Video) -> dict:
+    """Results manifest of a video, the partial one while it is processing"""
+    if video.status == "processing":
+        file_id = os.path.splitext(os.path.basename(video.file_path))[0]
+        try:
+            with open(partial_path(f"results/{file_id}_results.json"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass  # No chunk written yet, or processing just finished
+
     if video.status != "completed" or not video.json_result_path:
         raise HTTPException(status_code=400, detail="Video processing not completed")
 
-    # Read and return JSON results
     with open(video.json_result_path, "r") as f:
-        results = json.load(f)
+        return json.load(f)
+
+
+@app.get("/api/videos/{video_id}/frames")
+def get_video_frames(
+    video_id: int,
+    start: int = 0,
+    end: Optional[int] = None,
+    stride: int = 1,
+    fields: Optional[str] = None,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Per-frame records start, start + stride, ... up to `end` (exclusive)
+
+    `fields` is a comma-separated subset of source_frame, pts, counts and
+    tracked_objects (all by default). Frame numbers are those of the
+    `frames` list of the results.
+    """
+    video = crud.get_video(db, video_id=video_id)
+    if video is None or video.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    if start < 0 or stride < 1 or (end is not None and end < start):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid frame range, need 0 <= start <= end and stride >= 1",
+        )
+    selected_fields = FRAME_FIELDS
+    if fields:
+        selected_fields = [
+            field.strip() for field in fields.split(",") if field.strip()
+        ]
+        unknown = [field for field in selected_fields if field not in FRAME_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields {unknown}, expected some of {FRAME_FIELDS}",
+            )
+
+    manifest = _results_manifest(video)
+    try:
+        frames = read_frames(manifest, start, end, stride, selected_fields)
+    except FileNotFoundError:
+        frames = {"total_frames": 0, "frames": []}
+
+    return {
+        "video_id": manifest.get("video_id"),
+        "fps": manifest.get("fps"),
+        "partial": manifest.get("partial", False),
+        "start": start,
+        "end": end,
+        "stride": stride,
+        "fields": selected_fields,
+        **frames,
+    }
+
+
+@app.get("/api/videos/{video_id}/timeseries")
+def get_video_timeseries(
+    video_id: int,
+    bin_seconds: float = 60,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """Vehicles counted per type in each `bin_seconds` window of the video"""
+    video = crud.get_video(db, video_id=video_id)
+    if video is None or video.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Video not found")
 
-    return results
+    manifest = _results_manifest(video)
+    try:
+        series = time_series(manifest, bin_seconds)
+    except FileNotFoundError:
+        series = time_series({"fps": manifest.get("fps")}, bin_seconds)
+    except ValueError as e:
+        # bin_seconds not positive, or too small for the length of the video
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "video_id": manifest.get("video_id"),
+        "fps": manifest.get("fps"),
+        "partial": manifest.get("partial", False),
+        **series,
+    }
 
 
 @app.put("/api/videos/{video_id}")
@@ -518,10 +699,162 @@ def update_video(
     if video is None or video.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Video not found")
 
+    if video_update.roi is not None:
+        try:
+            video_update.roi = parse_roi(video_update.roi)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     updated_video = crud.update_video(db, video_id=video_id, video_update=video_update)
     return updated_video
 
 
+@app.get("/api/analytics/summary")
+def get_analytics_summary(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    model_size: Optional[str] = None,
+    status: Optional[str] = None,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Vehicle totals and per-type, per-day, per-weekday and per-hour counts
+
+    Aggregated in the database from the results summary of the user's videos,
+    filtered by creation date (`start_date` and `end_date` inclusive), model
+    size and status.
+    """
+    groups = crud.get_video_count_groups(
+        db,
+        user_id=current_user.id,
+        start=datetime.combine(start_date, time.min) if start_date else None,
+        end=datetime.combine(end_date + timedelta(days=1), time.min)
+        if end_date
+        else None,
+        model_size=model_size,
+        status=status,
+    )
+    return summarize_groups(groups)
+
+
+@app.get("/api/analytics/traffic")
+def get_analytics_traffic(
+    interval: str = "hour",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    camera_id: Optional[int] = None,
+    model_size: Optional[str] = None,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Vehicles counted per type per hour, day or week of recording time
+
+    Summed in the database from the per-minute count buckets of the user's
+    videos; `interval=hour_of_day` or `weekday` gives a traffic profile
+    instead of a time series. Times are UTC.
+    """
+    if interval not in TRAFFIC_INTERVALS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown interval {interval}, expected one of {TRAFFIC_INTERVALS}",
+        )
+
+    rows = crud.get_traffic_counts(
+        db,
+        user_id=current_user.id,
+        interval=interval,
+        start=_naive_utc(start),
+        end=_naive_utc(end),
+        camera_id=camera_id,
+        model_size=model_size,
+    )
+    return {"interval": interval, "buckets": summarize_traffic(rows, interval)}
+
+
+@app.get("/api/health/ready")
+def readiness(db: Session = Depends(get_db)):
+    """
+    Ready once a live worker has loaded and warmed up its models
+
+    Answers 503 until then, so a load balancer can hold traffic back.
+    """
+    workers = crud.get_live_workers(db, jobs.JOB_STALE_SECONDS)
+
+    warm_models = {}
+    for worker in workers:
+        for model_size, model_status in (worker.models or {}).items():
+            if model_status.get("ready"):
+                entry = warm_models.setdefault(
+                    model_size, {"warm_workers": 0, "load_seconds": []}
+                )
+                entry["warm_workers"] += 1
+                entry["load_seconds"].append(model_status["load_seconds"])
+
+    ready = any(worker.ready for worker in workers)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "models": warm_models,
+            "workers": [
+                {
+                    "id": worker.id,
+                    "ready": worker.ready,
+                    "started_at": worker.started_at.isoformat(),
+                    "heartbeat_at": worker.heartbeat_at.isoformat(),
+                    "models": worker.models or {},
+                    "cpu_slot": worker.cpu_slot,
+                }
+                for worker in workers
+            ],
+        },
+    )
+
+
+# Camera endpoints
+@app.post("/api/cameras", response_model=schemas.Camera)
+def create_camera(
+    camera: schemas.CameraCreate,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    try:
+        camera.roi = parse_roi(camera.roi)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return crud.create_camera(db=db, camera=camera, user_id=current_user.id)
+
+
+@app.get("/api/cameras", response_model=List[schemas.Camera])
+def get_cameras(
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    return crud.get_user_cameras(db, user_id=current_user.id)
+
+
+@app.put("/api/cameras/{camera_id}", response_model=schemas.Camera)
+def update_camera(
+    camera_id: int,
+    camera_update: schemas.CameraUpdate,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    camera = crud.get_camera(db, camera_id=camera_id)
+    if camera is None or camera.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Camera not found")
+
+    if camera_update.roi is not None:
+        try:
+            camera_update.roi = parse_roi(camera_update.roi)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return crud.update_camera(db, camera_id=camera_id, camera_update=camera_update)
+
+
 if __name__ == "__main__":
     import uvicorn
 
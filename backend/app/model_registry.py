@@ -0,0 +1,214 @@
+import gc
+import time
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    def __init__(self, model, memory_bytes: int):
+        self.model = model
+        self.memory_bytes = memory_bytes
+        self.refcount = 1
+        self.last_used = time.monotonic()
+        # Predictors keep per-call state, so sessions sharing the model take turns
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Loaded models kept in memory by key (model size), shared between sessions
+
+    Models stay loaded while they fit in the memory budget. When it is
+    exceeded, the least recently used models are unloaded first, and models
+    unused for `idle_timeout` seconds are unloaded as well. A model is never
+    unloaded while a session holds it (between `acquire` and `release`).
+    Sessions sharing a model call it while holding its `lock`.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any],
+        sizer: Callable[[Any], int],
+        memory_budget_bytes: int,
+        idle_timeout: float,
+        on_unload: Callable[[], None] = None,
+    ):
+        self._loader = loader
+        self._sizer = sizer
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_timeout = idle_timeout
+        self._on_unload = on_unload
+
+        # Least recently used first
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._loading = set()
+        self._condition = threading.Condition()
+        self._reaper = None
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.evictions = {"memory": 0, "idle": 0}
+
+    def acquire(self, key: str):
+        """Return the model for `key`, loading it on a miss; pair with `release`"""
+        with self._condition:
+            # Another session is loading the same model, wait for it
+            while key in self._loading:
+                self._condition.wait()
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                entry.refcount += 1
+                entry.last_used = time.monotonic()
+                self._entries.move_to_end(key)
+                return entry.model
+
+            self.misses += 1
+            self._loading.add(key)
+            self._start_reaper()
+
+        # Load outside the lock so other models stay available meanwhile
+        try:
+            start = time.perf_counter()
+            model = self._loader(key)
+            load_seconds = time.perf_counter() - start
+            memory_bytes = self._sizer(model)
+        except Exception:
+            with self._condition:
+                self._loading.discard(key)
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            self.loads += 1
+            self.load_seconds += load_seconds
+            self._entries[key] = _Entry(model, memory_bytes)
+            self._loading.discard(key)
+            self._condition.notify_all()
+            unloaded = self._evict()
+
+        logger.info(
+            f"Loaded model {key} ({memory_bytes / 1024 / 1024:.1f} MB) in {load_seconds:.2f} seconds"
+        )
+        self._unloaded(unloaded)
+        return model
+
+    def release(self, key: str):
+        """Give back a model taken with `acquire`"""
+        with self._condition:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refcount = max(0, entry.refcount - 1)
+            entry.last_used = time.monotonic()
+            # Exported models load extra sessions for new input sizes while in use
+            entry.memory_bytes = self._sizer(entry.model)
+            unloaded = self._evict()
+        self._unloaded(unloaded)
+
+    def lock(self, key: str) -> threading.Lock:
+        """Lock to hold around calls to the model for `key`, taken with `acquire`"""
+        with self._condition:
+            return self._entries[key].lock
+
+    @contextmanager
+    def model(self, key: str):
+        model = self.acquire(key)
+        try:
+            yield model
+        finally:
+            self.release(key)
+
+    def sweep(self):
+        """Unload models that have been idle for longer than the idle timeout"""
+        with self._condition:
+            unloaded = self._evict()
+        self._unloaded(unloaded)
+
+    def _evict(self) -> int:
+        """Drop idle and over-budget models, least recently used first (lock held)"""
+        now = time.monotonic()
+        unloaded = 0
+        for key, entry in list(self._entries.items()):
+            if (
+                entry.refcount == 0
+                and self.idle_timeout > 0
+                and now - entry.last_used > self.idle_timeout
+            ):
+                self._drop(key, "idle")
+                unloaded += 1
+
+        for key, entry in list(self._entries.items()):
+            if self.memory_bytes() <= self.memory_budget_bytes:
+                break
+            if entry.refcount == 0:
+                self._drop(key, "memory")
+                unloaded += 1
+
+        if self.memory_bytes() > self.memory_budget_bytes:
+            logger.warning(
+                f"Models in use take {self.memory_bytes() / 1024 / 1024:.1f} MB, "
+                f"over the {self.memory_budget_bytes / 1024 / 1024:.0f} MB budget"
+            )
+        return unloaded
+
+    def _drop(self, key: str, reason: str):
+        self._entries.pop(key)
+        self.evictions[reason] += 1
+        logger.info(f"Unloaded model {key} ({reason})")
+
+    def _unloaded(self, count: int):
+        if count:
+            gc.collect()
+            if self._on_unload is not None:
+                self._on_unload()
+
+    def _start_reaper(self):
+        """Sweep idle models in the background, so they go even if no job follows"""
+        if self._reaper is not None or self.idle_timeout <= 0:
+            return
+
+        def reap():
+            while True:
+                time.sleep(max(1.0, self.idle_timeout / 4))
+                self.sweep()
+
+        self._reaper = threading.Thread(target=reap, daemon=True)
+        self._reaper.start()
+
+    def memory_bytes(self) -> int:
+        return sum(entry.memory_bytes for entry in self._entries.values())
+
+    def stats(self) -> Dict:
+        with self._condition:
+            now = time.monotonic()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "loads": self.loads,
+                "load_seconds_total": self.load_seconds,
+                "load_seconds_mean": self.load_seconds / self.loads
+                if self.loads
+                else 0,
+                "evictions": dict(self.evictions),
+                "memory_mb": self.memory_bytes() / 1024 / 1024,
+                "memory_budget_mb": self.memory_budget_bytes / 1024 / 1024,
+                "models": {
+                    key: {
+                        "memory_mb": entry.memory_bytes / 1024 / 1024,
+                        "in_use": entry.refcount,
+                        "idle_seconds": now - entry.last_used,
+                    }
+                    for key, entry in self._entries.items()
+                },
+            }
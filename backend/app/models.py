@@ -1,4 +1,15 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text
+from sqlalchemy import (
+    Boolean,
+    Column,
+    ForeignKey,
+    Index,
+    Float,
+    Integer,
+    String,
+    DateTime,
+    Text,
+    JSON,
+)
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -15,6 +26,21 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     videos = relationship("Video", back_populates="owner")
+    cameras = relationship("Camera", back_populates="owner")
+
+
+class Camera(Base):
+    __tablename__ = "cameras"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True)
+    roi = Column(JSON, nullable=True)  # list of [x, y] frame fractions
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    user_id = Column(Integer, ForeignKey("users.id"))
+
+    owner = relationship("User", back_populates="cameras")
+    videos = relationship("Video", back_populates="camera")
 
 
 class Video(Base):
@@ -30,10 +56,90 @@ class Video(Base):
     status = Column(String)  # pending, processing, completed, failed
     model_size = Column(
         String, nullable=True, default="nano"
-    )  # nano, small, medium, large, x-large
+    )  # nano, small, medium, large, x-large, or their -int8 variants
+    inference_size = Column(Integer, nullable=True)  # longest side in pixels
     error_message = Column(Text, nullable=True)
+    # Region of interest, overrides the one of the camera
+    roi = Column(JSON, nullable=True)  # list of [x, y] frame fractions
+    camera_id = Column(Integer, ForeignKey("cameras.id"), nullable=True)
+    # Wall-clock time (UTC) of the first frame, given on upload
+    recorded_at = Column(DateTime, nullable=True)
+    # Summary of the results, written by the worker when processing completes
+    car_count = Column(Integer, nullable=True)
+    motorcycle_count = Column(Integer, nullable=True)
+    bus_count = Column(Integer, nullable=True)
+    truck_count = Column(Integer, nullable=True)
+    total_vehicles = Column(Integer, nullable=True, index=True)
+    processed_frames = Column(Integer, nullable=True)
+    fps = Column(Float, nullable=True)
+    duration_seconds = Column(Float, nullable=True)
+    processing_time = Column(Float, nullable=True)  # seconds
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
 
     owner = relationship("User", back_populates="videos")
+    camera = relationship("Camera", back_populates="videos")
+    jobs = relationship("Job", back_populates="video", cascade="all, delete-orphan")
+    count_buckets = relationship(
+        "CountBucket", back_populates="video", cascade="all, delete-orphan"
+    )
+
+    # Analytics filter a user's videos by creation date
+    __table_args__ = (Index("ix_videos_user_created", "user_id", "created_at"),)
+
+    @property
+    def total_counts(self):
+        """Counted vehicles per type, None until the video has a summary"""
+        if self.total_vehicles is None:
+            return None
+        return {
+            "car": self.car_count or 0,
+            "motorcycle": self.motorcycle_count or 0,
+            "bus": self.bus_count or 0,
+            "truck": self.truck_count or 0,
+        }
+
+
+class CountBucket(Base):
+    """Vehicles of one type counted in a video during one wall-clock minute"""
+
+    __tablename__ = "count_buckets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, ForeignKey("videos.id"), index=True)
+    bucket_start = Column(DateTime, index=True)  # UTC, start of the minute
+    vehicle_type = Column(String)  # car, motorcycle, bus, truck
+    count = Column(Integer, default=0)
+
+    video = relationship("Video", back_populates="count_buckets")
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, ForeignKey("videos.id"), index=True)
+    status = Column(String, index=True)  # queued, running, completed, failed
+    model_size = Column(String, nullable=True, default="nano")
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    worker_id = Column(String, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    video = relationship("Video", back_populates="jobs")
+
+
+class Worker(Base):
+    __tablename__ = "workers"
+
+    id = Column(String, primary_key=True, index=True)  # hostname:pid:index
+    ready = Column(Boolean, default=False)  # every warm-up model loaded
+    models = Column(JSON, nullable=True)  # warm-up outcome per model size
+    cpu_slot = Column(JSON, nullable=True)  # cores, threads and utilization
+    started_at = Column(DateTime, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,255 @@
+import os
+import glob
+import json
+import time
+import threading
+import logging
+import cv2
+import numpy as np
+from typing import Dict, List
+
+from .backends import (
+    INFERENCE_BACKEND,
+    ExportedModel,
+    OnnxRuntimeRunner,
+    export_model,
+    letterbox,
+    postprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+# Traffic frames used to calibrate INT8 activation ranges
+CALIBRATION_DIR = os.getenv("CALIBRATION_DIR", "calibration")
+CALIBRATION_FRAMES = int(os.getenv("CALIBRATION_FRAMES", "64"))
+
+# Runtime INT8 models run on: OpenVINO if it is the configured backend, else onnxruntime
+QUANTIZED_BACKEND = "openvino" if INFERENCE_BACKEND == "openvino" else "onnxruntime"
+
+# COCO classes counted as vehicles, see VEHICLE_CLASSES in ai.py
+VEHICLE_CLASS_IDS = (2, 3, 5, 7)
+
+_quantize_lock = threading.Lock()
+
+
+def quantized_runtime_available() -> bool:
+    """Whether the runtime INT8 models run on can be imported here"""
+    try:
+        __import__(QUANTIZED_BACKEND)
+        return True
+    except ImportError:
+        return False
+
+
+def extract_calibration_frames(
+    video_paths: List[str], directory: str = CALIBRATION_DIR, count=CALIBRATION_FRAMES
+) -> int:
+    """Save frames spread evenly over the given videos as calibration images"""
+    os.makedirs(directory, exist_ok=True)
+    per_video = max(1, -(-count // max(1, len(video_paths))))
+    saved = 0
+
+    for video_path in video_paths:
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if not cap.isOpened() or total_frames <= 0:
+            cap.release()
+            continue
+
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        for index in np.linspace(0, total_frames - 1, per_video, dtype=int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ret, frame = cap.read()
+            if ret:
+                cv2.imwrite(os.path.join(directory, f"{name}_{index:06d}.jpg"), frame)
+                saved += 1
+        cap.release()
+
+    logger.info(f"Saved {saved} calibration frames to {directory}")
+    return saved
+
+
+def load_calibration_frames(
+    directory: str = CALIBRATION_DIR, count=CALIBRATION_FRAMES
+) -> List[np.ndarray]:
+    """
+    Load the calibration frames saved by `python quantize_models.py --videos ...`
+
+    The set is chosen by whoever builds the INT8 models; frames are never
+    taken from whatever videos happen to be uploaded.
+    """
+    paths = sorted(
+        path
+        for pattern in ("*.jpg", "*.jpeg", "*.png")
+        for path in glob.glob(os.path.join(directory, pattern))
+    )
+    if not paths:
+        raise Exception(
+            f"No calibration frames in {directory} for INT8 model quantization; "
+            f"create them with `python quantize_models.py --videos <traffic videos>`"
+        )
+
+    # Spread the selection over the whole set
+    selected = np.linspace(0, len(paths) - 1, min(count, len(paths)), dtype=int)
+    frames = [cv2.imread(paths[index]) for index in selected]
+    return [frame for frame in frames if frame is not None]
+
+
+class _CalibrationReader:
+    """Feeds letterboxed calibration frames to the onnxruntime calibrator"""
+
+    def __init__(self, input_name: str, frames: List[np.ndarray], imgsz: int):
+        self._inputs = iter({input_name: letterbox(frame, imgsz)} for frame in frames)
+
+    def get_next(self):
+        return next(self._inputs, None)
+
+
+def quantized_path(weights_path: str, imgsz: int) -> str:
+    return f"{os.path.splitext(weights_path)[0]}_{imgsz}_int8.onnx"
+
+
+def quantize_model(weights_path: str, imgsz: int) -> str:
+    """
+    Build the INT8 ONNX model of a .pt model once and return the cached file
+
+    Uses static quantization with activation ranges calibrated on our own
+    traffic frames, then writes an accuracy-vs-speed report next to the model.
+    """
+    path = quantized_path(weights_path, imgsz)
+    with _quantize_lock:
+        if not os.path.exists(path):
+            _quantize(weights_path, imgsz, path)
+    return path
+
+
+def _quantize(weights_path: str, imgsz: int, path: str):
+    try:
+        import onnxruntime
+        from onnxruntime.quantization import (
+            CalibrationMethod,
+            QuantFormat,
+            QuantType,
+            quantize_static,
+        )
+    except ImportError:
+        raise Exception("onnxruntime is required to build INT8 models")
+
+    # The dynamic export keeps batched inference working on the quantized graph
+    fp32_path = export_model(weights_path, "onnx", imgsz, dynamic=True)
+    frames = load_calibration_frames()
+    logger.info(f"Quantizing {fp32_path} to INT8 with {len(frames)} calibration frames")
+
+    input_name = (
+        onnxruntime.InferenceSession(fp32_path, providers=["CPUExecutionProvider"])
+        .get_inputs()[0]
+        .name
+    )
+    work_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        quantize_static(
+            fp32_path,
+            work_path,
+            _CalibrationReader(input_name, frames, imgsz),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            weight_type=QuantType.QInt8,
+            activation_type=QuantType.QUInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+        os.replace(work_path, path)
+    finally:
+        if os.path.exists(work_path):
+            os.remove(work_path)
+
+    report = compare_models(fp32_path, path, frames, imgsz)
+    report_path = f"{os.path.splitext(path)[0]}_report.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=4)
+    logger.info(f"INT8 accuracy and speed report saved to {report_path}: {report}")
+
+
+def _vehicle_boxes(detection):
+    return [
+        (int(box.cls.item()), box.xyxy[0])
+        for box in detection.boxes
+        if int(box.cls.item()) in VEHICLE_CLASS_IDS
+    ]
+
+
+def _iou(a, b) -> float:
+    width = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    height = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def compare_models(
+    fp32_path: str, int8_path: str, frames: List[np.ndarray], imgsz: int
+) -> Dict:
+    """
+    Speed and vehicle detection agreement of the INT8 model against FP32
+
+    A reference (FP32) vehicle counts as recovered if the INT8 model finds
+    a vehicle of the same class with IoU >= 0.5.
+    """
+    detections = {}
+    timings = {}
+    for name, path in (("fp32", fp32_path), ("int8", int8_path)):
+        runner = OnnxRuntimeRunner(path)
+        blobs = [letterbox(frame, imgsz) for frame in frames]
+        runner.run(blobs[0])  # Warm-up
+
+        start = time.perf_counter()
+        outputs = [runner.run(blob)[0] for blob in blobs]
+        timings[name] = (time.perf_counter() - start) * 1000 / len(frames)
+
+        detections[name] = [
+            _vehicle_boxes(postprocess(output, blob.shape[2:], frame.shape))
+            for output, frame, blob in zip(outputs, frames, blobs)
+        ]
+
+    reference_total = recovered = 0
+    for reference, quantized in zip(detections["fp32"], detections["int8"]):
+        reference_total += len(reference)
+        unmatched = list(quantized)
+        for class_id, box in reference:
+            match = next(
+                (
+                    candidate
+                    for candidate in unmatched
+                    if candidate[0] == class_id and _iou(candidate[1], box) >= 0.5
+                ),
+                None,
+            )
+            if match is not None:
+                unmatched.remove(match)
+                recovered += 1
+
+    return {
+        "frames": len(frames),
+        "imgsz": imgsz,
+        "fp32_ms_per_frame": timings["fp32"],
+        "int8_ms_per_frame": timings["int8"],
+        "speedup": timings["fp32"] / timings["int8"] if timings["int8"] else 0,
+        "fp32_vehicles": reference_total,
+        "int8_vehicles": sum(map(len, detections["int8"])),
+        "vehicle_recall_vs_fp32": recovered / reference_total
+        if reference_total
+        else 1.0,
+        "fp32_size_mb": os.path.getsize(fp32_path) / 1024 / 1024,
+        "int8_size_mb": os.path.getsize(int8_path) / 1024 / 1024,
+    }
+
+
+class QuantizedModel(ExportedModel):
+    """INT8 variant of a YOLOv8 model, run with onnxruntime or OpenVINO"""
+
+    def __init__(self, weights_path: str, backend: str = "onnxruntime"):
+        if backend not in ("onnxruntime", "openvino"):
+            raise Exception(f"INT8 models cannot run on the {backend} backend")
+        super().__init__(weights_path, backend)
+
+    def model_path(self, imgsz: int) -> str:
+        return quantize_model(self.weights_path, imgsz)
@@ -0,0 +1,201 @@
+import os
+import uuid
+import json
+import zlib
+import hashlib
+import logging
+import orjson
+from typing import Dict, Iterator, List, Optional
+
+from .result_store import is_columnar, iter_results_json, load_results
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Optional, only gzip artifacts are written without it
+
+# Compression levels of the result artifacts, written once per video
+RESULT_GZIP_LEVEL = int(os.getenv("RESULT_GZIP_LEVEL", "9"))
+RESULT_BROTLI_QUALITY = int(os.getenv("RESULT_BROTLI_QUALITY", "9"))
+
+# Responses of the results endpoint: with frames and without (frames=false)
+VARIANTS = {"full": True, "summary": False}
+
+# Bytes read at a time from legacy results files
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def artifacts_path(json_path: str) -> str:
+    """Index of the compressed artifacts of a results manifest"""
+    return json_path.replace("_results.json", "_artifacts.json")
+
+
+def _artifact_path(json_path: str, variant: str, encoding: str) -> str:
+    suffix = {"gzip": "gz", "br": "br"}[encoding]
+    return json_path.replace("_results.json", f"_results.{variant}.json.{suffix}")
+
+
+def _body(json_path: str, frames: bool) -> Iterator[bytes]:
+    """Pieces of the JSON the results endpoint sends for a completed video"""
+    if not frames:
+        yield orjson.dumps(load_results(json_path, include_frames=False))
+    elif is_columnar(json_path):
+        yield from iter_results_json(json_path)
+    else:
+        with open(json_path, "rb") as f:
+            while True:
+                block = f.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
+
+
+def _temporary_path(path: str) -> str:
+    # Unique, so concurrent rebuilds of the same artifacts do not collide
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+
+class _ArtifactFile:
+    """Compressed file written piece by piece, hashed for its ETag"""
+
+    def __init__(self, path: str, compressor):
+        self.path = path
+        self.compressor = compressor
+        self.hash = hashlib.sha256()
+        self.temporary_path = _temporary_path(path)
+        self.file = open(self.temporary_path, "wb")
+
+    def _write(self, data: bytes):
+        if data:
+            self.hash.update(data)
+            self.file.write(data)
+
+    def write(self, piece: bytes):
+        self._write(self.compressor.compress(piece))
+
+    def close(self) -> Dict:
+        flush = getattr(self.compressor, "flush", None) or self.compressor.finish
+        self._write(flush())
+        self.file.close()
+        os.replace(self.temporary_path, self.path)
+        return {"path": self.path, "etag": f'"{self.hash.hexdigest()}"'}
+
+
+def _compressors() -> Dict:
+    # wbits=31 writes a gzip header; zlib leaves its mtime at 0, so the output
+    # (and its ETag) only depends on the content
+    compressors = {
+        "gzip": lambda: zlib.compressobj(RESULT_GZIP_LEVEL, zlib.DEFLATED, 31)
+    }
+    if brotli is not None:
+        compressors["br"] = lambda: brotli.Compressor(quality=RESULT_BROTLI_QUALITY)
+    return compressors
+
+
+def _source_stamp(json_path: str) -> List[int]:
+    stat = os.stat(json_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def build_artifacts(json_path: str) -> Dict:
+    """
+    Write compressed copies of the results responses of a completed video
+
+    Each response variant gets a gzip (and, with the brotli package, a
+    brotli) file, and every representation a strong ETag from the SHA-256
+    of its bytes. The index is written last, next to the results manifest.
+    """
+    index = {"source": _source_stamp(json_path), "variants": {}}
+    for variant, frames in VARIANTS.items():
+        identity = hashlib.sha256()
+        files = {
+            encoding: _ArtifactFile(
+                _artifact_path(json_path, variant, encoding), make_compressor()
+            )
+            for encoding, make_compressor in _compressors().items()
+        }
+        for piece in _body(json_path, frames):
+            identity.update(piece)
+            for artifact in files.values():
+                artifact.write(piece)
+
+        representations = {"identity": {"etag": f'"{identity.hexdigest()}"'}}
+        for encoding, artifact in files.items():
+            representations[encoding] = artifact.close()
+        index["variants"][variant] = representations
+
+    path = artifacts_path(json_path)
+    temporary_path = _temporary_path(path)
+    with open(temporary_path, "w") as f:
+        json.dump(index, f, indent=4)
+    os.replace(temporary_path, path)
+    return index
+
+
+def get_artifacts(json_path: str) -> Dict:
+    """Artifact index of a results manifest, rebuilt if missing or out of date"""
+    try:
+        with open(artifacts_path(json_path), "r") as f:
+            index = json.load(f)
+        if index["source"] == _source_stamp(json_path) and all(
+            os.path.exists(representation["path"])
+            for variant in index["variants"].values()
+            for representation in variant.values()
+            if "path" in representation
+        ):
+            return index
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    logger.info(f"Building compressed result artifacts for {json_path}")
+    return build_artifacts(json_path)
+
+
+def remove_artifacts(json_path: str):
+    for variant in VARIANTS:
+        for encoding in ("gzip", "br"):
+            path = _artifact_path(json_path, variant, encoding)
+            if os.path.exists(path):
+                os.remove(path)
+    if os.path.exists(artifacts_path(json_path)):
+        os.remove(artifacts_path(json_path))
+
+
+def choose_encoding(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """
+    Content coding to send from `available` (most preferred first), None for identity
+
+    Follows the client's Accept-Encoding q-values; codings with q=0 are refused.
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison)"""
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
@@ -0,0 +1,598 @@
+import os
+import json
+import time
+import shutil
+import orjson
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+# Vehicle types in the order their index is stored in the `vehicle_type` column
+VEHICLE_TYPES = ["car", "motorcycle", "bus", "truck"]
+
+STORE_FORMAT = "columnar-npz-v2"
+
+# Per-frame fields the frames endpoint can select
+FRAME_FIELDS = ["source_frame", "pts", "counts", "tracked_objects"]
+
+# Frame records are written out in chunks of this many frames...
+RESULT_FLUSH_FRAMES = int(os.getenv("RESULT_FLUSH_FRAMES", "300"))
+
+# ...or after this many seconds, whichever comes first
+RESULT_FLUSH_SECONDS = float(os.getenv("RESULT_FLUSH_SECONDS", "10"))
+
+# Most time bins counts of one video are split into
+MAX_TIME_BINS = 10000
+
+
+class FrameColumns:
+    """
+    Per-frame tracking records of a video kept as columns
+
+    One row per sampled frame (source frame number and timestamp) and one
+    row per tracked object, with `object_offsets` giving the object rows of
+    each frame: objects of frame i are rows object_offsets[i]:object_offsets[i + 1].
+    """
+
+    def __init__(self, fps: float = 0):
+        self.fps = fps
+        self.source_frame: List[int] = []
+        self.object_offsets: List[int] = [0]
+        self.track_id: List[int] = []
+        self.vehicle_type: List[int] = []
+        self.bbox: List[List[int]] = []
+        self.confidence: List[float] = []
+        self.centroid: List[List[int]] = []
+        self.counted: List[bool] = []
+        self.counted_now: List[bool] = []
+
+    def __len__(self):
+        return len(self.source_frame)
+
+    @property
+    def object_count(self) -> int:
+        return self.object_offsets[-1]
+
+    def append(self, frame_record: Dict, counted_indices: set, source_frame: int):
+        """Add the record of one sampled frame, as built by `track_frame`"""
+        self.source_frame.append(source_frame)
+        for index, obj in enumerate(frame_record["tracked_objects"]):
+            self.track_id.append(int(obj["id"]))
+            self.vehicle_type.append(VEHICLE_TYPES.index(obj["type"]))
+            self.bbox.append(obj["bbox"])
+            self.confidence.append(obj["confidence"])
+            self.centroid.append(obj["centroid"])
+            self.counted.append(obj["counted"])
+            self.counted_now.append(index in counted_indices)
+        self.object_offsets.append(len(self.track_id))
+
+    @classmethod
+    def from_legacy_frames(cls, frames: List[Dict], fps: float = 0) -> "FrameColumns":
+        """
+        Columns of a legacy `frames` list
+
+        A vehicle was counted in the first frame where its `counted` flag is set.
+        Legacy frames do not keep the source frame number, so it is left as
+        the index of the sampled frame.
+        """
+        columns = cls(fps)
+        counted_tracks = set()
+        for index, record in enumerate(frames):
+            counted_indices = set()
+            for position, obj in enumerate(record.get("tracked_objects", [])):
+                if obj["counted"] and obj["id"] not in counted_tracks:
+                    counted_tracks.add(obj["id"])
+                    counted_indices.add(position)
+            columns.append(record, counted_indices, index)
+        return columns
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        source_frame = np.array(self.source_frame, dtype=np.int32)
+        return {
+            "source_frame": source_frame,
+            # Seconds from the start of the video
+            "pts": source_frame / self.fps if self.fps else np.zeros(len(self)),
+            "object_offsets": np.array(self.object_offsets, dtype=np.int64),
+            "track_id": np.array(self.track_id, dtype=np.int32),
+            "vehicle_type": np.array(self.vehicle_type, dtype=np.uint8),
+            "bbox": np.array(self.bbox, dtype=np.int32).reshape(-1, 4),
+            "confidence": np.array(self.confidence, dtype=np.float64),
+            "centroid": np.array(self.centroid, dtype=np.int32).reshape(-1, 2),
+            "counted": np.array(self.counted, dtype=bool),
+            "counted_now": np.array(self.counted_now, dtype=bool),
+        }
+
+
+def store_dir(json_path: str) -> str:
+    """Directory of the frame column chunks next to a (partial) results manifest"""
+    return json_path.replace("_results.json", "_frames").replace(
+        "_partial.json", "_frames"
+    )
+
+
+def partial_path(json_path: str) -> str:
+    """Manifest of the chunks written so far while a video is processing"""
+    return json_path.replace("_results.json", "_partial.json")
+
+
+def _write_json(path: str, data: Dict):
+    # Readers never see a half-written manifest
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(f"{path}.tmp", path)
+
+
+class ResultWriter:
+    """
+    Streams frame records to disk while a video is processing
+
+    Records are buffered as columns and written as an .npz chunk every
+    RESULT_FLUSH_FRAMES frames or RESULT_FLUSH_SECONDS seconds, so memory
+    does not grow with the length of the video. After each chunk a partial
+    manifest lists the chunks written so far with a snapshot of `results`;
+    `close` writes the final manifest at `json_path`.
+    """
+
+    def __init__(
+        self,
+        json_path: str,
+        results: Dict,
+        fps: float = 0,
+        flush_frames: int = None,
+        flush_seconds: float = None,
+    ):
+        self.json_path = json_path
+        self.results = results
+        self.fps = fps
+        self.flush_frames = flush_frames or RESULT_FLUSH_FRAMES
+        self.flush_seconds = flush_seconds or RESULT_FLUSH_SECONDS
+        self.directory = store_dir(json_path)
+        self.partial_path = partial_path(json_path)
+
+        self.buffer = FrameColumns(fps)
+        self.chunks: List[str] = []
+        # Frames in each chunk, the index used to read a range of frames
+        self.chunk_frames: List[int] = []
+        self.frame_count = 0
+        self.object_count = 0
+        self.counted_count = 0
+        self.last_flush = time.monotonic()
+
+        # Leftovers of an earlier attempt at the same video
+        shutil.rmtree(self.directory, ignore_errors=True)
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __len__(self):
+        return self.frame_count
+
+    def append(self, frame_record: Dict, counted_indices: set, source_frame: int):
+        self.buffer.append(frame_record, counted_indices, source_frame)
+        self.frame_count += 1
+        self.object_count += len(frame_record["tracked_objects"])
+        self.counted_count += sum(
+            obj["counted"] for obj in frame_record["tracked_objects"]
+        )
+
+        if (
+            len(self.buffer) >= self.flush_frames
+            or time.monotonic() - self.last_flush >= self.flush_seconds
+        ):
+            self.flush()
+
+    def write_chunk(self, columns: FrameColumns):
+        path = os.path.join(self.directory, f"{len(self.chunks):05d}.npz")
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(f, **columns.to_arrays())
+        os.replace(f"{path}.tmp", path)
+        self.chunks.append(path)
+        self.chunk_frames.append(len(columns))
+
+    def flush(self):
+        """Write the buffered records as a chunk and update the partial manifest"""
+        if len(self.buffer):
+            self.write_chunk(self.buffer)
+            self.buffer = FrameColumns(self.fps)
+        self.last_flush = time.monotonic()
+        _write_json(self.partial_path, self.manifest(partial=True))
+
+    def manifest(self, partial=False) -> Dict:
+        manifest = {
+            key: value for key, value in self.results.items() if key != "frames"
+        }
+        if partial:
+            manifest["partial"] = True
+        manifest["frames_store"] = {
+            "format": STORE_FORMAT,
+            "chunks": list(self.chunks),
+            "chunk_frames": list(self.chunk_frames),
+            "frames": self.frame_count - len(self.buffer),
+            "objects": self.object_count - self.buffer.object_count,
+            "vehicle_types": VEHICLE_TYPES,
+        }
+        return manifest
+
+    def close(self):
+        """Write the last chunk and the final manifest"""
+        if len(self.buffer):
+            self.write_chunk(self.buffer)
+            self.buffer = FrameColumns(self.fps)
+        _write_json(self.json_path, self.manifest())
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+    def discard(self):
+        """Remove everything written, e.g. when processing failed"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+def save_results(json_path: str, results: Dict, columns: FrameColumns):
+    """
+    Write frame columns as one chunk and everything else as a small JSON manifest
+
+    The manifest keeps the shape of the legacy results JSON minus `frames`,
+    plus a `frames_store` entry listing the column chunks.
+    """
+    writer = ResultWriter(json_path, results, columns.fps)
+    writer.write_chunk(columns)
+    writer.frame_count = len(columns)
+    writer.object_count = columns.object_count
+    writer.close()
+
+
+def load_frame_columns(
+    manifest: Dict, names: List[str] = None
+) -> Dict[str, np.ndarray]:
+    """Columns of every chunk of a store, joined in frame order (only `names` if given)"""
+    store = manifest["frames_store"]
+    # Single-file stores written before results were chunked
+    paths = store["chunks"] if "chunks" in store else [store["path"]]
+
+    chunks = []
+    for path in paths:
+        with np.load(path) as data:
+            chunks.append({name: data[name] for name in names or data.files})
+    if not chunks:
+        columns = FrameColumns().to_arrays()
+        return {name: columns[name] for name in names or columns}
+
+    columns = {
+        name: np.concatenate([chunk[name] for chunk in chunks])
+        for name in chunks[0]
+        if name != "object_offsets"
+    }
+    if "object_offsets" in chunks[0]:
+        # Chunk offsets start at 0, shift them by the objects of earlier chunks
+        offsets = [np.zeros(1, dtype=np.int64)]
+        objects = 0
+        for chunk in chunks:
+            offsets.append(chunk["object_offsets"][1:] + objects)
+            objects += int(chunk["object_offsets"][-1])
+        columns["object_offsets"] = np.concatenate(offsets)
+    return columns
+
+
+def _frame_dicts(
+    columns: Dict[str, np.ndarray], rows, frame_numbers, fields: List[str]
+) -> List[Dict]:
+    """Frame records for the given rows of `columns`, with only `fields`"""
+    source_frame = (
+        columns["source_frame"].tolist() if "source_frame" in fields else None
+    )
+    pts = columns["pts"].tolist() if "pts" in fields else None
+    with_counts = "counts" in fields
+    with_objects = "tracked_objects" in fields
+    if with_counts or with_objects:
+        offsets = columns["object_offsets"].tolist()
+        vehicle_type = [
+            VEHICLE_TYPES[index] for index in columns["vehicle_type"].tolist()
+        ]
+        counted_now = columns["counted_now"].tolist()
+    if with_objects:
+        track_id = columns["track_id"].tolist()
+        bbox = columns["bbox"].tolist()
+        confidence = columns["confidence"].tolist()
+        centroid = columns["centroid"].tolist()
+        counted = columns["counted"].tolist()
+
+    frames = []
+    for row, frame_number in zip(rows, frame_numbers):
+        frame = {"frame_number": frame_number}
+        if source_frame is not None:
+            frame["source_frame"] = source_frame[row]
+        if pts is not None:
+            frame["pts"] = pts[row]
+        if with_counts:
+            counts = dict.fromkeys(VEHICLE_TYPES, 0)
+            for index in range(offsets[row], offsets[row + 1]):
+                if counted_now[index]:
+                    counts[vehicle_type[index]] += 1
+            frame["counts"] = counts
+        if with_objects:
+            frame["tracked_objects"] = [
+                {
+                    "id": str(track_id[index]),
+                    "type": vehicle_type[index],
+                    "bbox": bbox[index],
+                    "confidence": confidence[index],
+                    "centroid": centroid[index],
+                    "counted": counted[index],
+                }
+                for index in range(offsets[row], offsets[row + 1])
+            ]
+        frames.append(frame)
+    return frames
+
+
+def legacy_frames(columns: Dict[str, np.ndarray]) -> List[Dict]:
+    """Rebuild the legacy `frames` list (one dict per sampled frame) from columns"""
+    frame_count = len(columns["object_offsets"]) - 1
+    return _frame_dicts(
+        columns, range(frame_count), range(frame_count), ["counts", "tracked_objects"]
+    )
+
+
+def _chunk_frames(store: Dict) -> List[int]:
+    """Frames in each chunk of a store"""
+    if "chunk_frames" in store:
+        return store["chunk_frames"]
+    if "chunks" not in store:
+        return [store["frames"]]
+    # Stores written before the index was kept: read the small frame column only
+    counts = []
+    for path in store["chunks"]:
+        with np.load(path) as data:
+            counts.append(len(data["source_frame"]))
+    return counts
+
+
+def _columns_for(fields: List[str]) -> List[str]:
+    names = [name for name in ("source_frame", "pts") if name in fields]
+    if "counts" in fields or "tracked_objects" in fields:
+        names += ["object_offsets", "vehicle_type", "counted_now"]
+    if "tracked_objects" in fields:
+        names += ["track_id", "bbox", "confidence", "centroid", "counted"]
+    return names
+
+
+def read_frames(
+    manifest: Dict,
+    start: int = 0,
+    end: int = None,
+    stride: int = 1,
+    fields: List[str] = None,
+) -> Dict:
+    """
+    Frames start, start + stride, ... (before `end`) of a results manifest
+
+    Only the chunks holding those frames are opened, and only the columns
+    needed for `fields`, so the cost depends on the range asked for and not
+    on the length of the video. Legacy results with inline frames are sliced
+    as they are.
+    """
+    fields = FRAME_FIELDS if fields is None else fields
+    store = manifest.get("frames_store")
+
+    if store is None:
+        frames = manifest.get("frames", [])
+        total = len(frames)
+        end = total if end is None else min(end, total)
+        selected = [
+            {
+                "frame_number": number,
+                **{
+                    field: frames[number][field]
+                    for field in fields
+                    if field in frames[number]
+                },
+            }
+            for number in range(start, end, stride)
+        ]
+        return {"total_frames": total, "frames": selected}
+
+    paths = store["chunks"] if "chunks" in store else [store["path"]]
+    chunk_frames = _chunk_frames(store)
+    total = sum(chunk_frames)
+    end = total if end is None else min(end, total)
+    names = _columns_for(fields)
+
+    selected = []
+    first = 0
+    for path, count in zip(paths, chunk_frames):
+        last = first + count
+        if first >= end:
+            break
+        # First frame of the stride sequence inside this chunk
+        begin = max(start, first)
+        begin = start + -(-(begin - start) // stride) * stride
+        numbers = range(begin, min(end, last), stride)
+        if len(numbers):
+            with np.load(path) as data:
+                columns = {name: data[name] for name in names}
+            rows = [number - first for number in numbers]
+            selected.extend(_frame_dicts(columns, rows, numbers, fields))
+        first = last
+    return {"total_frames": total, "frames": selected}
+
+
+def _check_bin_count(seconds: float, bin_seconds: float) -> int:
+    """Bins needed to cover `seconds`, refused above MAX_TIME_BINS before allocating any"""
+    bins = seconds / bin_seconds
+    if not bins <= MAX_TIME_BINS:
+        raise ValueError(
+            f"bin_seconds too small, at most {MAX_TIME_BINS} bins per video"
+        )
+    return int(np.ceil(bins)) or 1
+
+
+def _binned_counts(manifest: Dict, bin_seconds: float, origin: float = 0.0):
+    """
+    Vehicles counted per bin and type, as a (bins, types) array, and the duration
+
+    A vehicle falls in the bin holding the source timestamp of the frame
+    where it was counted, shifted by `origin` seconds (where the video starts
+    in the first bin). Legacy results without timestamps use the sampled
+    frame index over fps. Raises ValueError if `bin_seconds` is not positive
+    or would need more than MAX_TIME_BINS bins.
+    """
+    if not bin_seconds > 0:
+        raise ValueError("bin_seconds must be positive")
+
+    fps = manifest.get("fps") or 0
+    duration = manifest.get("total_frames", 0) / fps if fps else 0
+    _check_bin_count(duration + origin, bin_seconds)
+
+    names = ["pts", "object_offsets", "vehicle_type", "counted_now"]
+    if "frames_store" in manifest:
+        columns = load_frame_columns(manifest, names)
+    else:
+        columns = FrameColumns.from_legacy_frames(
+            manifest.get("frames", []), fps
+        ).to_arrays()
+
+    # Timestamp of the frame of every object row
+    objects_per_frame = np.diff(columns["object_offsets"])
+    object_pts = np.repeat(columns["pts"], objects_per_frame)
+    counted = columns["counted_now"]
+    last_pts = float(object_pts[counted].max()) if counted.any() else 0
+    if len(columns["pts"]):
+        last_pts = max(last_pts, float(columns["pts"][-1]))
+    bin_count = _check_bin_count(max(duration, last_pts) + origin, bin_seconds)
+
+    object_bins = ((object_pts[counted] + origin) // bin_seconds).astype(np.int64)
+    object_types = columns["vehicle_type"][counted].astype(np.int64)
+    bin_count = max(bin_count, int(object_bins.max()) + 1 if len(object_bins) else 0)
+
+    counts = np.bincount(
+        object_bins * len(VEHICLE_TYPES) + object_types,
+        minlength=bin_count * len(VEHICLE_TYPES),
+    ).reshape(bin_count, len(VEHICLE_TYPES))
+    return counts, duration
+
+
+def time_series(manifest: Dict, bin_seconds: float) -> Dict:
+    """Vehicles counted per type in consecutive `bin_seconds` windows of the video"""
+    counts, duration = _binned_counts(manifest, bin_seconds)
+    return {
+        "bin_seconds": bin_seconds,
+        "duration_seconds": duration,
+        "vehicle_types": VEHICLE_TYPES,
+        "bins": [
+            {
+                "start": index * bin_seconds,
+                **dict(zip(VEHICLE_TYPES, row)),
+                "total": sum(row),
+            }
+            for index, row in enumerate(counts.tolist())
+        ],
+    }
+
+
+def minute_buckets(manifest: Dict, start_time: datetime) -> List[Dict]:
+    """
+    Vehicles counted per type in each wall-clock minute of a video
+
+    `start_time` is the time of the first frame. Minutes without vehicles of
+    a type are left out.
+    """
+    minute = start_time.replace(second=0, microsecond=0)
+    origin = (start_time - minute).total_seconds()
+    counts, _ = _binned_counts(manifest, 60, origin)
+    return [
+        {
+            "bucket_start": minute + timedelta(minutes=index),
+            "vehicle_type": vehicle_type,
+            "count": count,
+        }
+        for index, row in enumerate(counts.tolist())
+        for vehicle_type, count in zip(VEHICLE_TYPES, row)
+        if count
+    ]
+
+
+def video_summary(results: Dict) -> Dict:
+    """Summary columns of a `Video` row, from results with or without frames"""
+    counts = results.get("total_counts") or {}
+    stats = results.get("processing_stats") or {}
+    fps = results.get("fps") or 0
+    summary = {
+        f"{vehicle_type}_count": counts.get(vehicle_type, 0)
+        for vehicle_type in VEHICLE_TYPES
+    }
+    summary.update(
+        total_vehicles=sum(
+            counts.get(vehicle_type, 0) for vehicle_type in VEHICLE_TYPES
+        ),
+        processed_frames=stats.get("processed_frames"),
+        fps=fps,
+        duration_seconds=results.get("total_frames", 0) / fps if fps else None,
+        processing_time=stats.get("processing_time_seconds"),
+    )
+    return summary
+
+
+def is_columnar(json_path: str) -> bool:
+    """Whether results were written as a manifest with column chunks"""
+    return os.path.isdir(store_dir(json_path))
+
+
+def iter_results_json(json_path: str) -> Iterator[bytes]:
+    """
+    Results of a columnar store as legacy-shaped JSON, one piece per chunk
+
+    The frames of each chunk are rebuilt and encoded with orjson before the
+    next chunk is read, so memory holds one chunk rather than every frame.
+    """
+    with open(json_path, "rb") as f:
+        results = orjson.loads(f.read())
+    store = results.pop("frames_store")
+    paths = store["chunks"] if "chunks" in store else [store["path"]]
+    # Chunks removed since the manifest was read: no frames, as in load_results
+    if not all(os.path.exists(path) for path in paths):
+        paths = []
+
+    header = orjson.dumps(results)
+    yield header[:-1] + (b',"frames":[' if results else b'"frames":[')
+    frame_number = 0
+    separator = b""
+    for path in paths:
+        with np.load(path) as data:
+            columns = {name: data[name] for name in _columns_for(["tracked_objects"])}
+        frame_count = len(columns["object_offsets"]) - 1
+        frames = _frame_dicts(
+            columns,
+            range(frame_count),
+            range(frame_number, frame_number + frame_count),
+            ["counts", "tracked_objects"],
+        )
+        frame_number += frame_count
+        if frames:
+            yield separator + orjson.dumps(frames)[1:-1]
+            separator = b","
+    yield b"]}"
+
+
+def load_results(json_path: str, include_frames: bool = True) -> Dict:
+    """
+    Read the results of a video in the legacy JSON shape
+
+    Works for both columnar stores and legacy results files that hold the
+    frames inline. With `include_frames=False` the frames are left out.
+    """
+    with open(json_path, "rb") as f:
+        results = orjson.loads(f.read())
+
+    manifest_store = results.pop("frames_store", None)
+    if not include_frames:
+        results.pop("frames", None)
+    elif manifest_store is not None:
+        try:
+            results["frames"] = legacy_frames(
+                load_frame_columns({"frames_store": manifest_store})
+            )
+        except FileNotFoundError:
+            results["frames"] = []
+    return results
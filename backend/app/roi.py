@@ -0,0 +1,93 @@
+import json
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+# Value given to pixels outside the region of interest (YOLO letterbox gray)
+MASK_FILL = 114
+
+
+def parse_roi(value) -> Optional[List[List[float]]]:
+    """
+    Validate a region of interest polygon
+
+    Accepts a JSON string or a list of [x, y] points given as fractions of
+    the frame width and height (0 to 1). Returns the polygon as a list of
+    [x, y] floats, or None for an empty value.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ValueError("ROI must be a JSON list of [x, y] points")
+    if not value:
+        return None
+
+    try:
+        polygon = [[float(x), float(y)] for x, y in value]
+    except (TypeError, ValueError):
+        raise ValueError("ROI must be a list of [x, y] points")
+
+    if len(polygon) < 3:
+        raise ValueError("ROI polygon needs at least 3 points")
+    if any(not (0 <= x <= 1 and 0 <= y <= 1) for x, y in polygon):
+        raise ValueError("ROI points must be fractions of the frame size (0 to 1)")
+    return polygon
+
+
+class RegionOfInterest:
+    """
+    Road area of a camera, mapped onto frames of a given size
+
+    Inference runs on the bounding box of the polygon only, with pixels
+    outside the polygon blanked, and boxes found in the crop are shifted
+    back to full-frame coordinates.
+    """
+
+    def __init__(self, polygon: List[List[float]], frame_shape: Tuple[int, ...]):
+        frame_height, frame_width = frame_shape[:2]
+        self.polygon = polygon
+        self.points = np.array(
+            [[x * frame_width, y * frame_height] for x, y in polygon], dtype=np.int32
+        )
+
+        x, y, w, h = cv2.boundingRect(self.points)
+        self.x1, self.y1 = max(0, x), max(0, y)
+        self.x2, self.y2 = min(frame_width, x + w), min(frame_height, y + h)
+
+        # Polygon mask of the crop, None if the polygon fills its bounding box
+        mask = np.zeros((self.y2 - self.y1, self.x2 - self.x1), dtype=np.uint8)
+        cv2.fillPoly(mask, [self.points - [self.x1, self.y1]], 255)
+        self.outside = None if mask.all() else mask == 0
+
+        self.area_ratio = ((self.x2 - self.x1) * (self.y2 - self.y1)) / (
+            frame_width * frame_height
+        )
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """Part of the frame sent to the model"""
+        cropped = frame[self.y1 : self.y2, self.x1 : self.x2]
+        if self.outside is not None:
+            cropped = cropped.copy()
+            cropped[self.outside] = MASK_FILL
+        return cropped
+
+    def to_frame(self, bbox: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """Map a box found in the crop back to full-frame coordinates"""
+        x1, y1, x2, y2 = bbox
+        return (x1 + self.x1, y1 + self.y1, x2 + self.x1, y2 + self.y1)
+
+    def contains(self, point: Tuple[int, int]) -> bool:
+        return (
+            cv2.pointPolygonTest(self.points, (float(point[0]), float(point[1])), False)
+            >= 0
+        )
+
+    def describe(self) -> dict:
+        return {
+            "polygon": self.polygon,
+            "crop": [self.x1, self.y1, self.x2, self.y2],
+            "area_ratio": self.area_ratio,
+        }
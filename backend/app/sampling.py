@@ -0,0 +1,149 @@
+import os
+import cv2
+import numpy as np
+from typing import Dict
+
+# Bounds for the adaptive inference stride (in source frames)
+SAMPLING_MIN_STRIDE = int(os.getenv("SAMPLING_MIN_STRIDE", "1"))
+SAMPLING_MAX_STRIDE = int(os.getenv("SAMPLING_MAX_STRIDE", "15"))
+
+# Fraction of changed pixels since the last sampled frame that forces a sample
+SAMPLING_MOTION_THRESHOLD = float(os.getenv("SAMPLING_MOTION_THRESHOLD", "0.002"))
+
+# Size of the downscaled gray frame used to measure motion
+MOTION_PROBE_SIZE = (160, 90)
+# Gray-level difference above which a probe pixel counts as changed
+MOTION_PIXEL_DELTA = 25
+
+
+class FixedSampler:
+    """Send every `stride`-th frame to the model"""
+
+    def __init__(self, stride: int):
+        self.stride = max(1, stride)
+        # The stride never depends on tracking results
+        self.needs_feedback = False
+        self.sampled = 0
+        self.seen = 0
+
+    def should_sample(self, frame_number: int, frame: np.ndarray, tracker) -> bool:
+        self.seen += 1
+        sampled = frame_number % self.stride == 0
+        self.sampled += sampled
+        return sampled
+
+    def stats(self) -> Dict:
+        return {
+            "mode": "fixed",
+            "stride": self.stride,
+            "sampled_frames": self.sampled,
+            "mean_stride": self.seen / self.sampled if self.sampled else 0,
+        }
+
+
+def _confirmed_tracks(tracker):
+    """Live tracks seen at least twice, the ones with a velocity estimate"""
+    return [track for track in tracker.tracks.values() if track.velocity is not None]
+
+
+class AdaptiveSampler:
+    """
+    Pick the inference stride from scene activity
+
+    The stride grows up to `max_stride` while the road is empty. Once
+    vehicles are tracked it is limited so that the fastest one moves at
+    most half the tracker's matching radius between sampled frames, and
+    so that tracks survive until the next sample. A vehicle seen once is
+    looked at again after `min_stride` frames and left out if it is not
+    found there. While nothing is tracked, a frame is also sampled early
+    when enough of the picture changed since the last sampled frame, so
+    vehicles entering an empty road are picked up well before they reach
+    the counting line.
+    """
+
+    def __init__(
+        self,
+        min_stride: int = SAMPLING_MIN_STRIDE,
+        max_stride: int = SAMPLING_MAX_STRIDE,
+        motion_threshold: float = SAMPLING_MOTION_THRESHOLD,
+    ):
+        self.min_stride = max(1, min_stride)
+        self.max_stride = max(self.min_stride, max_stride)
+        self.motion_threshold = motion_threshold
+        self._reference = None
+        self._last_sampled = None
+        # True when the next decisions depend on tracking the frames sampled so far
+        self.needs_feedback = False
+        self.sampled = 0
+        self.seen = 0
+        self.motion_triggers = 0
+
+    def _probe(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, MOTION_PROBE_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def motion_energy(self, frame: np.ndarray) -> float:
+        """Fraction of the frame that changed since the last sampled frame"""
+        delta = cv2.absdiff(self._probe(frame), self._reference)
+        return float(np.count_nonzero(delta > MOTION_PIXEL_DELTA)) / delta.size
+
+    def target_stride(self, frame_shape, tracker) -> int:
+        """Largest stride that still lets the tracker follow the live vehicles"""
+        # Vehicles first seen in the last sampled frame are looked at again
+        # right away to confirm them. Tracks that were not seen again are left
+        # out, so a false detection does not hold the stride down for the
+        # whole lifespan of its track.
+        if any(
+            track.velocity is None and track.first_seen == self._last_sampled
+            for track in tracker.tracks.values()
+        ):
+            return self.min_stride
+
+        tracks = _confirmed_tracks(tracker)
+        if not tracks:
+            return self.max_stride
+
+        match_radius = min(frame_shape[0], frame_shape[1]) * tracker.match_radius_ratio
+        speed = max(np.hypot(*track.velocity) for track in tracks)
+        stride = int(0.5 * match_radius / speed) if speed > 0 else self.max_stride
+        stride = min(stride, max(1, tracker.track_lifespan // 2))
+        return max(self.min_stride, min(self.max_stride, stride))
+
+    def should_sample(self, frame_number: int, frame: np.ndarray, tracker) -> bool:
+        self.seen += 1
+        sampled = False
+
+        if self._last_sampled is None:
+            sampled = True
+        else:
+            since = frame_number - self._last_sampled
+            if since >= self.min_stride:
+                if since >= self.target_stride(frame.shape, tracker):
+                    sampled = True
+                elif not _confirmed_tracks(tracker):
+                    if self.motion_energy(frame) >= self.motion_threshold:
+                        sampled = True
+                        self.motion_triggers += 1
+
+        if sampled:
+            # Until every live vehicle has a velocity, the stride depends on
+            # what the model finds in this frame
+            self.needs_feedback = (
+                any(track.velocity is None for track in tracker.tracks.values())
+                or not tracker.tracks
+            )
+            self._reference = self._probe(frame)
+            self._last_sampled = frame_number
+            self.sampled += 1
+        return sampled
+
+    def stats(self) -> Dict:
+        return {
+            "mode": "adaptive",
+            "min_stride": self.min_stride,
+            "max_stride": self.max_stride,
+            "motion_threshold": self.motion_threshold,
+            "sampled_frames": self.sampled,
+            "motion_triggered_samples": self.motion_triggers,
+            "mean_stride": self.seen / self.sampled if self.sampled else 0,
+        }
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 
@@ -21,6 +21,32 @@ class User(UserBase):
         from_attributes = True
 
 
+# Camera schemas
+class CameraBase(BaseModel):
+    name: str
+    # Region of interest as [x, y] fractions of the frame size
+    roi: Optional[List[List[float]]] = None
+
+
+class CameraCreate(CameraBase):
+    pass
+
+
+class CameraUpdate(BaseModel):
+    name: Optional[str] = None
+    roi: Optional[List[List[float]]] = None
+
+
+class Camera(CameraBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+    user_id: int
+
+    class Config:
+        from_attributes = True
+
+
 # Video schemas
 class VideoBase(BaseModel):
     name: str
@@ -32,12 +58,17 @@ class VideoCreate(VideoBase):
     file_path: str
     status: str
     model_size: Optional[str] = "nano"
+    inference_size: Optional[int] = None
+    roi: Optional[List[List[float]]] = None
+    camera_id: Optional[int] = None
+    recorded_at: Optional[datetime] = None
 
 
 class VideoUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     model_size: Optional[str] = None
+    roi: Optional[List[List[float]]] = None
 
 
 class Video(VideoBase):
@@ -48,7 +79,18 @@ class Video(VideoBase):
     result_path: Optional[str] = None
     json_result_path: Optional[str] = None
     model_size: Optional[str] = "nano"
+    inference_size: Optional[int] = None
     error_message: Optional[str] = None
+    roi: Optional[List[List[float]]] = None
+    camera_id: Optional[int] = None
+    recorded_at: Optional[datetime] = None
+    # Results summary, set once processing completed
+    total_counts: Optional[Dict[str, int]] = None
+    total_vehicles: Optional[int] = None
+    processed_frames: Optional[int] = None
+    fps: Optional[float] = None
+    duration_seconds: Optional[float] = None
+    processing_time: Optional[float] = None
     created_at: datetime
     updated_at: datetime
     user_id: int
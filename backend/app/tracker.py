@@ -0,0 +1,373 @@
+import os
+import numpy as np
+from collections import namedtuple
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+from typing import Dict, List, Tuple
+
+# Cost given to detection/track pairs that may never be matched
+INFEASIBLE_COST = 1e9
+
+# Number of live tracks from which candidates come from a spatial index (0 disables it)
+SPATIAL_INDEX_MIN_TRACKS = int(os.getenv("SPATIAL_INDEX_MIN_TRACKS", "100"))
+
+
+def _solve_groups(
+    detection_index: np.ndarray,
+    track_index: np.ndarray,
+    distances: np.ndarray,
+    detection_count: int,
+    track_count: int,
+) -> List[Tuple[int, int]]:
+    """
+    Minimal-cost one-to-one matching over candidate (detection, track) pairs
+
+    Pairs that are not candidates can never be matched, so the candidate
+    graph splits into independent groups of nearby detections and tracks,
+    and each group is solved on its own small cost matrix. The matrices
+    only depend on the set of candidates and their distances, never on the
+    order they were found in, so every caller passing the same candidates
+    gets the same matches, ties included.
+    """
+    if len(distances) == 0:
+        return []
+
+    # Group detections (nodes 0..n-1) and tracks (nodes n..n+m-1) that share candidates
+    node_count = detection_count + track_count
+    graph = coo_matrix(
+        (
+            np.ones(len(distances)),
+            (detection_index, detection_count + track_index),
+        ),
+        shape=(node_count, node_count),
+    )
+    _, labels = connected_components(graph, directed=False)
+    edge_groups = labels[detection_index]
+
+    matches = []
+    order = np.argsort(edge_groups, kind="stable")
+    boundaries = np.flatnonzero(np.diff(edge_groups[order])) + 1
+    for edges in np.split(order, boundaries):
+        group_detections = detection_index[edges]
+        group_tracks = track_index[edges]
+
+        # Most groups are a single detection next to a single track
+        if len(edges) == 1:
+            matches.append((int(group_detections[0]), int(group_tracks[0])))
+            continue
+
+        rows_ids, rows = np.unique(group_detections, return_inverse=True)
+        cols_ids, cols = np.unique(group_tracks, return_inverse=True)
+        cost = np.full((len(rows_ids), len(cols_ids)), INFEASIBLE_COST)
+        cost[rows, cols] = distances[edges]
+
+        rows, cols = linear_sum_assignment(cost)
+        feasible = cost[rows, cols] < INFEASIBLE_COST
+        matches.extend(
+            zip(rows_ids[rows[feasible]].tolist(), cols_ids[cols[feasible]].tolist())
+        )
+
+    return sorted(matches)
+
+
+def associate(
+    track_points: np.ndarray,
+    track_types: np.ndarray,
+    detection_points: np.ndarray,
+    detection_types: np.ndarray,
+    max_distance: float,
+) -> List[Tuple[int, int]]:
+    """
+    Assign detections to tracks one-to-one with minimal total centroid distance
+
+    Pairs of different vehicle types or further apart than `max_distance` are
+    gated out. Returns (detection_index, track_index) pairs, sorted.
+    """
+    if len(track_points) == 0 or len(detection_points) == 0:
+        return []
+
+    # Euclidean distance between every detection (rows) and track (columns)
+    delta = detection_points[:, None, :] - track_points[None, :, :]
+    cost = np.hypot(delta[..., 0], delta[..., 1])
+
+    feasible = (cost < max_distance) & (
+        detection_types[:, None] == track_types[None, :]
+    )
+    detection_index, track_index = np.nonzero(feasible)
+    return _solve_groups(
+        detection_index,
+        track_index,
+        cost[detection_index, track_index],
+        len(detection_points),
+        len(track_points),
+    )
+
+
+def associate_indexed(
+    track_points: np.ndarray,
+    track_types: np.ndarray,
+    detection_points: np.ndarray,
+    detection_types: np.ndarray,
+    max_distance: float,
+) -> List[Tuple[int, int]]:
+    """
+    Same assignment as `associate`, using a KD-tree to find candidate pairs
+
+    Only pairs within `max_distance` are ever compared, which is much cheaper
+    than the full distance matrix when many vehicles are in view. Candidate
+    distances are recomputed the way `associate` computes them, so both
+    functions gate and solve exactly the same pairs and return the same
+    matches.
+    """
+    if len(track_points) == 0 or len(detection_points) == 0:
+        return []
+
+    # Slightly wider radius: the tree's distances may differ from np.hypot in
+    # the last bit, the gate below is the one `associate` applies
+    candidates = cKDTree(detection_points).sparse_distance_matrix(
+        cKDTree(track_points), max_distance * (1 + 1e-9), output_type="ndarray"
+    )
+    detection_index = candidates["i"].astype(np.intp)
+    track_index = candidates["j"].astype(np.intp)
+    delta = detection_points[detection_index] - track_points[track_index]
+    distances = np.hypot(delta[:, 0], delta[:, 1])
+
+    keep = (distances < max_distance) & (
+        detection_types[detection_index] == track_types[track_index]
+    )
+    return _solve_groups(
+        detection_index[keep],
+        track_index[keep],
+        distances[keep],
+        len(detection_points),
+        len(track_points),
+    )
+
+
+def _side(origin, direction, point) -> float:
+    """Signed area telling on which side of a directed line a point lies"""
+    return direction[0] * (point[1] - origin[1]) - direction[1] * (point[0] - origin[0])
+
+
+def crosses_line(previous, current, line_start, line_end) -> bool:
+    """
+    Check whether the move from `previous` to `current` crosses the counting line
+
+    The line runs from `line_start` to `line_end`, and only crossings from
+    the side above it (for a line drawn left to right in image coordinates)
+    onto or past it count. The move is tested as a segment, so a vehicle
+    that moved far between two processed frames is still counted.
+    """
+    line_direction = (line_end[0] - line_start[0], line_end[1] - line_start[1])
+    if not (
+        _side(line_start, line_direction, previous) < 0
+        and _side(line_start, line_direction, current) >= 0
+    ):
+        return False
+
+    # The path must also pass between the two ends of the line
+    path_direction = (current[0] - previous[0], current[1] - previous[1])
+    start_side = _side(previous, path_direction, line_start)
+    end_side = _side(previous, path_direction, line_end)
+    return start_side * end_side <= 0
+
+
+# Compact record of a track that is no longer followed
+TrackSummary = namedtuple(
+    "TrackSummary", ["track_id", "vehicle_type", "first_seen", "last_seen", "counted"]
+)
+
+
+class Track:
+    """State of one live vehicle track"""
+
+    __slots__ = (
+        "track_id",
+        "vehicle_type",
+        "centroid",
+        "bbox",
+        "confidence",
+        "first_seen",
+        "last_seen",
+        "counted",
+        "countable",
+        "velocity",
+    )
+
+    def __init__(
+        self, track_id, vehicle_type, centroid, bbox, confidence, frame_number
+    ):
+        self.track_id = track_id
+        self.vehicle_type = vehicle_type
+        self.centroid = centroid
+        self.bbox = bbox
+        self.confidence = confidence
+        self.first_seen = frame_number
+        self.last_seen = frame_number
+        self.counted = False
+        # Vehicles first seen past the counting line are never counted
+        self.countable = True
+        # Centroid displacement per frame, unknown until the track is matched again
+        self.velocity = None
+
+    def predict(self, frame_number: int, default_velocity=None) -> Tuple[float, float]:
+        """
+        Expected centroid at `frame_number` under constant velocity
+
+        Tracks seen only once move with `default_velocity`, if given.
+        """
+        velocity = self.velocity or default_velocity
+        if velocity is None:
+            return self.centroid
+        elapsed = frame_number - self.last_seen
+        return (
+            self.centroid[0] + velocity[0] * elapsed,
+            self.centroid[1] + velocity[1] * elapsed,
+        )
+
+    def summary(self) -> TrackSummary:
+        return TrackSummary(
+            self.track_id,
+            self.vehicle_type,
+            self.first_seen,
+            self.last_seen,
+            self.counted,
+        )
+
+
+class VehicleTracker:
+    """
+    Centroid tracker that counts vehicles crossing a horizontal line
+
+    Detections are matched against the position each track is predicted to
+    have reached under constant velocity, so vehicles that move further than
+    the matching radius between two processed frames keep their track when
+    frames are skipped. Tracks seen only once are assumed to move with the
+    mean velocity of the other vehicles, i.e. with the flow of traffic.
+
+    Only live tracks are kept in `tracks`. A track that has not been seen
+    for more than `track_lifespan` frames is moved to `retired` as a
+    TrackSummary and never visited by `update` again, so the per-frame cost
+    depends on the number of vehicles in view rather than on the length of
+    the video.
+    """
+
+    def __init__(
+        self,
+        track_lifespan: int = 20,
+        match_radius_ratio: float = 0.1,
+        spatial_index_min_tracks: int = SPATIAL_INDEX_MIN_TRACKS,
+        predict_motion: bool = True,
+    ):
+        # Frames an unseen track stays live before it is retired
+        self.track_lifespan = track_lifespan
+        # Matching radius as a fraction of the shorter frame side
+        self.match_radius_ratio = match_radius_ratio
+        # Use the spatial index once this many tracks are live (0 disables it)
+        self.spatial_index_min_tracks = spatial_index_min_tracks
+        # Match against predicted instead of last seen positions
+        self.predict_motion = predict_motion
+        self.tracks: Dict[int, Track] = {}
+        self.retired: List[TrackSummary] = []
+        self.next_track_id = 1
+
+    def update(
+        self,
+        vehicles: List[Tuple[str, Tuple[int, int, int, int], float]],
+        frame_shape: Tuple[int, ...],
+        frame_number: int,
+        counting_line_y: int,
+    ) -> List[Tuple[Track, bool]]:
+        """
+        Match one frame of (vehicle_type, bbox, confidence) detections to tracks
+
+        Returns (track, counted_now) for every detection, in input order,
+        where `counted_now` is True if the vehicle crossed the counting line
+        from top to bottom since it was last seen.
+        """
+        max_distance = min(frame_shape[0], frame_shape[1]) * self.match_radius_ratio
+        line_start, line_end = (0, counting_line_y), (frame_shape[1], counting_line_y)
+
+        centroids = [
+            ((x1 + x2) // 2, (y1 + y2) // 2) for _, (x1, y1, x2, y2), _ in vehicles
+        ]
+
+        live_tracks = list(self.tracks.values())
+
+        predicted = [track.centroid for track in live_tracks]
+        if self.predict_motion:
+            velocities = [t.velocity for t in live_tracks if t.velocity is not None]
+            flow = tuple(np.mean(velocities, axis=0)) if velocities else None
+            predicted = [track.predict(frame_number, flow) for track in live_tracks]
+
+        # In dense scenes only compare detections with nearby tracks
+        use_index = 0 < self.spatial_index_min_tracks <= len(live_tracks)
+        matches = (associate_indexed if use_index else associate)(
+            np.array(predicted, dtype=float).reshape(-1, 2),
+            np.array([track.vehicle_type for track in live_tracks]),
+            np.array(centroids, dtype=float).reshape(-1, 2),
+            np.array([vehicle_type for vehicle_type, _, _ in vehicles]),
+            max_distance,
+        )
+        matched_tracks = {row: live_tracks[col] for row, col in matches}
+
+        assignments = []
+        for index, (vehicle_type, bbox, confidence) in enumerate(vehicles):
+            center_x, center_y = centroids[index]
+            counted_now = False
+
+            track = matched_tracks.get(index)
+            if track is not None:
+                previous = track.centroid
+
+                # Check if vehicle crossed the counting line from top to bottom
+                crossed_line = crosses_line(
+                    previous, (center_x, center_y), line_start, line_end
+                )
+
+                elapsed = max(1, frame_number - track.last_seen)
+                track.velocity = (
+                    (center_x - previous[0]) / elapsed,
+                    (center_y - previous[1]) / elapsed,
+                )
+                track.centroid = (center_x, center_y)
+                track.bbox = bbox
+                track.confidence = confidence
+                track.last_seen = frame_number
+
+                # Count each vehicle only once
+                if crossed_line and track.countable and not track.counted:
+                    track.counted = True
+                    counted_now = True
+            else:
+                track = Track(
+                    self.next_track_id,
+                    vehicle_type,
+                    (center_x, center_y),
+                    bbox,
+                    confidence,
+                    frame_number,
+                )
+                # Vehicles that appear below the line are never counted
+                track.countable = center_y < counting_line_y
+                self.tracks[track.track_id] = track
+                self.next_track_id += 1
+
+            assignments.append((track, counted_now))
+
+        # Retire tracks that have not been seen for too long
+        for track in live_tracks:
+            if frame_number - track.last_seen > self.track_lifespan:
+                del self.tracks[track.track_id]
+                self.retired.append(track.summary())
+
+        return assignments
+
+    def finalize(self) -> List[TrackSummary]:
+        """Retire all remaining live tracks and return every track summary"""
+        for track in self.tracks.values():
+            self.retired.append(track.summary())
+        self.tracks.clear()
+        return self.retired
@@ -0,0 +1,67 @@
+import json
+import logging
+
+from app import crud, models
+from app.database import SessionLocal, engine, add_missing_columns
+from app.result_store import minute_buckets, video_summary
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def backfill_summaries():
+    """
+    Fill the summary columns and count buckets of completed videos
+
+    For videos processed before these existed; videos that already have
+    both are left alone.
+    """
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(models.Base.metadata)
+
+    db = SessionLocal()
+    try:
+        videos = (
+            db.query(models.Video)
+            .filter(
+                models.Video.status == "completed",
+                models.Video.json_result_path.isnot(None),
+            )
+            .all()
+        )
+        for video in videos:
+            has_buckets = (
+                db.query(models.CountBucket.id)
+                .filter(models.CountBucket.video_id == video.id)
+                .first()
+                is not None
+            )
+            if video.total_vehicles is not None and has_buckets:
+                continue
+
+            try:
+                with open(video.json_result_path, "r") as f:
+                    manifest = json.load(f)
+                buckets = minute_buckets(
+                    manifest, video.recorded_at or video.created_at
+                )
+            except Exception as e:
+                logger.error(f"Could not read results of video {video.id}: {str(e)}")
+                continue
+
+            for key, value in video_summary(manifest).items():
+                setattr(video, key, value)
+            crud.replace_count_buckets(db, video.id, buckets)
+            logger.info(
+                f"Video {video.id}: {video.total_vehicles} vehicles counted, "
+                f"{len(buckets)} count buckets"
+            )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    backfill_summaries()
@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import logging
+import cv2
+import numpy as np
+
+from app.ai import MODELS_DIR, MODEL_OPTIONS, VEHICLE_CLASSES, download_model
+from app.backends import BACKENDS, ExportedModel, available_backends
+
+# Model sizes to compare, e.g. BENCHMARK_MODEL_SIZES=nano,small
+MODEL_SIZES = os.getenv("BENCHMARK_MODEL_SIZES", ",".join(MODEL_OPTIONS)).split(",")
+FRAMES = 32
+BATCH_SIZE = 4
+WARMUP_CALLS = 2
+
+
+def load_frames(video_path=None, count=FRAMES):
+    """Frames from a video, or synthetic 720p frames if no video is given"""
+    if video_path is None:
+        rng = np.random.default_rng(0)
+        return [
+            rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8) for _ in range(count)
+        ]
+
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def load_model(weights_path, backend):
+    if backend == "torch":
+        from ultralytics import YOLO
+
+        return YOLO(weights_path)
+    return ExportedModel(weights_path, backend)
+
+
+def vehicle_boxes(detection):
+    """Sorted (class, rounded box) tuples of the vehicle detections of one frame"""
+    boxes = []
+    for box in detection.boxes:
+        class_id = int(box.cls.item())
+        if class_id in VEHICLE_CLASSES and box.conf.item() > 0.25:
+            boxes.append((class_id, tuple(round(float(v)) for v in box.xyxy[0])))
+    return sorted(boxes)
+
+
+def benchmark(model, frames):
+    """Milliseconds per frame and per-frame vehicle detections"""
+    for _ in range(WARMUP_CALLS):
+        model(frames[:BATCH_SIZE], verbose=False)
+
+    detections = []
+    start = time.perf_counter()
+    for index in range(0, len(frames), BATCH_SIZE):
+        detections.extend(model(frames[index : index + BATCH_SIZE], verbose=False))
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(frames)
+
+    return elapsed_ms, [vehicle_boxes(detection) for detection in detections]
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    frames = load_frames(sys.argv[1] if len(sys.argv) > 1 else None)
+    backends = [
+        backend
+        for backend in ["torch"] + list(BACKENDS)
+        if backend in available_backends()
+    ]
+
+    print(
+        f"Inference cost per frame over {len(frames)} frames, batches of {BATCH_SIZE}"
+    )
+    print(
+        f"{'model':>8} {'backend':>12} {'ms/frame':>10} {'fps':>8} {'vehicles':>9} {'same as first':>14}"
+    )
+    for model_size in MODEL_SIZES:
+        weights_path = os.path.join(MODELS_DIR, MODEL_OPTIONS[model_size])
+        if not os.path.exists(weights_path):
+            download_model(MODEL_OPTIONS[model_size], weights_path)
+
+        reference = None
+        for backend in backends:
+            try:
+                elapsed_ms, boxes = benchmark(load_model(weights_path, backend), frames)
+            except Exception as e:
+                print(f"{model_size:>8} {backend:>12} failed: {str(e)[:60]}")
+                continue
+
+            if reference is None:
+                reference = boxes
+            # Frames whose vehicle detections match the first backend exactly
+            same = sum(a == b for a, b in zip(boxes, reference))
+            print(
+                f"{model_size:>8} {backend:>12} {elapsed_ms:>10.2f} {1000 / elapsed_ms:>8.1f} "
+                f"{sum(map(len, boxes)):>9} {same:>9}/{len(frames):<4}"
+            )
@@ -0,0 +1,52 @@
+import os
+import sys
+import json
+import logging
+
+from app.ai import process_video
+
+# Inference resolutions to compare (None is the model's default input size)
+INFERENCE_SIZES = [None, 1280, 960, 640, 480, 320]
+MODEL_SIZE = os.getenv("BENCHMARK_MODEL_SIZE", "nano")
+
+
+def benchmark(video_path, inference_size):
+    """Process the video at one inference resolution and return its results"""
+    file_id = f"benchmark_{inference_size or 'default'}"
+    _, json_path = process_video(
+        video_path, file_id, MODEL_SIZE, inference_size=inference_size
+    )
+    with open(json_path, "r") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmark_resolution.py <video_path>")
+        exit(1)
+
+    logging.disable(logging.INFO)
+    video_path = sys.argv[1]
+
+    reference = None
+    print(f"Processing speed and counts per inference resolution ({MODEL_SIZE} model)")
+    print(
+        f"{'size':>8} {'input':>10} {'fps':>8} {'counted':>8} {'difference':>11} {'unique':>8}"
+    )
+    for inference_size in INFERENCE_SIZES:
+        results = benchmark(video_path, inference_size)
+        stats = results["processing_stats"]
+        counts = results["counted_vehicles"]
+        if reference is None:
+            reference = counts
+
+        # Per-type absolute count difference against the first (reference) run
+        difference = sum(
+            abs(counts[vehicle_type] - reference[vehicle_type])
+            for vehicle_type in reference
+        )
+        print(
+            f"{str(inference_size or 'default'):>8} {str(stats['inference_resolution']):>10} "
+            f"{stats['frames_per_second']:>8.1f} {sum(counts.values()):>8} "
+            f"{difference:>11} {sum(results['unique_vehicles'].values()):>8}"
+        )
@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import resource
+import tempfile
+import multiprocessing
+
+# Synthetic video whose legacy results file is about 100 MB
+FRAMES = 16500
+REQUESTS = 10
+
+
+def build_results(directory, frames):
+    """Legacy results file and columnar store of the same synthetic video"""
+    from benchmark_results import synthetic_frames
+    from app.result_store import ResultWriter
+
+    results = {"video_id": "benchmark", "fps": 30, "frames": synthetic_frames(frames)}
+    legacy_path = os.path.join(directory, "legacy_results.json")
+    with open(legacy_path, "w") as f:
+        json.dump(results, f, indent=4)
+
+    # Chunked like the worker writes it, RESULT_FLUSH_FRAMES frames per chunk
+    store_path = os.path.join(directory, "store_results.json")
+    writer = ResultWriter(store_path, results, 30)
+    counted_tracks = set()
+    for index, record in enumerate(results["frames"]):
+        counted_indices = set()
+        for position, obj in enumerate(record["tracked_objects"]):
+            if obj["counted"] and obj["id"] not in counted_tracks:
+                counted_tracks.add(obj["id"])
+                counted_indices.add(position)
+        writer.append(record, counted_indices, index)
+    writer.close()
+    return legacy_path, store_path
+
+
+def make_app(mode, json_path):
+    """One results route, answered as before or after orjson and streaming"""
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse
+
+    # Imported in both modes so the processes start from the same footprint
+    from app.main import _results_response
+    from app.result_store import load_results
+
+    if mode == "before":
+        # Parse into Python objects, FastAPI re-encodes with the stdlib encoder
+        app = FastAPI(default_response_class=JSONResponse)
+
+        @app.get("/results")
+        def results():
+            return load_results(json_path)
+
+    else:
+        app = FastAPI()
+
+        @app.get("/results")
+        def results():
+            return _results_response(json_path, True)
+
+    return app
+
+
+async def get(app, path):
+    """Run one GET through the ASGI app, discarding the body; returns its size"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"benchmark")],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    size = 0
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # Client stays connected: wait until the response is done
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+def run_mode(mode, json_path, requests):
+    """Time `requests` responses in a fresh process and report its peak RSS"""
+    app = make_app(mode, json_path)
+    latencies = []
+    size = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        size = asyncio.run(get(app, "/results"))
+        latencies.append((time.perf_counter() - start) * 1000)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return latencies, size, peak_rss / 1024
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else FRAMES
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else REQUESTS
+    context = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path, store_path = build_results(directory, frames)
+        legacy_mb = os.path.getsize(legacy_path) / 1e6
+
+        print(f"Results response ({frames} frames, legacy file {legacy_mb:.0f} MB)")
+        print(
+            f"{'results':>9} {'response':>9} {'body MB':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak RSS MB':>12}"
+        )
+        for label, json_path in (("legacy", legacy_path), ("columnar", store_path)):
+            for mode in ("before", "after"):
+                # A fresh process per mode, so peak RSS is its own
+                with context.Pool(1) as pool:
+                    latencies, size, peak_rss = pool.apply(
+                        run_mode, (mode, json_path, requests)
+                    )
+                print(
+                    f"{label:>9} {mode:>9} {size / 1e6:>8.1f} {percentile(latencies, 50):>8.0f} "
+                    f"{percentile(latencies, 99):>8.0f} {peak_rss:>12.0f}"
+                )
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import numpy as np
+
+from app.result_store import (
+    VEHICLE_TYPES,
+    FrameColumns,
+    load_frame_columns,
+    load_results,
+    save_results,
+    store_dir,
+)
+
+# Synthetic video used when no results file is given
+FRAMES = 20000
+OBJECTS_PER_FRAME = 12
+
+
+def synthetic_frames(frames=FRAMES, objects=OBJECTS_PER_FRAME):
+    """Frame records shaped like the ones `track_frame` builds"""
+    rng = np.random.default_rng(0)
+    records = []
+    for frame_number in range(frames):
+        tracked_objects = []
+        for index in range(objects):
+            x1, y1 = (int(v) for v in rng.integers(0, 1800, 2))
+            tracked_objects.append(
+                {
+                    "id": str(frame_number // 50 * objects + index + 1),
+                    "type": VEHICLE_TYPES[int(rng.integers(0, 4))],
+                    "bbox": [x1, y1, x1 + 80, y1 + 60],
+                    "confidence": float(rng.random()),
+                    "centroid": [x1 + 40, y1 + 30],
+                    "counted": bool(rng.random() < 0.5),
+                }
+            )
+        records.append(
+            {
+                "frame_number": frame_number,
+                "counts": dict.fromkeys(VEHICLE_TYPES, 0),
+                "tracked_objects": tracked_objects,
+            }
+        )
+    return records
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    value = function(*args)
+    return value, (time.perf_counter() - start) * 1000
+
+
+def write_legacy(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4)
+
+
+def read_legacy(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        results = read_legacy(sys.argv[1])
+        source = sys.argv[1]
+    else:
+        results = {"video_id": "benchmark", "fps": 30, "frames": synthetic_frames()}
+        source = f"synthetic, {FRAMES} frames x {OBJECTS_PER_FRAME} objects"
+
+    frames = results["frames"]
+    columns = FrameColumns.from_legacy_frames(frames, results.get("fps") or 30)
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path = os.path.join(directory, "legacy_results.json")
+        manifest_path = os.path.join(directory, "store_results.json")
+
+        _, legacy_write = timed(write_legacy, legacy_path, results)
+        _, legacy_read = timed(read_legacy, legacy_path)
+        _, store_write = timed(save_results, manifest_path, results, columns)
+        _, columns_read = timed(lambda: load_frame_columns(read_legacy(manifest_path)))
+        _, compat_read = timed(load_results, manifest_path)
+
+        legacy_size = os.path.getsize(legacy_path)
+        chunks_dir = store_dir(manifest_path)
+        store_size = os.path.getsize(manifest_path) + sum(
+            os.path.getsize(os.path.join(chunks_dir, name))
+            for name in os.listdir(chunks_dir)
+        )
+
+    print(f"Results storage ({source})")
+    print(f"{'format':>22} {'size MB':>9} {'write ms':>10} {'read ms':>9}")
+    print(
+        f"{'legacy JSON':>22} {legacy_size / 1e6:>9.2f} {legacy_write:>10.1f} {legacy_read:>9.1f}"
+    )
+    print(
+        f"{'columnar':>22} {store_size / 1e6:>9.2f} {store_write:>10.1f} {columns_read:>9.1f}"
+    )
+    print(f"{'columnar as legacy':>22} {'':>9} {'':>10} {compat_read:>9.1f}")
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import time
+import logging
+import multiprocessing
+
+from app.cpu_slots import available_cores, configure_slot
+
+MODEL_SIZE = os.getenv("BENCHMARK_MODEL_SIZE", "nano")
+
+
+def run_job(index, slots, partitioned, video_path, barrier, results):
+    """Process the video once in its own process, like one worker of the pool"""
+    if partitioned:
+        configure_slot(index, slots)
+    # Imported after the slot is configured, as in worker processes
+    from app.ai import process_video, warm_up_models
+
+    logging.disable(logging.INFO)
+    warm_up_models([MODEL_SIZE], inferences=1)
+    barrier.wait()
+
+    _, json_path = process_video(video_path, f"benchmark_slot_{index}", MODEL_SIZE)
+    with open(json_path, "r") as f:
+        stats = json.load(f)["processing_stats"]
+    results.put(
+        (stats["processed_frames"], stats.get("cpu_slot", {}).get("utilization"))
+    )
+
+
+def benchmark(video_path, slots, partitioned):
+    """Aggregate frames per second of `slots` videos processed at the same time"""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(slots + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=run_job,
+            args=(index, slots, partitioned, video_path, barrier, results),
+        )
+        for index in range(slots)
+    ]
+    for process in processes:
+        process.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    frames = sum(processed for processed, _ in outcomes)
+    utilization = [value for _, value in outcomes if value is not None]
+    return frames / elapsed, utilization
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(
+            "Usage: python benchmark_slots.py <video_path> [slot counts, e.g. 1,2,4,8]"
+        )
+        exit(1)
+
+    video_path = sys.argv[1]
+    cores = len(available_cores())
+    if len(sys.argv) > 2:
+        slot_counts = [int(count) for count in sys.argv[2].split(",")]
+    else:
+        slot_counts = [count for count in (1, 2, 4, 8, 16, 32) if count <= cores]
+
+    print(f"Aggregate processing speed on {cores} cores ({MODEL_SIZE} model)")
+    print(
+        f"{'slots':>6} {'shared fps':>11} {'slots fps':>10} {'scaling':>8} {'slot utilization':>17}"
+    )
+    single = None
+    for slots in slot_counts:
+        shared_fps, _ = benchmark(video_path, slots, partitioned=False)
+        slots_fps, utilization = benchmark(video_path, slots, partitioned=True)
+        if single is None:
+            single = slots_fps / slots
+        mean_utilization = sum(utilization) / len(utilization) if utilization else 0
+        print(
+            f"{slots:>6} {shared_fps:>11.1f} {slots_fps:>10.1f} "
+            f"{slots_fps / single:>7.2f}x {mean_utilization:>16.0%}"
+        )
@@ -0,0 +1,221 @@
+import time
+import numpy as np
+
+from app.tracker import VehicleTracker
+
+# Synthetic 1080p scene with vehicles driving down the frame
+FRAME_SHAPE = (1080, 1920, 3)
+COUNTING_LINE_Y = int(FRAME_SHAPE[0] * 0.6)
+FRAMES = 200
+VEHICLE_COUNTS = [10, 100, 500]
+# Vehicles in view for the dense scene (spatial index) benchmark
+DENSE_VEHICLE_COUNTS = [200, 500, 1000, 2000]
+# Video lengths (in frames) for the track store growth benchmark
+VIDEO_LENGTHS = [500, 2000, 5000]
+LENGTH_VEHICLES = 50
+# Frame strides for the counting accuracy benchmark
+STRIDES = [1, 4, 8, 12, 16]
+STRIDE_VEHICLES = 20
+TYPES = ["car", "motorcycle", "bus", "truck"]
+
+
+def make_scene(vehicle_count, frames, seed=0):
+    """Generate per-frame (vehicle_type, bbox, confidence) detections"""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(
+        [0, 0], [FRAME_SHAPE[1], FRAME_SHAPE[0]], (vehicle_count, 2)
+    )
+    velocities = rng.uniform([-2, 2], [2, 12], (vehicle_count, 2))
+    types = rng.choice(TYPES, vehicle_count)
+
+    scene = []
+    for _ in range(frames):
+        positions = positions + velocities
+        # Vehicles leaving at the bottom re-enter at the top
+        positions[:, 1] %= FRAME_SHAPE[0]
+        positions[:, 0] %= FRAME_SHAPE[1]
+        scene.append(
+            [
+                (
+                    str(types[i]),
+                    (int(x) - 20, int(y) - 15, int(x) + 20, int(y) + 15),
+                    0.9,
+                )
+                for i, (x, y) in enumerate(positions)
+            ]
+        )
+    return scene
+
+
+def legacy_update(state, vehicles, frame_number, track_lifespan=20):
+    """Greedy per-detection loop over every track, as process_frame used to do"""
+    tracked_vehicles = state["tracked_vehicles"]
+    max_distance = min(FRAME_SHAPE[0], FRAME_SHAPE[1]) * 0.1
+    current_tracked_ids = set()
+
+    for vehicle_type, (x1, y1, x2, y2), confidence in vehicles:
+        center_x, center_y = (x1 + x2) // 2, (y1 + y2) // 2
+        matched_id = None
+        min_distance = float("inf")
+        for track_id, vehicle_info in tracked_vehicles.items():
+            if vehicle_info["type"] == vehicle_type and vehicle_info["active"]:
+                track_x, track_y = vehicle_info["centroid"]
+                distance = (
+                    (center_x - track_x) ** 2 + (center_y - track_y) ** 2
+                ) ** 0.5
+                if distance < max_distance and distance < min_distance:
+                    min_distance = distance
+                    matched_id = track_id
+
+        if matched_id is None:
+            matched_id = state["next_track_id"]
+            state["next_track_id"] += 1
+            tracked_vehicles[matched_id] = {"type": vehicle_type, "active": True}
+        tracked_vehicles[matched_id].update(
+            {"centroid": (center_x, center_y), "last_seen": frame_number}
+        )
+        current_tracked_ids.add(matched_id)
+
+    for track_id in list(tracked_vehicles.keys()):
+        if track_id not in current_tracked_ids:
+            if frame_number - tracked_vehicles[track_id]["last_seen"] > track_lifespan:
+                tracked_vehicles[track_id]["active"] = False
+
+
+def benchmark(vehicle_count):
+    scene = make_scene(vehicle_count, FRAMES)
+
+    tracker = VehicleTracker()
+    start = time.perf_counter()
+    for frame_number, vehicles in enumerate(scene):
+        tracker.update(vehicles, FRAME_SHAPE, frame_number, COUNTING_LINE_Y)
+    hungarian_ms = (time.perf_counter() - start) * 1000 / FRAMES
+
+    state = {"tracked_vehicles": {}, "next_track_id": 1}
+    start = time.perf_counter()
+    for frame_number, vehicles in enumerate(scene):
+        legacy_update(state, vehicles, frame_number)
+    legacy_ms = (time.perf_counter() - start) * 1000 / FRAMES
+
+    return (
+        hungarian_ms,
+        legacy_ms,
+        tracker.next_track_id - 1,
+        state["next_track_id"] - 1,
+    )
+
+
+def benchmark_length(frames, vehicle_count=LENGTH_VEHICLES, window=100):
+    """Per-frame cost over the last `window` frames of a video of `frames` frames"""
+    scene = make_scene(vehicle_count, frames)
+
+    tracker = VehicleTracker()
+    for frame_number, vehicles in enumerate(scene[:-window]):
+        tracker.update(vehicles, FRAME_SHAPE, frame_number, COUNTING_LINE_Y)
+    start = time.perf_counter()
+    for frame_number, vehicles in enumerate(scene[-window:], frames - window):
+        tracker.update(vehicles, FRAME_SHAPE, frame_number, COUNTING_LINE_Y)
+    tracker_ms = (time.perf_counter() - start) * 1000 / window
+
+    state = {"tracked_vehicles": {}, "next_track_id": 1}
+    for frame_number, vehicles in enumerate(scene[:-window]):
+        legacy_update(state, vehicles, frame_number)
+    start = time.perf_counter()
+    for frame_number, vehicles in enumerate(scene[-window:], frames - window):
+        legacy_update(state, vehicles, frame_number)
+    legacy_ms = (time.perf_counter() - start) * 1000 / window
+
+    return tracker_ms, legacy_ms, len(tracker.tracks), len(state["tracked_vehicles"])
+
+
+def benchmark_dense(vehicle_count, frames=50):
+    """Per-frame cost with a dense cost matrix versus the spatial index"""
+    scene = make_scene(vehicle_count, frames, seed=1)
+
+    timings = []
+    for spatial_index_min_tracks in (0, 1):
+        tracker = VehicleTracker(spatial_index_min_tracks=spatial_index_min_tracks)
+        start = time.perf_counter()
+        for frame_number, vehicles in enumerate(scene):
+            tracker.update(vehicles, FRAME_SHAPE, frame_number, COUNTING_LINE_Y)
+        timings.append((time.perf_counter() - start) * 1000 / frames)
+        timings.append(tracker.next_track_id - 1)
+
+    return timings
+
+
+def true_crossings(scene, frames):
+    """Line crossings of every simulated vehicle over the first `frames` frames"""
+    crossings = 0
+    for previous, current in zip(scene[: frames - 1], scene[1:frames]):
+        for (_, (_, y1, _, y2), _), (_, (_, y3, _, y4), _) in zip(previous, current):
+            crossings += (y1 + y2) // 2 < COUNTING_LINE_Y <= (y3 + y4) // 2
+    return crossings
+
+
+def benchmark_stride(stride, vehicle_count=STRIDE_VEHICLES, frames=FRAMES * 2):
+    """Counted crossings and created tracks when only every `stride`-th frame is processed"""
+    scene = make_scene(vehicle_count, frames, seed=2)
+    sampled = list(range(0, frames, stride))
+
+    outcome = [true_crossings(scene, sampled[-1] + 1)]
+    for predict_motion in (True, False):
+        tracker = VehicleTracker(predict_motion=predict_motion)
+        counted = 0
+        for frame_number in sampled:
+            assignments = tracker.update(
+                scene[frame_number], FRAME_SHAPE, frame_number, COUNTING_LINE_Y
+            )
+            counted += sum(counted_now for _, counted_now in assignments)
+        outcome += [counted, tracker.next_track_id - 1]
+
+    return outcome
+
+
+if __name__ == "__main__":
+    print(
+        f"Per-frame tracking cost over {FRAMES} frames ({FRAME_SHAPE[1]}x{FRAME_SHAPE[0]})"
+    )
+    print(
+        f"{'vehicles':>10} {'hungarian ms':>14} {'legacy ms':>12} {'tracks':>8} {'legacy tracks':>14}"
+    )
+    for vehicle_count in VEHICLE_COUNTS:
+        hungarian_ms, legacy_ms, tracks, legacy_tracks = benchmark(vehicle_count)
+        print(
+            f"{vehicle_count:>10} {hungarian_ms:>14.3f} {legacy_ms:>12.3f} {tracks:>8} {legacy_tracks:>14}"
+        )
+
+    print()
+    print(f"Per-frame tracking cost at the end of a video ({LENGTH_VEHICLES} vehicles)")
+    print(
+        f"{'frames':>10} {'tracker ms':>12} {'legacy ms':>12} {'live tracks':>12} {'legacy tracks':>14}"
+    )
+    for frames in VIDEO_LENGTHS:
+        tracker_ms, legacy_ms, live_tracks, legacy_tracks = benchmark_length(frames)
+        print(
+            f"{frames:>10} {tracker_ms:>12.3f} {legacy_ms:>12.3f} {live_tracks:>12} {legacy_tracks:>14}"
+        )
+
+    print()
+    print("Per-frame tracking cost in dense scenes, dense matrix vs spatial index")
+    print(
+        f"{'vehicles':>10} {'dense ms':>10} {'indexed ms':>12} {'dense tracks':>13} {'indexed tracks':>15}"
+    )
+    for vehicle_count in DENSE_VEHICLE_COUNTS:
+        dense_ms, dense_tracks, indexed_ms, indexed_tracks = benchmark_dense(
+            vehicle_count
+        )
+        print(
+            f"{vehicle_count:>10} {dense_ms:>10.3f} {indexed_ms:>12.3f} {dense_tracks:>13} {indexed_tracks:>15}"
+        )
+
+    print()
+    print(f"Line crossings counted when skipping frames ({STRIDE_VEHICLES} vehicles)")
+    print(
+        f"{'stride':>10} {'true':>6} {'predicted':>10} {'tracks':>8} {'no motion model':>16} {'tracks':>8}"
+    )
+    for stride in STRIDES:
+        true, counted, tracks, legacy_counted, legacy_tracks = benchmark_stride(stride)
+        print(
+            f"{stride:>10} {true:>6} {counted:>10} {tracks:>8} {legacy_counted:>16} {legacy_tracks:>8}"
+        )
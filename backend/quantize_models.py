@@ -0,0 +1,38 @@
+import os
+import sys
+import json
+import logging
+
+from app.ai import MODELS_DIR, MODEL_OPTIONS, QUANTIZED_MODEL_OPTIONS, download_model
+from app.backends import EXPORT_IMGSZ
+from app.quantization import CALIBRATION_DIR, extract_calibration_frames, quantize_model
+
+if __name__ == "__main__":
+    # Usage: python quantize_models.py [model sizes...] [--videos video1.mp4 ...]
+    args = sys.argv[1:]
+    if "--videos" in args:
+        videos = args[args.index("--videos") + 1 :]
+        args = args[: args.index("--videos")]
+        extract_calibration_frames(videos, CALIBRATION_DIR)
+
+    logging.basicConfig(level=logging.WARNING)
+    model_sizes = args or list(QUANTIZED_MODEL_OPTIONS)
+
+    print(f"INT8 models against FP32 ({EXPORT_IMGSZ}px)")
+    print(
+        f"{'model':>13} {'fp32 ms':>9} {'int8 ms':>9} {'speedup':>8} {'recall':>7} {'size MB':>13}"
+    )
+    for model_size in model_sizes:
+        model_file = MODEL_OPTIONS[QUANTIZED_MODEL_OPTIONS[model_size]]
+        weights_path = os.path.join(MODELS_DIR, model_file)
+        if not os.path.exists(weights_path):
+            download_model(model_file, weights_path)
+
+        path = quantize_model(weights_path, EXPORT_IMGSZ)
+        with open(f"{os.path.splitext(path)[0]}_report.json", "r") as f:
+            report = json.load(f)
+        print(
+            f"{model_size:>13} {report['fp32_ms_per_frame']:>9.1f} {report['int8_ms_per_frame']:>9.1f} "
+            f"{report['speedup']:>7.2f}x {report['vehicle_recall_vs_fp32']:>7.1%} "
+            f"{report['fp32_size_mb']:>6.1f}>{report['int8_size_mb']:<6.1f}"
+        )
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+
+
+class Client:
+    """Synchronous requests to an ASGI app"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method, url, **kwargs):
+        async def send():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                return await client.request(method, url, **kwargs)
+
+        return asyncio.run(send())
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+@pytest.fixture(scope="session")
+def app_dir(tmp_path_factory):
+    """Working directory and SQLite database of the API, set before it is imported"""
+    directory = tmp_path_factory.mktemp("api")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(directory)
+        patch.setenv("DATABASE_URL", f"sqlite:///{directory / 'app.db'}")
+        yield directory
+
+
+@pytest.fixture(scope="session")
+def user(app_dir):
+    from app import models
+    from app.database import SessionLocal
+    from app.main import app  # Creates the tables
+
+    db = SessionLocal()
+    user = models.User(email="test@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+    db.close()
+    return user
+
+
+@pytest.fixture(scope="session")
+def api(user):
+    """Client of the API, signed in as `user`"""
+    from app import auth
+    from app.main import app
+
+    app.dependency_overrides[auth.get_current_active_user] = lambda: user
+    yield Client(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def db(app_dir):
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
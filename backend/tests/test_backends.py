@@ -0,0 +1,128 @@
+import numpy as np
+
+from app import backends
+from app.backends import ExportedModel, letterbox, non_max_suppression, postprocess
+
+
+def reference_nms(prediction):
+    """ultralytics non_max_suppression with torchvision's CPU nms, one box at a time"""
+    candidates = []
+    for row in prediction.T.astype(np.float32):
+        class_id = int(row[4:].argmax())
+        confidence = row[4 + class_id]
+        if confidence > backends.CONFIDENCE_THRESHOLD:
+            x, y, w, h = row[:4]
+            box = [x - w / 2, y - h / 2, x + w / 2, y + h / 2]
+            candidates.append((box, confidence, class_id))
+
+    order = sorted(range(len(candidates)), key=lambda i: -candidates[i][1])
+    offset = [
+        [np.float32(v + np.float32(c * backends.MAX_BOX_SIZE)) for v in box]
+        for box, _, c in candidates
+    ]
+    suppressed = set()
+    kept = []
+    for position, i in enumerate(order):
+        if i in suppressed:
+            continue
+        kept.append(i)
+        x1, y1, x2, y2 = offset[i]
+        area = (x2 - x1) * (y2 - y1)
+        for j in order[position + 1 :]:
+            a1, b1, a2, b2 = offset[j]
+            w = max(np.float32(0), min(x2, a2) - max(x1, a1))
+            h = max(np.float32(0), min(y2, b2) - max(y1, b1))
+            intersection = w * h
+            if intersection / (area + (a2 - a1) * (b2 - b1) - intersection) > 0.7:
+                suppressed.add(j)
+    return [(candidates[i][0], candidates[i][1], candidates[i][2]) for i in kept][
+        : backends.MAX_DETECTIONS
+    ]
+
+
+def random_prediction(rng, anchors=500, classes=80):
+    centres = rng.uniform(0, 640, (2, anchors))
+    # Clusters of overlapping boxes, like several anchors firing on one object
+    centres = np.round(centres / 40) * 40 + rng.normal(0, 4, (2, anchors))
+    sizes = rng.uniform(20, 120, (2, anchors))
+    scores = rng.uniform(0, 0.3, (classes, anchors))
+    scores[rng.integers(0, 4, anchors), np.arange(anchors)] += rng.uniform(
+        0, 0.7, anchors
+    )
+    return np.concatenate([centres, sizes, scores]).astype(np.float32)
+
+
+def test_nms_matches_ultralytics_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        prediction = random_prediction(rng)
+        detections = non_max_suppression(prediction)
+        reference = reference_nms(prediction)
+
+        assert len(detections) == len(reference)
+        for row, (box, confidence, class_id) in zip(detections, reference):
+            np.testing.assert_array_equal(row[:4], np.array(box, dtype=np.float32))
+            assert row[4] == confidence and row[5] == class_id
+
+
+def test_postprocess_maps_boxes_back_to_the_frame():
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    blob = letterbox(frame, 640, auto=True)
+    # Stride-padded like ultralytics: 1920x1080 -> 640x360 -> 640x384
+    assert blob.shape == (1, 3, 384, 640)
+
+    # One car at frame box (960, 540, 1080, 630): input box is x/3, y/3 + 12 padding
+    prediction = np.zeros((84, 1), dtype=np.float32)
+    prediction[:4, 0] = [340, 207, 40, 30]
+    prediction[4 + 2, 0] = 0.9
+    boxes = postprocess(prediction, blob.shape[2:], frame.shape).boxes
+
+    np.testing.assert_allclose(boxes.xyxy, [[960, 540, 1080, 630]], atol=1e-3)
+    assert boxes.cls.tolist() == [2]
+
+
+def test_dynamic_export_is_shared_by_every_input_size(monkeypatch):
+    loaded = []
+
+    class Runner:
+        supports_batch = True
+
+        def __init__(self, path):
+            loaded.append(path)
+
+        def run(self, batch):
+            return np.zeros((len(batch), 84, 10), dtype=np.float32)
+
+    monkeypatch.setitem(backends.BACKENDS, "onnxruntime", ("onnx", True, Runner))
+    monkeypatch.setitem(backends.BACKENDS, "opencv", ("onnx", False, Runner))
+    monkeypatch.setattr(
+        backends,
+        "export_model",
+        lambda weights, fmt, imgsz, dynamic: backends.export_path(
+            weights, fmt, imgsz, dynamic
+        ),
+    )
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+
+    dynamic = ExportedModel("models/yolov8n.pt", "onnxruntime")
+    for imgsz in (640, 480, 320):
+        dynamic([frame, frame], imgsz=imgsz)
+    assert loaded == ["models/yolov8n_dynamic.onnx"]
+
+    loaded.clear()
+    fixed = ExportedModel("models/yolov8n.pt", "opencv")
+    for imgsz in (640, 480):
+        fixed(frame, imgsz=imgsz)
+    assert loaded == ["models/yolov8n_640.onnx", "models/yolov8n_480.onnx"]
+
+
+def test_memory_of_a_dynamic_export_is_counted_once(tmp_path):
+    from app.ai import model_memory_bytes
+
+    path = tmp_path / "yolov8n_dynamic.onnx"
+    path.write_bytes(b"\0" * 1000)
+
+    class Exported:
+        files = {640: str(path), 480: str(path), 320: str(path)}
+
+    assert model_memory_bytes(Exported()) == 1000
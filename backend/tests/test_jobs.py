@@ -0,0 +1,80 @@
+import pytest
+
+
+@pytest.fixture
+def video(db, user):
+    from app import models
+
+    video = models.Video(
+        name="traffic",
+        original_filename="traffic.mp4",
+        file_path="uploads/traffic.mp4",
+        status="queued",
+        user_id=user.id,
+    )
+    db.add(video)
+    db.commit()
+    db.refresh(video)
+    return video
+
+
+def test_int8_job_fails_instead_of_running_another_model(monkeypatch, db, video):
+    from app import ai, jobs
+
+    requested = []
+
+    def process_video(video_path, file_id, model_size, **kwargs):
+        requested.append(model_size)
+        raise ai.ModelLoadError(f"Failed to load model {model_size}: no runtime")
+
+    monkeypatch.setattr(ai, "process_video", process_video)
+
+    assert not jobs.process_video_task(
+        video.id, video.file_path, "traffic", "nano-int8"
+    )
+    assert requested == ["nano-int8"]
+    db.refresh(video)
+    assert video.status == "failed"
+    assert "nano-int8" in video.error_message
+
+
+def test_job_that_lost_its_claim_is_not_finished(monkeypatch, db, video):
+    from app import ai, crud, jobs
+
+    def process_video(video_path, file_id, model_size, abort=None, **kwargs):
+        # Like a session checking `abort` before each frame
+        while not abort.wait(0.01):
+            pass
+        raise ai.ProcessingAborted("Processing stopped at frame 3")
+
+    monkeypatch.setattr(ai, "process_video", process_video)
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_SECONDS", 0.01)
+    monkeypatch.setattr(crud, "heartbeat_job", lambda db, job_id, worker_id: False)
+    job = crud.create_job(db, video.id, "nano")
+    assert crud.claim_next_job(db, "worker-1").id == job.id
+
+    jobs.run_job(job.id, "worker-1")
+
+    db.refresh(video)
+    db.refresh(job)
+    assert video.status == "processing"
+    assert job.status == "running"
+
+
+def test_session_stops_at_the_next_frame_once_aborted():
+    import threading
+
+    import numpy as np
+
+    from app import ai
+    from app.sampling import FixedSampler
+
+    abort = threading.Event()
+    session = ai.VideoProcessingSession("nano", batch_size=1, abort=abort)
+    frames = ((number, np.zeros((8, 8, 3), np.uint8)) for number in range(10))
+    batches = session.select_batches(frames, FixedSampler(1))
+
+    assert next(batches)[0][0] == 0
+    abort.set()
+    with pytest.raises(ai.ProcessingAborted):
+        next(batches)
@@ -0,0 +1,47 @@
+import threading
+import time
+
+import numpy as np
+
+
+class OneCallAtATime:
+    """Model that records how many calls ran at once"""
+
+    def __init__(self):
+        self.running = 0
+        self.most_running = 0
+        self.counter = threading.Lock()
+
+    def __call__(self, frames, verbose=False, **kwargs):
+        with self.counter:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(0.01)
+        with self.counter:
+            self.running -= 1
+        return [None] * len(frames)
+
+
+def test_sessions_sharing_a_model_take_turns(monkeypatch):
+    from app import ai
+    from app.model_registry import ModelRegistry
+
+    model = OneCallAtATime()
+    registry = ModelRegistry(lambda key: model, lambda model: 0, 1, 0)
+    monkeypatch.setattr(ai, "model_registry", registry)
+    frames = [np.zeros((32, 32, 3), dtype=np.uint8)]
+
+    def run_session():
+        session = ai.VideoProcessingSession("nano")
+        for _ in range(10):
+            session.detect_batch(frames)
+        session.release_model()
+
+    threads = [threading.Thread(target=run_session) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.most_running == 1
+    assert registry.stats()["loads"] == 1
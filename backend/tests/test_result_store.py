@@ -0,0 +1,39 @@
+import numpy as np
+import orjson
+
+from app.result_store import (
+    FrameColumns,
+    iter_results_json,
+    load_results,
+    save_results,
+)
+
+
+def test_columnar_store_returns_the_legacy_objects_unchanged(tmp_path):
+    rng = np.random.default_rng(0)
+    frames = [
+        {
+            "frame_number": frame_number,
+            "tracked_objects": [
+                {
+                    "id": str(frame_number * 3 + index + 1),
+                    "type": "car",
+                    "bbox": [10, 20, 50, 60],
+                    "confidence": float(rng.random()),
+                    "centroid": [30, 40],
+                    "counted": False,
+                }
+                for index in range(3)
+            ],
+        }
+        for frame_number in range(20)
+    ]
+    json_path = str(tmp_path / "video_results.json")
+    save_results(json_path, {"fps": 25}, FrameColumns.from_legacy_frames(frames, 25))
+
+    loaded = load_results(json_path)["frames"]
+    streamed = orjson.loads(b"".join(iter_results_json(json_path)))["frames"]
+    for rebuilt in (loaded, streamed):
+        assert [frame["tracked_objects"] for frame in rebuilt] == [
+            frame["tracked_objects"] for frame in frames
+        ]
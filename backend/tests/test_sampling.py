@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.sampling import AdaptiveSampler
+from app.tracker import VehicleTracker
+
+FRAME_SHAPE = (540, 960, 3)
+COUNTING_LINE_Y = int(FRAME_SHAPE[0] * 0.8)
+FRAMES = 600
+# Adaptive sampling may miss this fraction of the crossings counted on every frame
+COUNT_TOLERANCE = 0.05
+
+
+def make_scene(seed, vehicle_count=36, false_detection_rate=0.2):
+    """
+    Per-frame detections of vehicles driving down the frame at different speeds
+
+    About one frame in five also has a false detection that is never seen
+    again, always above the counting line so it cannot be counted.
+    """
+    rng = np.random.default_rng(seed)
+    enter = rng.integers(0, FRAMES - 150, vehicle_count)
+    x = rng.uniform(40, FRAME_SHAPE[1] - 40, vehicle_count)
+    speed = rng.uniform(1, 6, vehicle_count)
+
+    scene = []
+    for frame_number in range(FRAMES):
+        y = (frame_number - enter) * speed
+        centers = [
+            (int(x[i]), int(y[i]))
+            for i in np.flatnonzero((y >= 0) & (y < FRAME_SHAPE[0]))
+        ]
+        detections = [("car", center, 0.9) for center in centers]
+        if rng.random() < false_detection_rate:
+            center = (rng.integers(40, 900), rng.integers(20, COUNTING_LINE_Y - 60))
+            detections.append(("truck", center, 0.4))
+        scene.append(
+            [
+                (vehicle_type, (cx - 20, cy - 15, cx + 20, cy + 15), confidence)
+                for vehicle_type, (cx, cy), confidence in detections
+            ]
+        )
+    return scene
+
+
+def render(detections):
+    frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    for _, (x1, y1, x2, y2), _ in detections:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 255, 255), -1)
+    return frame
+
+
+def count_crossings(scene, sampler=None):
+    """Vehicles counted when only the frames `sampler` picks are tracked"""
+    tracker = VehicleTracker()
+    counted = 0
+    for frame_number, detections in enumerate(scene):
+        if sampler is not None and not sampler.should_sample(
+            frame_number, render(detections), tracker
+        ):
+            continue
+        assignments = tracker.update(
+            detections, FRAME_SHAPE, frame_number, COUNTING_LINE_Y
+        )
+        counted += sum(counted_now for _, counted_now in assignments)
+    return counted
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_adaptive_counts_match_every_frame_counts(seed):
+    scene = make_scene(seed)
+    sampler = AdaptiveSampler(min_stride=1, max_stride=15)
+
+    expected = count_crossings(scene)
+    counted = count_crossings(scene, sampler)
+
+    assert expected > 20
+    assert expected * (1 - COUNT_TOLERANCE) <= counted <= expected
+    # False detections must not hold the stride at its minimum
+    assert sampler.stats()["mean_stride"] > 2
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from app.result_store import MAX_TIME_BINS, ResultWriter, time_series
+
+
+def add_video(db, user, app_dir, manifest, **columns):
+    from app import models
+
+    json_path = app_dir / f"{len(db.query(models.Video).all())}_results.json"
+    json_path.write_text(json.dumps(manifest))
+    video = models.Video(
+        name="video",
+        original_filename="video.mp4",
+        file_path="uploads/video.mp4",
+        json_result_path=str(json_path),
+        status="completed",
+        user_id=user.id,
+        **columns,
+    )
+    db.add(video)
+    db.commit()
+    return video.id
+
+
+def test_time_series_refuses_too_many_bins_before_allocating():
+    manifest = {"fps": 25, "total_frames": 1200, "frames": []}
+    with pytest.raises(ValueError):
+        time_series(manifest, 1e-9)
+    with pytest.raises(ValueError):
+        time_series(manifest, 0)
+    assert len(time_series(manifest, 48 / MAX_TIME_BINS)["bins"]) == MAX_TIME_BINS
+
+
+def test_time_series_counts_the_bins_of_late_frames(tmp_path):
+    # total_frames says 10 frames, but a frame was read far beyond them
+    json_path = str(tmp_path / "late_results.json")
+    writer = ResultWriter(json_path, {"fps": 25, "total_frames": 10}, 25)
+    writer.append({"counts": {}, "tracked_objects": []}, set(), 10**9)
+    writer.close()
+    with open(json_path, "r") as f:
+        manifest = json.load(f)
+
+    with pytest.raises(ValueError):
+        time_series(manifest, 1)
+
+
+def test_timeseries_endpoint_without_duration_column(api, db, user, app_dir):
+    # Videos from before the summary columns have no duration_seconds
+    video_id = add_video(
+        db, user, app_dir, {"fps": 25, "total_frames": 1200, "frames": []}
+    )
+
+    response = api.get(f"/api/videos/{video_id}/timeseries?bin_seconds=1e-9")
+    assert response.status_code == 400
+
+    response = api.get(f"/api/videos/{video_id}/timeseries?bin_seconds=0.5")
+    assert response.status_code == 200
+    assert len(response.json()["bins"]) == 96
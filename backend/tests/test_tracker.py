@@ -0,0 +1,66 @@
+import numpy as np
+
+from app.tracker import VehicleTracker, associate, associate_indexed
+
+FRAME_SHAPE = (1080, 1920, 3)
+TYPES = np.array(["car", "motorcycle", "bus", "truck"])
+
+
+def crowded_scene(vehicle_count, frames, seed=0):
+    """Vehicles driving down a 1080p frame, with integer boxes like the detector's"""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(
+        [0, 0], [FRAME_SHAPE[1], FRAME_SHAPE[0]], (vehicle_count, 2)
+    )
+    velocities = rng.uniform([-2, 2], [2, 12], (vehicle_count, 2))
+    types = rng.choice(TYPES, vehicle_count)
+
+    scene = []
+    for _ in range(frames):
+        positions = positions + velocities
+        positions[:, 1] %= FRAME_SHAPE[0]
+        positions[:, 0] %= FRAME_SHAPE[1]
+        scene.append(
+            [
+                (
+                    str(types[i]),
+                    (int(x) - 20, int(y) - 15, int(x) + 20, int(y) + 15),
+                    0.9,
+                )
+                for i, (x, y) in enumerate(positions)
+            ]
+        )
+    return scene
+
+
+def test_indexed_association_matches_dense_with_ties():
+    # Points on a coarse integer grid, so many pairs are exactly as far apart
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        tracks = rng.integers(0, 60, (300, 2)).astype(float)
+        detections = rng.integers(0, 60, (300, 2)).astype(float)
+        track_types = rng.choice(TYPES[:2], len(tracks))
+        detection_types = rng.choice(TYPES[:2], len(detections))
+
+        assert associate(
+            tracks, track_types, detections, detection_types, 5.0
+        ) == associate_indexed(tracks, track_types, detections, detection_types, 5.0)
+
+
+def test_indexed_tracker_matches_dense_in_crowded_scene():
+    scene = crowded_scene(2000, 20, seed=1)
+    trackers = [
+        VehicleTracker(spatial_index_min_tracks=0),
+        VehicleTracker(spatial_index_min_tracks=1),
+    ]
+
+    for frame_number, vehicles in enumerate(scene):
+        dense, indexed = (
+            tracker.update(vehicles, FRAME_SHAPE, frame_number, 648)
+            for tracker in trackers
+        )
+        assert [(track.track_id, counted) for track, counted in dense] == [
+            (track.track_id, counted) for track, counted in indexed
+        ]
+
+    assert trackers[0].finalize() == trackers[1].finalize()
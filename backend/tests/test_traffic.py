@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def buckets(user, app_dir):
+    from app import crud, models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    video = models.Video(
+        name="traffic",
+        original_filename="traffic.mp4",
+        file_path="uploads/traffic.mp4",
+        status="completed",
+        user_id=user.id,
+    )
+    db.add(video)
+    db.commit()
+    # Sunday evening and the Monday morning after
+    crud.replace_count_buckets(
+        db,
+        video.id,
+        [
+            {
+                "bucket_start": datetime(2026, 10, 4, 23, 59),
+                "vehicle_type": "car",
+                "count": 2,
+            },
+            {
+                "bucket_start": datetime(2026, 10, 5, 7, 15),
+                "vehicle_type": "truck",
+                "count": 1,
+            },
+        ],
+    )
+    db.close()
+
+
+@pytest.mark.parametrize(
+    "interval, starts",
+    [
+        ("hour", ["2026-10-04T23:00:00", "2026-10-05T07:00:00"]),
+        ("day", ["2026-10-04T00:00:00", "2026-10-05T00:00:00"]),
+        ("week", ["2026-09-28T00:00:00", "2026-10-05T00:00:00"]),
+    ],
+)
+def test_traffic_buckets_start_at_iso_datetimes(api, buckets, interval, starts):
+    response = api.get(f"/api/analytics/traffic?interval={interval}")
+    assert response.status_code == 200
+
+    entries = response.json()["buckets"]
+    # The same ISO 8601 datetime whatever the database or interval
+    assert [entry["start"] for entry in entries] == starts
+    assert [(entry["car"], entry["truck"], entry["total"]) for entry in entries] == [
+        (2, 0, 2),
+        (0, 1, 1),
+    ]
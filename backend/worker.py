@@ -0,0 +1,64 @@
+import multiprocessing
+import time
+import logging
+
+from app import models
+from app.database import engine, add_missing_columns
+from app.jobs import (
+    WORKER_PROCESSES,
+    JOB_STALE_SECONDS,
+    requeue_stale_jobs,
+    worker_loop,
+)
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def run_workers(processes: int = WORKER_PROCESSES):
+    """Run a pool of video processing workers and restart any that die"""
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(models.Base.metadata)
+
+    # Spawn instead of fork so every worker gets its own clean torch runtime
+    context = multiprocessing.get_context("spawn")
+    workers = {}
+
+    logger.info(f"Starting {processes} video processing workers")
+    try:
+        while True:
+            for index in range(processes):
+                worker = workers.get(index)
+                if worker is None or not worker.is_alive():
+                    if worker is not None:
+                        logger.warning(
+                            f"Worker {index} exited with code {worker.exitcode}, restarting"
+                        )
+                    worker = context.Process(
+                        target=worker_loop, args=(index,), daemon=True
+                    )
+                    worker.start()
+                    workers[index] = worker
+
+            # Jobs claimed by a worker that crashed stop sending heartbeats
+            try:
+                requeue_stale_jobs()
+            except Exception as e:
+                logger.error(f"Error re-queuing stale jobs: {str(e)}")
+
+            time.sleep(max(1, JOB_STALE_SECONDS / 4))
+    except KeyboardInterrupt:
+        logger.info("Stopping video processing workers")
+    finally:
+        # Jobs interrupted here are re-queued once their heartbeat goes stale
+        for worker in workers.values():
+            worker.terminate()
+        for worker in workers.values():
+            worker.join()
+
+
+if __name__ == "__main__":
+    run_workers()
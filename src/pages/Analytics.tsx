@@ -6,7 +6,7 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/com
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 import { Button } from "@/components/ui/button";
-import { videoService } from "@/services/api";
+import { analyticsService, videoService } from "@/services/api";
 import {
   ResponsiveContainer,
   ComposedChart,
@@ -23,30 +23,22 @@ import {
   Line
 } from "recharts";
 
-// Helper function to aggregate vehicle data from videos
-const aggregateVehicleData = (videos: any[], resultsMap: Record<number, any>) => {
-  // Initialize vehicle counts
-  const vehicleCounts = {
-    car: 0,
-    truck: 0,
-    bus: 0,
-    motorcycle: 0
-  };
-  
-  // Count vehicles from video results
-  videos.forEach(video => {
-    if (video.status === 'completed' && resultsMap[video.id]) {
-      const results = resultsMap[video.id];
-      if (results.total_counts) {
-        vehicleCounts.car += results.total_counts.car || 0;
-        vehicleCounts.truck += results.total_counts.truck || 0;
-        vehicleCounts.bus += results.total_counts.bus || 0;
-        vehicleCounts.motorcycle += results.total_counts.motorcycle || 0;
-      }
-    }
-  });
-  
-  return vehicleCounts;
+// First day (YYYY-MM-DD) of the selected time period, undefined for all time
+const periodStartDate = (timeFilter: string) => {
+  const date = new Date();
+  if (timeFilter === "week") {
+    date.setDate(date.getDate() - ((date.getDay() + 6) % 7));
+  } else if (timeFilter === "month") {
+    date.setDate(1);
+  } else if (timeFilter === "year") {
+    date.setMonth(0, 1);
+  } else if (timeFilter !== "today") {
+    return undefined;
+  }
+  // Local calendar date; toISOString would give the UTC date
+  const month = String(date.getMonth() + 1).padStart(2, "0");
+  const day = String(date.getDate()).padStart(2, "0");
+  return `${date.getFullYear()}-${month}-${day}`;
 };
 
 const COLORS = {
@@ -72,42 +64,20 @@ const Analytics = () => {
     return videos.filter(v => v.status === 'completed');
   }, [videos]);
   
-  // Fetch results for each completed video
-  const [resultsMap, setResultsMap] = useState<Record<number, any>>({});
-  const [isLoadingResults, setIsLoadingResults] = useState(false);
-  
-  // Use effect to fetch results for each completed video
-  React.useEffect(() => {
-    const fetchResults = async () => {
-      setIsLoadingResults(true);
-      const results: Record<number, any> = {};
-      
-      for (const video of completedVideos) {
-        try {
-          const result = await videoService.getVideoResults(video.id);
-          results[video.id] = result;
-        } catch (error) {
-          console.error(`Failed to fetch results for video ${video.id}:`, error);
-        }
-      }
-      
-      setResultsMap(results);
-      setIsLoadingResults(false);
-    };
-    
-    if (completedVideos.length > 0) {
-      fetchResults();
-    }
-  }, [completedVideos]);
+  // Totals and distributions aggregated by the backend
+  const { data: summary, isLoading: isLoadingSummary } = useQuery({
+    queryKey: ['analyticsSummary', timeFilter],
+    queryFn: () => analyticsService.getSummary({
+      start_date: periodStartDate(timeFilter),
+      status: 'completed',
+    }),
+  });
   
-  // Calculate aggregated stats
   const vehicleCounts = React.useMemo(() => {
-    return aggregateVehicleData(completedVideos, resultsMap);
-  }, [completedVideos, resultsMap]);
+    return summary?.by_type || { car: 0, truck: 0, bus: 0, motorcycle: 0 };
+  }, [summary]);
   
-  const totalVehicles = React.useMemo(() => {
-    return Object.values(vehicleCounts).reduce((a, b) => a + b, 0);
-  }, [vehicleCounts]);
+  const totalVehicles = summary?.totals?.total || 0;
   
   // For pie chart
   const pieData = React.useMemo(() => {
@@ -117,73 +87,38 @@ const Analytics = () => {
     }));
   }, [vehicleCounts]);
   
-  // Generate time-based data from actual results
+  // Traffic profiles by recording time, from the per-minute count buckets
+  const periodStart = periodStartDate(timeFilter);
+  const { data: weekdayTraffic } = useQuery({
+    queryKey: ['analyticsTraffic', 'weekday', timeFilter],
+    queryFn: () => analyticsService.getTraffic({ interval: 'weekday', start: periodStart }),
+  });
+  const { data: hourlyTraffic } = useQuery({
+    queryKey: ['analyticsTraffic', 'hour_of_day', timeFilter],
+    queryFn: () => analyticsService.getTraffic({ interval: 'hour_of_day', start: periodStart }),
+  });
+  
+  // Vehicle counts by day of week, Monday first
   const timeBasedData = React.useMemo(() => {
-    if (Object.keys(resultsMap).length === 0) return [];
+    if (!weekdayTraffic) return [];
     
-    // Create day-based aggregation
-    const dayData: Record<string, { car: number, truck: number, bus: number, motorcycle: number }> = {
-      'Mon': { car: 0, truck: 0, bus: 0, motorcycle: 0 },
-      'Tue': { car: 0, truck: 0, bus: 0, motorcycle: 0 },
-      'Wed': { car: 0, truck: 0, bus: 0, motorcycle: 0 },
-      'Thu': { car: 0, truck: 0, bus: 0, motorcycle: 0 },
-      'Fri': { car: 0, truck: 0, bus: 0, motorcycle: 0 },
-      'Sat': { car: 0, truck: 0, bus: 0, motorcycle: 0 },
-      'Sun': { car: 0, truck: 0, bus: 0, motorcycle: 0 }
-    };
-    
-    // Distribute the counts across days based on creation date
-    completedVideos.forEach(video => {
-      const result = resultsMap[video.id];
-      if (result && result.total_counts) {
-        const date = new Date(video.created_at);
-        const day = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'][date.getDay()];
-        
-        dayData[day].car += result.total_counts.car || 0;
-        dayData[day].truck += result.total_counts.truck || 0;
-        dayData[day].bus += result.total_counts.bus || 0;
-        dayData[day].motorcycle += result.total_counts.motorcycle || 0;
-      }
+    return [1, 2, 3, 4, 5, 6, 0].map(index => {
+      const { day, car, truck, bus, motorcycle } = weekdayTraffic.buckets[index];
+      return { day, car, truck, bus, motorcycle };
     });
-    
-    // Convert to array format for chart
-    return Object.entries(dayData).map(([day, counts]) => ({
-      day,
-      ...counts
-    }));
-  }, [completedVideos, resultsMap]);
+  }, [weekdayTraffic]);
   
-  // Generate hourly distribution based on actual frames from all videos
+  // Vehicle counts by hour of day
   const hourlyDistribution = React.useMemo(() => {
-    if (Object.keys(resultsMap).length === 0) return [];
+    if (!hourlyTraffic) return [];
     
-    const hourCounts = Array(24).fill(0).map((_, i) => ({
-      hour: i.toString().padStart(2, '0'),
-      count: 0
+    return hourlyTraffic.buckets.map((hour: any) => ({
+      hour: hour.hour.toString().padStart(2, '0'),
+      count: hour.total
     }));
-    
-    // Aggregate counts by distributing total vehicles across hours
-    // based on typical traffic patterns (since actual time info isn't in the data)
-    if (totalVehicles > 0) {
-      // Typical traffic distribution percentages by hour
-      const hourlyDistribution = [
-        1, 0.5, 0.3, 0.2, 0.3, 1, 3, 7, 9, 6, 5, 5, 
-        5.5, 5, 5, 6, 8, 10, 7, 5, 4, 3, 2, 1.5
-      ];
-      
-      // Calculate total percentage (should be close to 100%)
-      const totalPercentage = hourlyDistribution.reduce((a, b) => a + b, 0);
-      
-      // Distribute total vehicles by hour based on percentages
-      hourCounts.forEach((hour, index) => {
-        hour.count = Math.round(totalVehicles * (hourlyDistribution[index] / totalPercentage));
-      });
-    }
-    
-    return hourCounts;
-  }, [totalVehicles, resultsMap]);
+  }, [hourlyTraffic]);
 
-  const isLoading = isLoadingVideos || isLoadingResults;
+  const isLoading = isLoadingVideos || isLoadingSummary;
 
   return (
     <DashboardLayout>
@@ -254,7 +189,7 @@ const Analytics = () => {
                     {totalVehicles}
                   </div>
                   <p className="text-xs text-muted-foreground">
-                    Across {completedVideos.length} processed videos
+                    Across {summary?.totals?.videos || 0} processed videos
                   </p>
                 </CardContent>
               </Card>
@@ -463,16 +398,13 @@ const Analytics = () => {
                     <CardContent className="h-[300px]">
                       <ResponsiveContainer width="100%" height="100%">
                         <BarChart
-                          data={Object.entries(resultsMap).map(([id, result]) => {
-                            const video = completedVideos.find(v => v.id === parseInt(id));
-                            return {
-                              name: video ? video.name.substring(0, 15) + (video.name.length > 15 ? "..." : "") : `Video ${id}`,
-                              car: result.total_counts?.car || 0,
-                              truck: result.total_counts?.truck || 0,
-                              bus: result.total_counts?.bus || 0,
-                              motorcycle: result.total_counts?.motorcycle || 0
-                            };
-                          })}
+                          data={completedVideos.map(video => ({
+                            name: video.name.substring(0, 15) + (video.name.length > 15 ? "..." : ""),
+                            car: video.total_counts?.car || 0,
+                            truck: video.total_counts?.truck || 0,
+                            bus: video.total_counts?.bus || 0,
+                            motorcycle: video.total_counts?.motorcycle || 0
+                          }))}
                         >
                           <CartesianGrid strokeDasharray="3 3" />
                           <XAxis dataKey="name" />
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React from "react";
 import { useQuery } from "@tanstack/react-query";
 import DashboardLayout from "@/components/layout/DashboardLayout";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
@@ -8,12 +8,11 @@ import { Link } from "react-router-dom";
 import { UploadCloud, AlertCircle, PlayCircle, BarChart4, Clock } from "lucide-react";
 import { Progress } from "@/components/ui/progress";
 import { Badge } from "@/components/ui/badge";
-import { videoService } from "@/services/api";
+import { analyticsService, videoService } from "@/services/api";
 import { useAuth } from "@/contexts/AuthContext";
 
 const Dashboard = () => {
   const { user } = useAuth();
-  const [totalVehicles, setTotalVehicles] = useState(0);
   const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
   const { data: videos = [], isLoading, error } = useQuery({
@@ -21,31 +20,12 @@ const Dashboard = () => {
     queryFn: videoService.getVideos,
   });
 
-  // Fetch total vehicles from completed videos
-  useEffect(() => {
-    if (!Array.isArray(videos)) return;
-    
-    const fetchTotalVehicles = async () => {
-      let total = 0;
-      const completedVideos = videos.filter(video => video.status === 'completed');
-      
-      for (const video of completedVideos) {
-        try {
-          const results = await videoService.getVideoResults(video.id);
-          if (results && results.total_counts) {
-            // Sum all vehicle types
-            total += Object.values(results.total_counts).reduce((sum: number, count: number) => sum + count, 0);
-          }
-        } catch (err) {
-          console.error(`Error fetching results for video ${video.id}:`, err);
-        }
-      }
-      
-      setTotalVehicles(total);
-    };
-    
-    fetchTotalVehicles();
-  }, [videos]);
+  // Total vehicles over every completed video, aggregated by the backend
+  const { data: summary } = useQuery({
+    queryKey: ['analyticsSummary', 'all'],
+    queryFn: () => analyticsService.getSummary({ status: 'completed' }),
+  });
+  const totalVehicles = summary?.totals?.total || 0;
 
   // For display in the dashboard, we'll show the 3 most recent videos
   const recentVideos = React.useMemo(() => {
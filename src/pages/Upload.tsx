@@ -1,6 +1,6 @@
 import React, { useState } from "react";
 import { useNavigate } from "react-router-dom";
-import { useMutation } from "@tanstack/react-query";
+import { useMutation, useQuery } from "@tanstack/react-query";
 import DashboardLayout from "@/components/layout/DashboardLayout";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
@@ -18,10 +18,18 @@ const Upload = () => {
   const [file, setFile] = useState<File | null>(null);
   const [videoName, setVideoName] = useState("");
   const [description, setDescription] = useState("");
+  const [recordedAt, setRecordedAt] = useState("");
   const [modelSize, setModelSize] = useState("nano");
+  const [inferenceSize, setInferenceSize] = useState("auto");
   const [uploadProgress, setUploadProgress] = useState(0);
   const navigate = useNavigate();
 
+  const { data: modelOptions } = useQuery({
+    queryKey: ["modelSizes"],
+    queryFn: videoService.getModelSizes,
+  });
+  const int8Available = modelOptions?.model_sizes?.includes("nano-int8") ?? false;
+
   // Create a mutation for uploading videos
   const uploadMutation = useMutation({
     mutationFn: (formData: FormData) => {
@@ -79,9 +87,16 @@ const Upload = () => {
     formData.append("file", file);
     formData.append("name", videoName);
     formData.append("model_size", modelSize);
+    if (inferenceSize !== "auto") {
+      formData.append("inference_size", inferenceSize);
+    }
     if (description) {
       formData.append("description", description);
     }
+    if (recordedAt) {
+      // Local time from the picker, sent as UTC
+      formData.append("recorded_at", new Date(recordedAt).toISOString());
+    }
     
     // Upload the video
     uploadMutation.mutate(formData);
@@ -141,6 +156,19 @@ const Upload = () => {
                     disabled={isUploading}
                   />
                 </div>
+                <div className="flex flex-col space-y-1.5">
+                  <Label htmlFor="recordedAt">Recording Start Time (Optional)</Label>
+                  <Input 
+                    id="recordedAt" 
+                    type="datetime-local"
+                    value={recordedAt}
+                    onChange={(e) => setRecordedAt(e.target.value)}
+                    disabled={isUploading}
+                  />
+                  <p className="text-xs text-muted-foreground">
+                    When the footage starts, used for hourly and daily traffic analytics
+                  </p>
+                </div>
                 <div className="flex flex-col space-y-1.5">
                   <div className="flex items-center space-x-2">
                     <Label htmlFor="modelSize">AI Model Size</Label>
@@ -172,6 +200,50 @@ const Upload = () => {
                       <SelectItem value="medium">Medium (Better Accuracy)</SelectItem>
                       <SelectItem value="large">Large (High Accuracy, Slower)</SelectItem>
                       <SelectItem value="x-large">X-Large (Highest Accuracy, Very Slow)</SelectItem>
+                      {int8Available && (
+                        <>
+                          <SelectItem value="nano-int8">Nano INT8 (Fastest on CPU)</SelectItem>
+                          <SelectItem value="small-int8">Small INT8 (CPU Optimized)</SelectItem>
+                          <SelectItem value="medium-int8">Medium INT8 (CPU Optimized)</SelectItem>
+                          <SelectItem value="large-int8">Large INT8 (CPU Optimized)</SelectItem>
+                          <SelectItem value="x-large-int8">X-Large INT8 (CPU Optimized)</SelectItem>
+                        </>
+                      )}
+                    </SelectContent>
+                  </Select>
+                </div>
+                <div className="flex flex-col space-y-1.5">
+                  <div className="flex items-center space-x-2">
+                    <Label htmlFor="inferenceSize">Inference Resolution</Label>
+                    <TooltipProvider>
+                      <Tooltip>
+                        <TooltipTrigger asChild>
+                          <Info className="h-4 w-4 text-muted-foreground cursor-help" />
+                        </TooltipTrigger>
+                        <TooltipContent>
+                          <p className="max-w-xs">
+                            Frames are downscaled to this size (longest side) before detection.
+                            Lower resolutions process faster but may miss small or distant vehicles.
+                          </p>
+                        </TooltipContent>
+                      </Tooltip>
+                    </TooltipProvider>
+                  </div>
+                  <Select 
+                    value={inferenceSize} 
+                    onValueChange={setInferenceSize}
+                    disabled={isUploading}
+                  >
+                    <SelectTrigger>
+                      <SelectValue placeholder="Select inference resolution" />
+                    </SelectTrigger>
+                    <SelectContent>
+                      <SelectItem value="auto">Auto (Model Default)</SelectItem>
+                      <SelectItem value="320">320 px (Fastest)</SelectItem>
+                      <SelectItem value="480">480 px</SelectItem>
+                      <SelectItem value="640">640 px (Balanced)</SelectItem>
+                      <SelectItem value="960">960 px</SelectItem>
+                      <SelectItem value="1280">1280 px (Small Vehicles, Slower)</SelectItem>
                     </SelectContent>
                   </Select>
                 </div>
@@ -46,10 +46,20 @@ const VideoDetail = () => {
   // Fetch video results if completed
   const { data: results, isLoading: isLoadingResults } = useQuery({
     queryKey: ['videoResults', videoId],
-    queryFn: () => videoService.getVideoResults(videoId),
+    queryFn: () => videoService.getVideoResults(videoId, false),
     enabled: !!videoId && video?.status === 'completed',
   });
   
+  // Vehicles counted per time bin for the counts chart, about 20 bins
+  const durationSeconds = video?.duration_seconds
+    || (results?.fps ? results.total_frames / results.fps : 0);
+  const binSeconds = Math.max(1, Math.round(durationSeconds / 20));
+  const { data: timeSeries } = useQuery({
+    queryKey: ['videoTimeseries', videoId, binSeconds],
+    queryFn: () => videoService.getVideoTimeseries(videoId, binSeconds),
+    enabled: !!videoId && video?.status === 'completed' && durationSeconds > 0,
+  });
+  
   const handleDownload = () => {
     if (video && video.status === 'completed') {
       videoService.downloadVideo(videoId);
@@ -84,18 +94,16 @@ const VideoDetail = () => {
   }, [results]);
   
   const timeSeriesData = React.useMemo(() => {
-    if (!results || !results.frames) return [];
+    if (!timeSeries || !timeSeries.bins) return [];
     
-    // Extract data every N frames to avoid too many points
-    const samplingRate = Math.max(1, Math.floor(results.frames.length / 20));
-    
-    return results.frames
-      .filter((_: any, i: number) => i % samplingRate === 0)
-      .map((frame: any, index: number) => ({
-        time: `${Math.floor(index * samplingRate / results.fps)}s`,
-        ...frame.counts
-      }));
-  }, [results]);
+    return timeSeries.bins.map((bin: any) => ({
+      time: `${Math.floor(bin.start)}s`,
+      car: bin.car,
+      truck: bin.truck,
+      bus: bin.bus,
+      motorcycle: bin.motorcycle
+    }));
+  }, [timeSeries]);
   
   // API URL for streams and token for authentication
   const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
@@ -474,10 +482,16 @@ const VideoDetail = () => {
                       <dt className="font-medium">Resolution:</dt>
                       <dd>{results.resolution}</dd>
                     </div>
+                    {results.model_requested && (
+                      <div className="flex justify-between">
+                        <dt className="font-medium">AI Model requested:</dt>
+                        <dd className="capitalize">{results.model_requested}</dd>
+                      </div>
+                    )}
                     {results.model_used && (
                       <div className="flex justify-between">
                         <dt className="font-medium">AI Model used:</dt>
-                        <dd className="capitalize">{results.model_used}</dd>
+                        <dd>{results.model_used}</dd>
                       </div>
                     )}
                   </dl>
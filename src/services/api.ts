@@ -103,60 +103,30 @@ export const videoService = {
     });
     return response.data;
   },
+  getModelSizes: async () => {
+    // INT8 sizes are only listed when the server has a runtime for them
+    const response = await api.get('/api/models');
+    return response.data;
+  },
   getVideos: async () => {
+    // Completed videos carry their results summary (counts, processing_time)
     const response = await api.get('/api/videos');
-    // Untuk setiap video yang completed, ambil processing_time dari results jika tersedia
-    const videos = response.data;
-    
-    // Untuk performa, kita hanya akan mengambil data untuk video yang sudah completed
-    // tapi belum memiliki processing_time
-    const completedVideosWithoutProcessingTime = videos.filter(
-      (video) => video.status === 'completed' && !video.processing_time && video.json_result_path
-    );
-    
-    // Jika ada video completed yang belum punya processing_time, fetch datanya
-    if (completedVideosWithoutProcessingTime.length > 0) {
-      const processVideos = async () => {
-        for (const video of completedVideosWithoutProcessingTime) {
-          try {
-            const results = await videoService.getVideoResults(video.id);
-            if (results && results.processing_stats && results.processing_stats.processing_time_seconds) {
-              // Tambahkan processing_time ke objek video
-              video.processing_time = results.processing_stats.processing_time_seconds;
-            }
-          } catch (err) {
-            console.error(`Error fetching results for video ${video.id}:`, err);
-          }
-        }
-      };
-      
-      // Jalankan proses asinkron untuk mengambil data, tapi tidak block return
-      processVideos();
-    }
-    
-    return videos;
+    return response.data;
   },
   getVideo: async (id: number) => {
     const response = await api.get(`/api/videos/${id}`);
-    const video = response.data;
-    
-    // Jika status completed dan belum ada processing_time, coba ambil dari results
-    if (video.status === 'completed' && !video.processing_time && video.json_result_path) {
-      try {
-        const results = await videoService.getVideoResults(id);
-        if (results && results.processing_stats && results.processing_stats.processing_time_seconds) {
-          // Tambahkan processing_time ke objek video
-          video.processing_time = results.processing_stats.processing_time_seconds;
-        }
-      } catch (err) {
-        console.error(`Error fetching results for video ${id}:`, err);
-      }
-    }
-    
-    return video;
+    return response.data;
+  },
+  getVideoResults: async (id: number, frames: boolean = true) => {
+    const response = await api.get(`/api/videos/${id}/results`, {
+      params: frames ? undefined : { frames: false },
+    });
+    return response.data;
   },
-  getVideoResults: async (id: number) => {
-    const response = await api.get(`/api/videos/${id}/results`);
+  getVideoTimeseries: async (id: number, binSeconds: number) => {
+    const response = await api.get(`/api/videos/${id}/timeseries`, {
+      params: { bin_seconds: binSeconds },
+    });
     return response.data;
   },
   deleteVideo: async (id: number) => {
@@ -276,4 +246,20 @@ export const videoService = {
   checkVideoPlayable,
 };
 
+// Analytics services
+export const analyticsService = {
+  getSummary: async (
+    params: { start_date?: string; end_date?: string; model_size?: string; status?: string } = {}
+  ) => {
+    const response = await api.get('/api/analytics/summary', { params });
+    return response.data;
+  },
+  getTraffic: async (
+    params: { interval: string; start?: string; end?: string; camera_id?: number; model_size?: string }
+  ) => {
+    const response = await api.get('/api/analytics/traffic', { params });
+    return response.data;
+  },
+};
+
 export default api;